@@ -0,0 +1,86 @@
+"""Compares the size and the read/write times of the results formats
+
+Generates synthetic results and writes/reads them as JSON (as written by
+`wasure run`) and in the compact format, with each compression.
+
+Usage: python scripts/bench_results_format.py [--runtimes N] [--benchmarks N]
+       [--iterations N] [--output-size N]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from wasure.tools import compact, utils  # noqa: E402
+
+
+def _generate_results(runtimes, benchmarks, iterations, output_size):
+    random.seed(0)
+    results = {}
+    for r in range(runtimes):
+        results[f"runtime-{r}"] = {}
+        for b in range(benchmarks):
+            # Benchmarks print the same output at every iteration
+            output = f"benchmark-{b} " * (output_size // 12) + "\nok"
+            results[f"runtime-{r}"][f"benchmark-{b}"] = [
+                {
+                    "elapsed_time_ns": random.randint(10**6, 10**10),
+                    "score": random.random() * 1000,
+                    "return_code": 0,
+                    "output": output,
+                }
+                for _ in range(iterations)
+            ]
+    return results
+
+
+def _write_json(results, filename):
+    with open(filename, "w") as f:
+        json.dump(results, f, indent=4)
+
+
+def _measure(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--runtimes", type=int, default=10)
+    parser.add_argument("--benchmarks", type=int, default=100)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--output-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    results = _generate_results(
+        args.runtimes, args.benchmarks, args.iterations, args.output_size
+    )
+
+    formats = {"json": (_write_json, ".json")}
+    for compression in compact.COMPRESSIONS:
+        if compression == "zstd" and compact.zstandard is None:
+            continue
+        formats[f"compact ({compression})"] = (
+            lambda r, f, c=compression: compact.write_compact(r, f, c),
+            compact.EXTENSION,
+        )
+
+    print(f"{'format':<20} {'size (KiB)':>12} {'write (s)':>10} {'read (s)':>10}")
+    with tempfile.TemporaryDirectory() as folder:
+        for name, (write, extension) in formats.items():
+            filename = os.path.join(folder, "results" + extension)
+            write_time = _measure(write, results, filename)
+            read_time = _measure(utils.load_results_file, filename)
+            size = os.path.getsize(filename) / 1024
+            print(f"{name:<20} {size:>12.1f} {write_time:>10.3f} {read_time:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
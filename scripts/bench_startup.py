@@ -0,0 +1,122 @@
+"""Measures the startup time of the wasure commands
+
+Runs `wasure <command> --help` for every command and reports the median time
+and the heavy modules it imported. Fails if a command imports a heavy module
+it doesn't need, or if its median time is above --max-ms, so that commands
+keep starting quickly. Also fails if the description of a command in
+wasure.tools.commands, shown by --help without importing the command, isn't
+the first line of the docstring of its module.
+
+Usage: python scripts/bench_startup.py [--repeat N] [--max-ms MS]
+"""
+
+import argparse
+import ast
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, ROOT)
+
+from wasure.tools import commands  # noqa: E402
+
+HEAVY_MODULES = ("matplotlib", "numpy", "psutil")
+
+# Heavy modules each command is allowed to import when it starts
+ALLOWED = {
+    "plot": {"matplotlib", "numpy"},
+    "trend": {"numpy"},
+    "export": {"numpy"},
+    "compare": {"numpy"},
+    "summary": {"numpy"},
+    "report": {"numpy"},
+}
+
+# Runs wasure and prints the heavy modules that were imported
+_CHILD = f"""
+import atexit, sys
+atexit.register(lambda: print(
+    ",".join(m for m in {HEAVY_MODULES!r} if m in sys.modules), file=sys.stderr
+))
+sys.argv = ["wasure"] + sys.argv[1:]
+from wasure.wasure import main
+sys.exit(main())
+"""
+
+
+def _measure(arguments, repeat):
+    """Return the median time in ms of a wasure invocation and the heavy
+    modules it imported."""
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        process = subprocess.run(
+            [sys.executable, "-c", _CHILD, *arguments],
+            capture_output=True,
+            text=True,
+            cwd=ROOT,
+        )
+        times.append((time.perf_counter() - start) * 1000)
+
+    lines = process.stderr.strip().splitlines()
+    imported = set(filter(None, lines[-1].split(","))) if lines else set()
+    return statistics.median(times), imported
+
+
+def _stale_descriptions():
+    """Return the (command, description, docstring line) of the commands
+    whose description isn't the first line of the docstring of their module.
+    The modules are parsed, not imported, to not load their dependencies."""
+
+    stale = []
+    for command, description in commands.items():
+        path = os.path.join(ROOT, "wasure", "tools", f"{command}.py")
+        with open(path) as f:
+            docstring = ast.get_docstring(ast.parse(f.read())) or ""
+        first_line = docstring.splitlines()[0] if docstring else ""
+        if description != first_line:
+            stale.append((command, description, first_line))
+    return stale
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--max-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    baseline, _ = _measure(["--version"], args.repeat)
+    print(f"{'command':<20} {'time (ms)':>10}  heavy modules")
+    print(f"{'--version':<20} {baseline:>10.0f}")
+
+    failed = False
+    for command in commands:
+        elapsed, imported = _measure([command, "--help"], args.repeat)
+        unexpected = imported - ALLOWED.get(command, set())
+        slow = args.max_ms is not None and elapsed > args.max_ms
+        failed |= bool(unexpected) or slow
+
+        note = ", ".join(sorted(imported))
+        if unexpected:
+            note += f"  UNEXPECTED: {', '.join(sorted(unexpected))}"
+        if slow:
+            note += f"  SLOWER THAN {args.max_ms:.0f} ms"
+        print(f"{command:<20} {elapsed:>10.0f}  {note}")
+
+    for command, description, first_line in _stale_descriptions():
+        failed = True
+        print(
+            f"STALE DESCRIPTION of {command}: {description!r} in "
+            f"wasure.tools.commands, {first_line!r} in its docstring"
+        )
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,26 @@
-from . import benchmarks, check, export, plot, run, runtimes
+import importlib
 
+# Description of each command. Every command is a module of this package with
+# parse(parser) and main(args) functions, imported by load_command only when
+# the command runs, so that starting WASURE doesn't load the dependencies of
+# every command (e.g. matplotlib for plot). The descriptions are the first
+# line of the docstrings of the modules, which scripts/bench_startup.py checks.
 commands: dict = {
-    "benchmarks": benchmarks,
-    "run": run,
-    "runtimes": runtimes,
-    "plot": plot,
-    "export": export,
-    "check": check,
+    "benchmarks": "Manages installed benchmarks",
+    "run": "Runs benchmarks using runtimes",
+    "runtimes": "Manages WebAssembly runtimes",
+    "plot": "Plots results of the benchmarks",
+    "export": "Exports results to CSV, JSON Lines, SQLite or OpenMetrics files",
+    "check": "Checks a benchmark suite on runtimes",
+    "db": "Stores results in a SQLite database",
+    "compare": "Compares two results files and detects regressions",
+    "summary": "Ranks the runtimes by their mean speedup over a baseline",
+    "trend": "Tracks the results of the benchmarks over time",
+    "report": "Generates a self-contained HTML report of a results file",
 }
+
+
+def load_command(name):
+    """Import the module of a command."""
+
+    return importlib.import_module(f".{name}", __name__)
@@ -3,6 +3,7 @@
 This module provides a command-line interface (CLI) for managing WebAssembly benchmarks.
 """
 
+import itertools
 import json
 import logging
 import os
@@ -94,12 +95,112 @@ def _parse_benchmark_json(file):
         return []
 
     return [
-        benchmark
+        variant
         for benchmark in benchmarks
         if "name" in benchmark and "path" in benchmark
+        for variant in _expand_parameters(benchmark)
     ]
 
 
+def _expand_parameters(benchmark):
+    """Expand a benchmark with parameter sweeps into its variants.
+
+    Each entry of the "parameters" field maps a placeholder used in "args" to
+    a value, a list of values or a range of values (see _parameter_values).
+    One variant is created for every combination of values, named after the
+    benchmark and the values it uses.
+
+    Example:
+        {
+            "name": "bench",
+            "path": "bench.wasm",
+            "args": "{threads}",
+            "parameters": {"threads": [1, 2]}
+        }
+
+        becomes
+
+        [
+            {"name": "bench@threads=1", ..., "parameters": {"threads": 1}},
+            {"name": "bench@threads=2", ..., "parameters": {"threads": 2}}
+        ]
+
+    Args:
+        benchmark (dict): The benchmark definition.
+
+    Returns:
+        list: List of benchmark variants. Contains only the benchmark itself
+              if it has no parameters.
+    """
+
+    parameters = benchmark.get("parameters")
+    if not parameters:
+        return [benchmark]
+
+    if "path" in parameters:
+        logging.warning(
+            f"Parameter 'path' is reserved. Ignoring it in benchmark {benchmark['name']}."
+        )
+        parameters = {k: v for k, v in parameters.items() if k != "path"}
+
+    names = list(parameters)
+    values = [_parameter_values(v) for v in parameters.values()]
+
+    return [
+        {
+            **benchmark,
+            "name": benchmark["name"]
+            + "@"
+            + ",".join(f"{k}={v}" for k, v in zip(names, combination)),
+            "parameters": dict(zip(names, combination)),
+        }
+        for combination in itertools.product(*values)
+    ]
+
+
+def _parameter_values(value):
+    """Return the list of values of a benchmark parameter.
+
+    A parameter can be a single value, a list of values or a range, defined
+    as an object with "start" and "stop" (both included) and either a "step"
+    that is added or a "factor" that multiplies the value at each step.
+
+    Example:
+        8                                      -> [8]
+        [1, 2, 4]                              -> [1, 2, 4]
+        {"start": 1000, "stop": 5000, "step": 2000} -> [1000, 3000, 5000]
+        {"start": 1, "stop": 8, "factor": 2}   -> [1, 2, 4, 8]
+
+    Args:
+        value: The value of the parameter in the benchmark definition.
+
+    Returns:
+        list: List of values of the parameter. Empty if the range is invalid.
+    """
+
+    if isinstance(value, list):
+        return value
+    if not isinstance(value, dict):
+        return [value]
+
+    start, stop = value.get("start"), value.get("stop")
+    step, factor = value.get("step"), value.get("factor")
+
+    if start is None or stop is None or not (
+        (step and step > 0) or (factor and factor > 1)
+    ):
+        logging.warning(f"Invalid parameter range {value}. Skipping.")
+        return []
+
+    values = []
+    current = start
+    while current <= stop:
+        values.append(current)
+        current = current + step if step else current * factor
+
+    return values
+
+
 def list_groups(folder=utils.DEFAULT_BENCHMARKS_FOLDER):
     """List all groups in the benchmarks folder.
 
@@ -172,16 +273,43 @@ def list_benchmarks(folder=utils.DEFAULT_BENCHMARKS_FOLDER):
     return benchmarks
 
 
+def get_benchmark_groups(folder=utils.DEFAULT_BENCHMARKS_FOLDER):
+    """Map the name of each benchmark to its group.
+
+    Args:
+        folder (str): Path to the folder containing benchmarks.
+
+    Returns:
+        dict: The group of each benchmark, variants included. A name used in
+              several groups is mapped to the first one.
+
+              Example:
+                {
+                    "coremark-1000": "coremark",
+                    "bench@threads=8": "group1"
+                }
+    """
+
+    groups = {}
+    for group, benchmarks in list_benchmarks(folder).items():
+        for benchmark in benchmarks:
+            groups.setdefault(benchmark["name"], group)
+    return groups
+
+
 def get_benchmark_from_name(name, folder=utils.DEFAULT_BENCHMARKS_FOLDER):
     """Get benchmark information from a name.
     Args:
         name (str): Name of the benchmark. Can be a group name or a
                     group/benchmark name.
                     Example: "coremark" or "coremark/coremark-1000"
+                    A benchmark with parameters can be chosen by its name
+                    (selecting all its variants) or by the name of a variant.
+                    Example: "group/bench" or "group/bench@threads=8"
     Returns:
         dict: Dictionary containing benchmark information. Returns None if
-              the benchmark is not found. A single benchmark is returned in a
-              list with the name of its group.
+              the benchmark is not found. A single benchmark (or its
+              variants) is returned in a list with the name of its group.
 
               Example:
                 {
@@ -206,11 +334,14 @@ def get_benchmark_from_name(name, folder=utils.DEFAULT_BENCHMARKS_FOLDER):
         logging.warning(f"Benchmark group {group} not found.")
         return None
 
-    benchmark_info = next(
-        (b for b in benchmarks[group] if b["name"] == benchmark), None
-    )
+    # Selecting a benchmark by its base name selects all of its variants
+    benchmark_info = [
+        b
+        for b in benchmarks[group]
+        if b["name"] == benchmark or b["name"].partition("@")[0] == benchmark
+    ]
     if benchmark_info:
-        return {group: [benchmark_info]}
+        return {group: benchmark_info}
 
     logging.warning(f"Benchmark {benchmark} not found in group {group}.")
     return None
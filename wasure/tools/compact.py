@@ -0,0 +1,214 @@
+"""Reads and writes results in a compact format
+
+Results in the compact format store the metrics of the iterations of each
+(runtime, benchmark) pair as typed arrays: int64 elapsed times, float64 scores
+and int32 return codes. Outputs are stored once and referenced by their hash,
+since many iterations print the same output. The file can be compressed with
+gzip or, if the zstandard package is installed, with zstd.
+
+The file starts with MAGIC and a byte with the compression. The (compressed)
+payload is a little-endian uint32 with the length of a JSON header, the header
+and the binary data. The header lists the pairs, with the offset and length of
+their arrays in the binary data, and the table of outputs with their hash,
+offset and length. Each pair references its outputs with an int32 array of
+indices in the table (-1 for iterations with no output).
+"""
+
+import array
+import gzip
+import hashlib
+import json
+import logging
+import struct
+import sys
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+MAGIC = b"WASURE\x01"
+EXTENSION = ".wasure"
+
+COMPRESSIONS = {"none": 0, "gzip": 1, "zstd": 2}
+
+# Keys of an iteration stored as typed arrays, with their array type code
+_ARRAYS = {"elapsed_time_ns": "q", "score": "d", "return_code": "i"}
+
+# Keys of an iteration that have their own field in a pair
+_FIELDS = tuple(_ARRAYS) + ("output", "stats")
+
+
+def is_compact_file(file_path):
+    """Return True if the file is in the compact format."""
+
+    try:
+        with open(file_path, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def _compress(data, compression):
+    if compression == "gzip":
+        return gzip.compress(data, compresslevel=6)
+    if compression == "zstd":
+        return zstandard.ZstdCompressor().compress(data)
+    return data
+
+
+def _decompress(data, compression):
+    if compression == "gzip":
+        return gzip.decompress(data)
+    if compression == "zstd":
+        if zstandard is None:
+            raise ValueError("zstd compression needs the zstandard package")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return data
+
+
+def _to_bytes(values, typecode):
+    values = array.array(typecode, values)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values.tobytes()
+
+
+def _from_bytes(data, typecode):
+    values = array.array(typecode)
+    values.frombytes(data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values.tolist()
+
+
+def write_compact(results, filename, compression="gzip"):
+    """Write results to a file in the compact format.
+
+    Args:
+        results (dict): The results, in the format written by run.
+        filename (str): The file to write to.
+        compression (str): One of "none", "gzip" and "zstd".
+    """
+
+    if compression == "zstd" and zstandard is None:
+        logging.warning("zstandard package not installed. Using gzip instead.")
+        compression = "gzip"
+
+    blob = bytearray()
+    outputs = {}  # Hash of an output -> its index in output_table
+    output_table = []
+    pairs = []
+
+    def append(data):
+        offset = len(blob)
+        blob.extend(data)
+        return [offset, len(data)]
+
+    for runtime, benchmarks in results.items():
+        for benchmark, runs in benchmarks.items():
+            pair = {"runtime": runtime, "benchmark": benchmark}
+            pairs.append(pair)
+
+            # Pairs with no iterations (e.g. failed AOT compilation)
+            if runs is None:
+                pair["count"] = None
+                continue
+
+            pair["count"] = len(runs)
+            for key, typecode in _ARRAYS.items():
+                pair[key] = append(
+                    _to_bytes([run.get(key) or 0 for run in runs], typecode)
+                )
+
+            if any("output" in run for run in runs):
+                references = []
+                for run in runs:
+                    if "output" not in run:
+                        references.append(-1)
+                        continue
+                    data = run["output"].encode()
+                    digest = hashlib.sha256(data).hexdigest()
+                    if digest not in outputs:
+                        outputs[digest] = len(output_table)
+                        output_table.append([digest, *append(data)])
+                    references.append(outputs[digest])
+                pair["output"] = append(_to_bytes(references, "i"))
+
+            if any("stats" in run for run in runs):
+                pair["stats"] = [run.get("stats") for run in runs]
+
+            extra = [{k: v for k, v in run.items() if k not in _FIELDS} for run in runs]
+            if any(extra):
+                pair["extra"] = extra
+
+    header = json.dumps(
+        {"version": 1, "pairs": pairs, "outputs": output_table}, separators=(",", ":")
+    ).encode()
+    payload = struct.pack("<I", len(header)) + header + bytes(blob)
+
+    with open(filename, "wb") as f:
+        f.write(MAGIC + bytes([COMPRESSIONS[compression]]))
+        f.write(_compress(payload, compression))
+
+
+def iter_compact(file_path, include_output=False):
+    """Iterate over the pairs of a file in the compact format.
+
+    Yields:
+        tuple: The runtime, the benchmark and the list of its iterations, or
+               None if the pair has no iterations.
+    """
+
+    with open(file_path, "rb") as f:
+        data = f.read()
+
+    compression = {v: k for k, v in COMPRESSIONS.items()}[data[len(MAGIC)]]
+    payload = _decompress(data[len(MAGIC) + 1 :], compression)
+
+    (header_length,) = struct.unpack_from("<I", payload)
+    header = json.loads(payload[4 : 4 + header_length])
+    blob = memoryview(payload)[4 + header_length :]
+
+    def read(offset, length):
+        return blob[offset : offset + length]
+
+    for pair in header["pairs"]:
+        if pair["count"] is None:
+            yield pair["runtime"], pair["benchmark"], None
+            continue
+
+        columns = {
+            key: _from_bytes(read(*pair[key]), typecode)
+            for key, typecode in _ARRAYS.items()
+        }
+        references = None
+        if include_output and "output" in pair:
+            references = _from_bytes(read(*pair["output"]), "i")
+
+        runs = []
+        for index in range(pair["count"]):
+            run = {key: columns[key][index] for key in _ARRAYS}
+            if references is not None and references[index] >= 0:
+                _, offset, length = header["outputs"][references[index]]
+                run["output"] = bytes(read(offset, length)).decode()
+            if pair.get("stats") and pair["stats"][index] is not None:
+                run["stats"] = pair["stats"][index]
+            if pair.get("extra"):
+                run.update(pair["extra"][index])
+            runs.append(run)
+
+        yield pair["runtime"], pair["benchmark"], runs
+
+
+def read_compact(file_path):
+    """Read results from a file in the compact format.
+
+    Returns:
+        dict: The results, in the format written by run.
+    """
+
+    results = {}
+    for runtime, benchmark, runs in iter_compact(file_path, include_output=True):
+        results.setdefault(runtime, {})[benchmark] = runs
+    return results
@@ -0,0 +1,257 @@
+"""Compares two results files and detects regressions
+
+For each runtime and benchmark in both files, the samples of the candidate
+are compared with the ones of the baseline with a Mann-Whitney U test. The
+speedup is the ratio between the medians, with its bootstrap confidence
+interval. A change is reported when it is significant and larger than the
+threshold. A runtime and benchmark of the baseline that is missing from the
+candidate, or has no successful iteration there, is reported as missing. The
+command exits with EXIT_REGRESSIONS if there are regressions or missing
+benchmarks, so that it can be used to gate changes (e.g. runtime updates) in
+CI, and with EXIT_INPUT_ERROR if the results can't be compared.
+"""
+
+import logging
+import sys
+
+import numpy as np
+
+from . import utils
+from .statistics import (
+    BOOTSTRAP_RESAMPLES,
+    CONFIDENCE,
+    bootstrap_ratio_ci,
+    load_samples,
+    mann_whitney_u,
+)
+
+DEFAULT_THRESHOLD = 0.05
+DEFAULT_ALPHA = 0.05
+
+EXIT_REGRESSIONS = 1
+EXIT_INPUT_ERROR = 2
+
+
+def parse(parser):
+    """Parse command-line arguments for the compare module."""
+
+    parser.add_argument(
+        "baseline",
+        help="""Path to the baseline results file. For a database, the name of
+            the run can follow the path after a '#' (default: the most recent run)""",
+    )
+
+    parser.add_argument(
+        "candidate",
+        help="Path to the candidate results file, as the baseline",
+    )
+
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help=f"""Minimum relative change to report, e.g. 0.05 for 5%%
+            (default: {DEFAULT_THRESHOLD})""",
+    )
+
+    parser.add_argument(
+        "--alpha",
+        type=float,
+        default=DEFAULT_ALPHA,
+        help=f"Significance level of the test (default: {DEFAULT_ALPHA})",
+    )
+
+    parser.add_argument(
+        "--resamples",
+        type=int,
+        default=BOOTSTRAP_RESAMPLES,
+        help=f"""Number of bootstrap resamples of the confidence interval of the
+            speedup (default: {BOOTSTRAP_RESAMPLES})""",
+    )
+
+    utils.add_log_level_argument(parser)
+
+    return parser
+
+
+def _metric(baseline, candidate):
+    """Return the metric to compare and whether higher values are better.
+    As in plot, the score is used if any of the two has a score > 0,
+    otherwise the elapsed time."""
+
+    if baseline["score"].max() > 0 or candidate["score"].max() > 0:
+        return "score", True
+    return "elapsed_time_ns", False
+
+
+def compare_results(baseline, candidate, threshold, alpha, resamples):
+    """Compare the samples of the runtimes and benchmarks in both results.
+
+    Args:
+        baseline (dict): The samples of the baseline, as returned by
+                         statistics.load_samples.
+        candidate (dict): The samples of the candidate.
+        threshold (float): Minimum relative change to report.
+        alpha (float): Significance level of the test.
+        resamples (int): Number of bootstrap resamples.
+
+    Returns:
+        list: A dict for each runtime and benchmark in both results, with the
+              runtime, the benchmark, the metric, the median of the baseline
+              and of the candidate, the speedup (> 1 if the candidate is
+              better) with its confidence interval (ci_low, ci_high), the
+              p-value and the status: "regression", "improvement" or
+              "unchanged". Then a dict for each runtime and benchmark of the
+              baseline missing from the candidate, with the status "missing"
+              and None for the values.
+    """
+
+    comparisons, numerators, denominators = [], [], []
+    missing = [
+        {
+            "runtime": runtime,
+            "benchmark": benchmark,
+            "metric": None,
+            "baseline": None,
+            "candidate": None,
+            "speedup": None,
+            "ci_low": None,
+            "ci_high": None,
+            "p_value": None,
+            "status": "missing",
+        }
+        for runtime, benchmarks in baseline.items()
+        for benchmark in benchmarks
+        if benchmark not in candidate.get(runtime, {})
+    ]
+    for comparison in missing:
+        logging.warning(
+            f"{comparison['benchmark']} with {comparison['runtime']} has no "
+            "successful iterations in the candidate."
+        )
+
+    for runtime, benchmarks in candidate.items():
+        for benchmark, candidate_data in benchmarks.items():
+            baseline_data = baseline.get(runtime, {}).get(benchmark)
+            if baseline_data is None:
+                logging.info(f"{benchmark} with {runtime} is not in the baseline.")
+                continue
+
+            metric, higher_is_better = _metric(baseline_data, candidate_data)
+            old, new = baseline_data[metric], candidate_data[metric]
+
+            # The speedup is > 1 when the candidate is better
+            numerator, denominator = (new, old) if higher_is_better else (old, new)
+            numerators.append(numerator)
+            denominators.append(denominator)
+
+            _, p_value = mann_whitney_u(old, new)
+            comparisons.append(
+                {
+                    "runtime": runtime,
+                    "benchmark": benchmark,
+                    "metric": metric,
+                    "baseline": float(np.median(old)),
+                    "candidate": float(np.median(new)),
+                    "p_value": p_value,
+                }
+            )
+
+    if not comparisons:
+        return missing
+
+    lower, upper = bootstrap_ratio_ci(numerators, denominators, resamples=resamples)
+    for i, comparison in enumerate(comparisons):
+        numerator, denominator = np.median(numerators[i]), np.median(denominators[i])
+        speedup = float(numerator / denominator) if denominator else float("nan")
+        comparison.update(
+            {"speedup": speedup, "ci_low": float(lower[i]), "ci_high": float(upper[i])}
+        )
+
+        status = "unchanged"
+        if comparison["p_value"] < alpha:
+            if speedup <= 1 - threshold:
+                status = "regression"
+            elif speedup >= 1 + threshold:
+                status = "improvement"
+        comparison["status"] = status
+
+    return comparisons + missing
+
+
+def _print_comparisons(comparisons, confidence):
+    """Prints the comparisons as a table, missing benchmarks and regressions
+    first. Statuses are colored on a terminal."""
+
+    order = {"missing": 0, "regression": 1, "improvement": 2, "unchanged": 3}
+    comparisons = sorted(
+        comparisons, key=lambda c: (order[c["status"]], c["speedup"] or 0)
+    )
+    colors = {
+        "missing": "\033[91m",
+        "regression": "\033[91m",
+        "improvement": "\033[92m",
+        "unchanged": "",
+    }
+    if not sys.stdout.isatty():
+        colors = dict.fromkeys(colors, "")
+
+    print(
+        f"{'benchmark':<30} {'runtime':<20} {'baseline':>14} {'candidate':>14} "
+        f"{'speedup':>8} {f'{confidence:.0%} CI':>17} {'p-value':>8}  status"
+    )
+    for c in comparisons:
+        color = colors[c["status"]]
+        reset = "\033[0m" if color else ""
+        if c["status"] == "missing":
+            print(
+                f"{c['benchmark']:<30} {c['runtime']:<20} {'-':>14} {'-':>14} "
+                f"{'-':>8} {'-':>17} {'-':>8}  {color}{c['status']}{reset}"
+            )
+            continue
+
+        interval = f"[{c['ci_low']:.3f}, {c['ci_high']:.3f}]"
+        print(
+            f"{c['benchmark']:<30} {c['runtime']:<20} {c['baseline']:>14.6g} "
+            f"{c['candidate']:>14.6g} {c['speedup']:>7.3f}x {interval:>17} "
+            f"{c['p_value']:>8.3g}  {color}{c['status']}{reset}"
+        )
+
+
+def main(args):
+    logging.getLogger().setLevel(getattr(logging, args.log_level.upper()))
+
+    samples = []
+    for results_file in (args.baseline, args.candidate):
+        results_file = utils.get_absolute_path(results_file)
+        # A broken file must not look like missing benchmarks. KeyError is an
+        # unknown compression of a compact file.
+        try:
+            samples.append(
+                load_samples(utils.iter_results_file(results_file, strict=True))
+            )
+        except (OSError, ValueError, KeyError) as e:
+            logging.error(f"Cannot read {results_file}: {e!r}")
+            return EXIT_INPUT_ERROR
+        if not samples[-1]:
+            logging.error(f"No valid results found in {results_file}.")
+            return EXIT_INPUT_ERROR
+
+    comparisons = compare_results(*samples, args.threshold, args.alpha, args.resamples)
+    if not any(c["status"] != "missing" for c in comparisons):
+        logging.error("No benchmarks and runtimes in common.")
+        return EXIT_INPUT_ERROR
+
+    _print_comparisons(comparisons, CONFIDENCE)
+
+    counts = {
+        status: sum(c["status"] == status for c in comparisons)
+        for status in ("regression", "improvement", "unchanged", "missing")
+    }
+    print(
+        f"\n{counts['regression']} regressions, {counts['improvement']} "
+        f"improvements, {counts['unchanged']} unchanged, {counts['missing']} "
+        f"missing (threshold {args.threshold:.0%}, alpha {args.alpha})"
+    )
+
+    return EXIT_REGRESSIONS if counts["regression"] or counts["missing"] else 0
@@ -0,0 +1,542 @@
+"""Stores results in a SQLite database
+
+This module provides a command-line interface to import results files into a
+SQLite database and to query the results of many runs at once. Results are
+stored in tables for runs, runtimes (with their versions), benchmarks,
+iterations and stats, indexed on runtime, benchmark and timestamp.
+"""
+
+import datetime
+import json
+import logging
+import os
+import sqlite3
+
+from . import utils
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    timestamp TEXT NOT NULL,
+    source TEXT
+);
+CREATE TABLE IF NOT EXISTS runtimes (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    version TEXT NOT NULL DEFAULT '',
+    UNIQUE (name, version)
+);
+CREATE TABLE IF NOT EXISTS benchmarks (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS iterations (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    runtime_id INTEGER NOT NULL REFERENCES runtimes (id),
+    benchmark_id INTEGER NOT NULL REFERENCES benchmarks (id),
+    timestamp TEXT NOT NULL,
+    iteration INTEGER NOT NULL,
+    elapsed_time_ns INTEGER,
+    score REAL,
+    return_code INTEGER,
+    output TEXT,
+    extra TEXT
+);
+CREATE TABLE IF NOT EXISTS stats (
+    iteration_id INTEGER NOT NULL REFERENCES iterations (id),
+    name TEXT NOT NULL,
+    value
+);
+CREATE INDEX IF NOT EXISTS iterations_runtime_benchmark_timestamp
+    ON iterations (runtime_id, benchmark_id, timestamp);
+CREATE INDEX IF NOT EXISTS iterations_run ON iterations (run_id);
+CREATE INDEX IF NOT EXISTS stats_iteration ON stats (iteration_id);
+"""
+
+# Keys of an iteration that have their own column
+_ITERATION_COLUMNS = ("elapsed_time_ns", "score", "return_code", "output", "stats")
+
+
+def parse(parser):
+    """Parse command-line arguments for the db module.
+
+    Args:
+        parser (ArgumentParser): The argument parser to add subcommands to.
+    """
+
+    # We use os.path.dirname two times because the script is in the tools
+    # folder and we want to get the runtimes folder.
+    script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    subparsers = parser.add_subparsers(dest="operation", required=True)
+
+    # "import" command to import results files
+    import_parser = subparsers.add_parser(
+        "import",
+        help=import_results_file.__doc__.split("\n")[0],
+        description=import_results_file.__doc__.split("\n")[0],
+    )
+
+    import_parser.add_argument(
+        "results_files",
+        nargs="+",
+        help="Paths to the results files to import",
+    )
+
+    import_parser.add_argument(
+        "--no-store-output",
+        action="store_true",
+        default=False,
+        help="Do not import the output of the benchmarks (default: False)",
+    )
+
+    # "query" command to query the results
+    query_parser = subparsers.add_parser(
+        "query",
+        help=query_results.__doc__.split("\n")[0],
+        description=query_results.__doc__.split("\n")[0],
+    )
+
+    query_parser.add_argument(
+        "-r",
+        "--runtimes",
+        nargs="+",
+        default=None,
+        help="List of runtimes to show. Default: all",
+    )
+
+    query_parser.add_argument(
+        "-b",
+        "--benchmarks",
+        nargs="+",
+        default=None,
+        help="List of benchmarks to show. Default: all",
+    )
+
+    query_parser.add_argument(
+        "--since",
+        default=None,
+        help="Show only runs since this date (e.g. 2025-05-06). Default: all",
+    )
+
+    query_parser.add_argument(
+        "--last",
+        type=int,
+        default=None,
+        help="Show only the last N runs. Default: all",
+    )
+
+    for subparser in subparsers.choices.values():
+        subparser.add_argument(
+            "--db",
+            default=os.path.join(script_dir, utils.DEFAULT_DATABASE_FILE),
+            help=f"Path to the SQLite database (default: {utils.DEFAULT_DATABASE_FILE})",
+        )
+        utils.add_log_level_argument(subparser)
+
+    return parser
+
+
+def connect(db_file):
+    """Open the database, creating it and its tables if needed."""
+
+    os.makedirs(os.path.dirname(db_file) or ".", exist_ok=True)
+    connection = sqlite3.connect(db_file)
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def _run_timestamp(name, source=None):
+    """Return the timestamp of a run from its name (YYYY-mm-dd_HH-MM-SS), or
+    from the modification time of its source file."""
+
+    try:
+        date = datetime.datetime.strptime(name, "%Y-%m-%d_%H-%M-%S")
+    except ValueError:
+        if source and os.path.exists(source):
+            date = datetime.datetime.fromtimestamp(os.path.getmtime(source))
+        else:
+            date = datetime.datetime.now()
+
+    return date.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _get_id(connection, table, **values):
+    """Return the id of a row of a lookup table, inserting it if needed."""
+
+    columns = " AND ".join(f"{column} = ?" for column in values)
+    row = connection.execute(
+        f"SELECT id FROM {table} WHERE {columns}", tuple(values.values())
+    ).fetchone()
+    if row:
+        return row[0]
+
+    cursor = connection.execute(
+        f"INSERT INTO {table} ({', '.join(values)}) VALUES ({', '.join('?' * len(values))})",
+        tuple(values.values()),
+    )
+    return cursor.lastrowid
+
+
+def store_results(
+    connection, results, name, source=None, versions=None, store_output=True
+):
+    """Store the results of a run in the database.
+
+    Args:
+        connection (sqlite3.Connection): The database connection.
+        results (dict): The results, in the format written by run.
+        name (str): The name of the run, usually the name of its results file.
+        source (str): Path to the results file, if any.
+        versions (dict): Version of each runtime, if known.
+        store_output (bool): If False, the output of the benchmarks is not stored.
+
+    Returns:
+        bool: True if the run was stored, False if a run with the same name
+              already exists.
+    """
+
+    if connection.execute("SELECT 1 FROM runs WHERE name = ?", (name,)).fetchone():
+        logging.warning(f"Run {name} already in the database. Skipping.")
+        return False
+
+    versions = versions or {}
+    timestamp = _run_timestamp(name, source)
+
+    with connection:
+        run_id = connection.execute(
+            "INSERT INTO runs (name, timestamp, source) VALUES (?, ?, ?)",
+            (name, timestamp, source),
+        ).lastrowid
+
+        for runtime, benchmarks in results.items():
+            runtime_id = _get_id(
+                connection, "runtimes", name=runtime, version=versions.get(runtime, "")
+            )
+            for benchmark, runs in benchmarks.items():
+                benchmark_id = _get_id(connection, "benchmarks", name=benchmark)
+                for index, run in enumerate(runs or []):
+                    extra = {
+                        k: v for k, v in run.items() if k not in _ITERATION_COLUMNS
+                    }
+                    iteration_id = connection.execute(
+                        """INSERT INTO iterations (run_id, runtime_id, benchmark_id,
+                        timestamp, iteration, elapsed_time_ns, score, return_code,
+                        output, extra) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                        (
+                            run_id,
+                            runtime_id,
+                            benchmark_id,
+                            timestamp,
+                            index + 1,
+                            run.get("elapsed_time_ns"),
+                            run.get("score"),
+                            run.get("return_code"),
+                            run.get("output") if store_output else None,
+                            json.dumps(extra) if extra else None,
+                        ),
+                    ).lastrowid
+                    connection.executemany(
+                        "INSERT INTO stats (iteration_id, name, value) VALUES (?, ?, ?)",
+                        [
+                            (
+                                iteration_id,
+                                stat,
+                                json.dumps(value)
+                                if isinstance(value, (list, dict))
+                                else value,
+                            )
+                            for stat, value in run.get("stats", {}).items()
+                        ],
+                    )
+
+    logging.info(f"Stored run {name} in the database.")
+    return True
+
+
+def import_results_file(db_file, results_file, store_output=True):
+    """Import results files into the database.
+
+    Args:
+        db_file (str): Path to the SQLite database.
+        results_file (str): Path to the results file.
+        store_output (bool): If False, the output of the benchmarks is not imported.
+
+    Returns:
+        bool: True if the file was imported.
+    """
+
+    results = utils.load_results_file(results_file)
+    if not results:
+        return False
+
+    connection = connect(db_file)
+    try:
+        return store_results(
+            connection,
+            results,
+            utils.get_results_name(results_file),
+            source=results_file,
+            store_output=store_output,
+        )
+    finally:
+        connection.close()
+
+
+def list_runs(db_file):
+    """Return the names of the runs in the database, oldest first."""
+
+    connection = connect(db_file)
+    try:
+        return [
+            row[0]
+            for row in connection.execute("SELECT name FROM runs ORDER BY timestamp")
+        ]
+    finally:
+        connection.close()
+
+
+def _find_run(connection, run=None):
+    """Return the row with the id of a run, or of the most recent run if run
+    is None. None if the run is not found."""
+
+    if run:
+        return connection.execute(
+            "SELECT id FROM runs WHERE name = ?", (run,)
+        ).fetchone()
+    return connection.execute(
+        "SELECT id FROM runs ORDER BY timestamp DESC LIMIT 1"
+    ).fetchone()
+
+
+def load_run(db_file, run=None):
+    """Load the results of a run from the database.
+
+    Args:
+        db_file (str): Path to the SQLite database.
+        run (str): Name of the run. Default: the most recent run.
+
+    Returns:
+        dict: The results, in the format written by run. None if the run is
+              not found.
+    """
+
+    connection = connect(db_file)
+    try:
+        row = _find_run(connection, run)
+        if not row:
+            logging.error(f"Run {run or ''} not found in {db_file}.")
+            return None
+
+        stats = {}
+        for iteration_id, name, value in connection.execute(
+            """SELECT stats.iteration_id, stats.name, stats.value FROM stats
+            JOIN iterations ON iterations.id = stats.iteration_id
+            WHERE iterations.run_id = ?""",
+            (row[0],),
+        ):
+            if isinstance(value, str) and value[:1] in "[{":
+                try:
+                    value = json.loads(value)
+                except json.JSONDecodeError:
+                    pass
+            stats.setdefault(iteration_id, {})[name] = value
+
+        results = {}
+        for (
+            iteration_id,
+            runtime,
+            benchmark,
+            elapsed_time,
+            score,
+            return_code,
+            output,
+            extra,
+        ) in connection.execute(
+            """SELECT iterations.id, runtimes.name, benchmarks.name,
+            elapsed_time_ns, score, return_code, output, extra FROM iterations
+            JOIN runtimes ON runtimes.id = iterations.runtime_id
+            JOIN benchmarks ON benchmarks.id = iterations.benchmark_id
+            WHERE run_id = ? ORDER BY iterations.id""",
+            (row[0],),
+        ):
+            results.setdefault(runtime, {}).setdefault(benchmark, []).append(
+                {
+                    "elapsed_time_ns": elapsed_time,
+                    "score": score,
+                    "return_code": return_code,
+                    **({"output": output} if output is not None else {}),
+                    **(json.loads(extra) if extra else {}),
+                    **(
+                        {"stats": stats[iteration_id]}
+                        if iteration_id in stats
+                        else {}
+                    ),
+                }
+            )
+
+        return results
+    finally:
+        connection.close()
+
+
+def load_runtime_versions(db_file, run=None):
+    """Load the version of each runtime of a run from the database.
+
+    Args:
+        db_file (str): Path to the SQLite database.
+        run (str): Name of the run. Default: the most recent run.
+
+    Returns:
+        dict: Dictionary mapping the name of each runtime to the first line of
+              its version. Runtimes stored without a version are left out.
+    """
+
+    connection = connect(db_file)
+    try:
+        row = _find_run(connection, run)
+        if not row:
+            return {}
+
+        return {
+            name: version.splitlines()[0]
+            for name, version in connection.execute(
+                """SELECT DISTINCT runtimes.name, runtimes.version FROM iterations
+                JOIN runtimes ON runtimes.id = iterations.runtime_id
+                WHERE run_id = ?""",
+                (row[0],),
+            )
+            if version
+        }
+    finally:
+        connection.close()
+
+
+def query_results(db_file, runtimes=None, benchmarks=None, since=None, last=None):
+    """Query aggregated results across runs.
+
+    Args:
+        db_file (str): Path to the SQLite database.
+        runtimes (list): Names of the runtimes. Default: all.
+        benchmarks (list): Names of the benchmarks. Default: all.
+        since (str): Only runs since this date (e.g. 2025-05-06). Default: all.
+        last (int): Only the last N runs. Default: all.
+
+    Returns:
+        list: One dictionary per run, runtime and benchmark, oldest run first,
+              with the run, its timestamp, the runtime and its version, the
+              benchmark, the number of successful iterations, the median
+              elapsed time and the average score.
+    """
+
+    conditions, parameters = ["iterations.return_code = 0"], []
+    if runtimes:
+        conditions.append(f"runtimes.name IN ({', '.join('?' * len(runtimes))})")
+        parameters.extend(runtimes)
+    if benchmarks:
+        conditions.append(f"benchmarks.name IN ({', '.join('?' * len(benchmarks))})")
+        parameters.extend(benchmarks)
+    if since:
+        conditions.append("iterations.timestamp >= ?")
+        parameters.append(since)
+    if last:
+        conditions.append(
+            "iterations.run_id IN (SELECT id FROM runs ORDER BY timestamp DESC LIMIT ?)"
+        )
+        parameters.append(last)
+
+    connection = connect(db_file)
+    try:
+        rows = connection.execute(
+            f"""SELECT runs.name, iterations.timestamp, runtimes.name,
+            runtimes.version, benchmarks.name, elapsed_time_ns, score
+            FROM iterations
+            JOIN runs ON runs.id = iterations.run_id
+            JOIN runtimes ON runtimes.id = iterations.runtime_id
+            JOIN benchmarks ON benchmarks.id = iterations.benchmark_id
+            WHERE {" AND ".join(conditions)}
+            ORDER BY iterations.timestamp, runtimes.name, benchmarks.name""",
+            parameters,
+        ).fetchall()
+    finally:
+        connection.close()
+
+    groups = {}
+    for run, timestamp, runtime, version, benchmark, elapsed_time, score in rows:
+        group = groups.setdefault(
+            (run, runtime, benchmark),
+            {
+                "run": run,
+                "timestamp": timestamp,
+                "runtime": runtime,
+                "version": version,
+                "benchmark": benchmark,
+                "elapsed_times": [],
+                "scores": [],
+            },
+        )
+        group["elapsed_times"].append(elapsed_time)
+        group["scores"].append(score or 0)
+
+    aggregated = []
+    for group in groups.values():
+        elapsed_times = sorted(group.pop("elapsed_times"))
+        scores = group.pop("scores")
+        middle = len(elapsed_times) // 2
+        aggregated.append(
+            {
+                **group,
+                "iterations": len(elapsed_times),
+                "median_elapsed_time_ns": (
+                    elapsed_times[middle]
+                    if len(elapsed_times) % 2
+                    else (elapsed_times[middle - 1] + elapsed_times[middle]) / 2
+                ),
+                "avg_score": sum(scores) / len(scores),
+            }
+        )
+
+    return aggregated
+
+
+def main(args):
+    logging.getLogger().setLevel(getattr(logging, args.log_level.upper()))
+
+    args.db = utils.get_absolute_path(args.db)
+
+    if args.operation == "import":
+        imported = 0
+        for results_file in args.results_files:
+            results_file = utils.get_absolute_path(results_file)
+            if not os.path.isfile(results_file):
+                logging.error(f"{results_file} not found. Skipping.")
+                continue
+            imported += import_results_file(
+                args.db, results_file, not args.no_store_output
+            )
+        print(f"Imported {imported} of {len(args.results_files)} results files.")
+
+    elif args.operation == "query":
+        rows = query_results(
+            args.db, args.runtimes, args.benchmarks, args.since, args.last
+        )
+        if not rows:
+            print("No results found.")
+            return
+
+        print(
+            f"{'timestamp':<20} {'runtime':<24} {'version':<20} {'benchmark':<32} "
+            f"{'n':>4} {'median time (ms)':>17} {'avg score':>12}"
+        )
+        for row in rows:
+            print(
+                f"{row['timestamp']:<20} {row['runtime']:<24} "
+                f"{row['version'].splitlines()[0] if row['version'] else '':<20} "
+                f"{row['benchmark']:<32} {row['iterations']:>4} "
+                f"{row['median_elapsed_time_ns'] / 1e6:>17.3f} {row['avg_score']:>12.3f}"
+            )
+
+    else:
+        print("Unknown operation. Use 'import' or 'query'.")
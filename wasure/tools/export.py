@@ -1,121 +1,545 @@
-"""Exports results to a CSV file"""
+"""Exports results to CSV, JSON Lines, SQLite or OpenMetrics files
 
+Every iteration is exported with every stat parsed from the output of the
+benchmarks. The stats of the iterations differ between runtimes and
+benchmarks, so a first pass over the results file discovers the columns,
+and a second pass writes the rows as they are read, so that the results are
+never fully loaded in memory.
+
+The OpenMetrics format instead writes gauges of the statistics of each
+runtime and benchmark, for the textfile collector of the Prometheus node
+exporter. The file is replaced atomically, so scrapers never read a partial
+file.
+"""
+
+import argparse
 import csv
+import json
 import logging
+import math
 import os
+import sqlite3
+import tempfile
 
 from . import utils
+from .statistics import (
+    BOOTSTRAP_RESAMPLES,
+    PERCENTILES,
+    compute_statistics,
+    find_outliers,
+    load_samples,
+)
+
+FORMATS = {
+    "csv": ".csv",
+    "jsonl": ".jsonl",
+    "sqlite": ".sqlite",
+    "openmetrics": ".prom",
+}
+DEFAULT_FORMAT = "csv"
+
+# The OpenMetrics file always has the same name, so that the textfile collector
+# exposes the latest results
+OPENMETRICS_FILE = "wasure.prom"
+OPENMETRICS_PREFIX = "wasure_benchmark_"
+OPENMETRICS_LABELS = ("runtime", "runtime_version", "benchmark")
+
+# Gauges of the OpenMetrics format: name -> (unit, help, metric, statistic,
+# divisor to the unit). Metrics other than the elapsed time and the score are
+# stats, and series without them are left out of their gauge, as are series
+# with a median score <= 0 from the score gauge.
+OPENMETRICS_GAUGES = {
+    "elapsed_time_seconds": (
+        "seconds",
+        "Median elapsed time of the iterations",
+        "elapsed_time_ns",
+        "median",
+        1e9,
+    ),
+    "score": ("", "Median score of the iterations", "score", "median", 1),
+    "peak_rss_bytes": (
+        "bytes",
+        "Peak resident set size of the iterations",
+        "max_rss_bytes",
+        "max",
+        1,
+    ),
+    "compile_time_seconds": (
+        "seconds",
+        "Median compile time of the iterations",
+        "compile_time_ns",
+        "median",
+        1e9,
+    ),
+    "iterations": (
+        "",
+        "Number of iterations, outliers excluded",
+        "elapsed_time_ns",
+        "count",
+        1,
+    ),
+}
+
+# Columns of every iteration, before the ones of the stats
+ITERATION_COLUMNS = [
+    "runtime",
+    "benchmark",
+    "run_index",
+    "elapsed_time_ns",
+    "score",
+    "return_code",
+    "outlier",
+]
+
+# Statistics of each series of the summary
+SUMMARY_STATISTICS = ["count", "avg", "median", "stddev", "mad", "min", "max"]
+SUMMARY_STATISTICS += [f"p{percentile}" for percentile in PERCENTILES]
+SUMMARY_STATISTICS += ["ci_low", "ci_high", "outliers"]
+
+SUMMARY_COLUMNS = (
+    ["runtime", "benchmark", "metric"] + SUMMARY_STATISTICS + ["outlier_policy"]
+)
 
 
 def parse(parser):
-    """Parse command-line arguments for the runtime module."""
+    """Parse command-line arguments for the export module."""
 
     # We use os.path.dirname two times because the script is in the tools
-    # folder and we want to get the runtimes folder.
+    # folder and we want to get the results folder.
     script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
     parser.add_argument(
         "results_file",
-        help="Path to the results file to plot",
+        help="Path to the results file to export",
         type=str,
     )
 
     parser.add_argument(
+        "--output-folder",
         "--csv-folder",
+        dest="output_folder",
         default=os.path.join(script_dir, utils.DEFAULT_RESULTS_FOLDER),
-        help=f"Path to the folder where CSVs will be saved (default: {utils.DEFAULT_RESULTS_FOLDER})",
+        help=f"""Path to the folder where the exported files will be saved
+            (default: {utils.DEFAULT_RESULTS_FOLDER})""",
+    )
+
+    parser.add_argument(
+        "--format",
+        choices=FORMATS,
+        default=DEFAULT_FORMAT,
+        help=f"""Format of the exported files: CSV, JSON Lines, a SQLite
+            database with an iterations and a summary table, or OpenMetrics
+            gauges for the Prometheus textfile collector, written to
+            {OPENMETRICS_FILE} (default: {DEFAULT_FORMAT})""",
     )
 
+    parser.add_argument(
+        "--runtimes-file",
+        default=os.path.join(script_dir, utils.DEFAULT_RUNTIMES_FILE),
+        help=f"""Path to the JSON file containing runtimes, to get their
+            versions for OpenMetrics when the results file is not a database
+            (default: {utils.DEFAULT_RUNTIMES_FILE})""",
+    )
+
+    parser.add_argument(
+        "--runtimes-folder",
+        default=os.path.join(script_dir, utils.DEFAULT_RUNTIMES_FOLDER),
+        help=f"Path to the folder containing runtimes (default: {utils.DEFAULT_RUNTIMES_FOLDER})",
+    )
+
+    # Every stat is exported now, memory included. Kept for compatibility.
     parser.add_argument(
         "--memory",
         action="store_true",
         default=False,
-        help="Include memory usage in the CSV file (default: False)",
+        help=argparse.SUPPRESS,
     )
 
+    parser.add_argument(
+        "--summary",
+        action="store_true",
+        default=False,
+        help="""Also export the statistics of each benchmark and runtime (median,
+            percentiles, standard deviation, MAD and bootstrap confidence
+            interval of the median), to a _summary file or to the summary
+            table of the database (default: False)""",
+    )
+
+    utils.add_outlier_arguments(parser)
     utils.add_log_level_argument(parser)
 
     return parser
 
 
-def _write_benchmark_results_to_csv(data, filename, memory):
-    """
-    Writes every run of benchmark results to a CSV file.
-
-    The input dict format is:
-    {
-        "benchmark_name": {
-            "runtime1": [
-                {"elapsed_time_ns": value1, "score": value2, ...},
-                ...
-            ],
-            ...
-        },
-        ...
+def _record_stats_keys(records, keys):
+    """Yield the records, adding the names of their stats to keys (a dict
+    used as an ordered set), so that they are discovered in the same pass
+    that loads the samples."""
+
+    for record in records:
+        for name in record[3].get("stats", {}):
+            keys.setdefault(name, None)
+        yield record
+
+
+def _find_outlier_iterations(samples, policy, threshold):
+    """Return the (runtime, benchmark, run index) of the iterations whose
+    elapsed time is an outlier, according to the outlier policy."""
+
+    keys, series = [], []
+    for runtime, benchmarks in samples.items():
+        for benchmark, data in benchmarks.items():
+            keys.append((runtime, benchmark, data["iterations"]))
+            series.append(data["elapsed_time_ns"])
+
+    return {
+        (runtime, benchmark, int(index))
+        for (runtime, benchmark, iterations), flagged in zip(
+            keys, find_outliers(series, policy, threshold)
+        )
+        for index in iterations[flagged]
     }
 
+
+def _iteration_rows(records, stats_keys, outliers=frozenset()):
+    """Yield a row of ITERATION_COLUMNS and stats_keys for each record.
+
     Args:
-        data (dict): Nested dictionary containing benchmark results.
-                     The outer keys are benchmark names, and the inner
-                     keys are runtime names.
-        filename (str): The name of the CSV file to write to.
-        memory (bool): If True, include memory usage in the CSV.
+        records (iterable): (runtime, benchmark, run index, run) records, as
+                            yielded by utils.iter_results_file.
+        stats_keys (list): The names of the stats, in the order of their
+                           columns. Missing stats are None.
+        outliers (set): The (runtime, benchmark, run index) of the runs
+                        marked as outliers.
     """
 
-    logging.debug("Exporting every run to CSV")
+    for runtime, benchmark, run_index, run in records:
+        stats = run.get("stats", {})
+        yield [
+            runtime,
+            benchmark,
+            run_index + 1,
+            run.get("elapsed_time_ns"),
+            run.get("score"),
+            run.get("return_code"),
+            (runtime, benchmark, run_index) in outliers,
+        ] + [stats.get(name) for name in stats_keys]
+
+
+def _summary_rows(statistics, outlier_policy):
+    """Yield a row of SUMMARY_COLUMNS for the elapsed time, the score and
+    each numeric runtime statistic of every runtime and benchmark.
+
+    Args:
+        statistics (dict): The statistics, as returned by
+                           statistics.compute_statistics.
+        outlier_policy (str): Description of the outlier policy used.
+    """
 
+    for runtime, benchmarks in statistics.items():
+        for benchmark, data in benchmarks.items():
+            metrics = {
+                "elapsed_time_ns": data["elapsed_time_ns"],
+                "score": data["score"],
+                **data["stats"],
+            }
+            for metric, values in metrics.items():
+                yield (
+                    [runtime, benchmark, metric]
+                    + [values.get(column) for column in SUMMARY_STATISTICS]
+                    + [outlier_policy]
+                )
+
+
+def _write_csv(filename, table, columns, rows):
+    """Write the rows to a CSV file, with a header. Stats that captured
+    every match are written as JSON lists, missing values as empty cells."""
+
+    count = 0
     with open(filename, mode="w", newline="") as csvfile:
         writer = csv.writer(csvfile)
+        writer.writerow(columns)
+        for row in rows:
+            writer.writerow(
+                [
+                    json.dumps(v) if isinstance(v, list) else "" if v is None else v
+                    for v in row
+                ]
+            )
+            count += 1
+    return count
+
+
+def _write_jsonl(filename, table, columns, rows):
+    """Write the rows to a JSON Lines file, an object for each row."""
+
+    count = 0
+    with open(filename, mode="w") as f:
+        for row in rows:
+            f.write(json.dumps(dict(zip(columns, row))) + "\n")
+            count += 1
+    return count
+
+
+def _write_sqlite(filename, table, columns, rows):
+    """Write the rows to a table of a SQLite database, replacing it. Stats
+    that captured every match are stored as JSON lists."""
+
+    with sqlite3.connect(filename) as conn:
+        names = ", ".join(f'"{column}"' for column in columns)
+        conn.execute(f'DROP TABLE IF EXISTS "{table}"')
+        conn.execute(f'CREATE TABLE "{table}" ({names})')
+        cursor = conn.executemany(
+            f'INSERT INTO "{table}" VALUES ({", ".join("?" * len(columns))})',
+            (
+                [json.dumps(v) if isinstance(v, list) else v for v in row]
+                for row in rows
+            ),
+        )
+        count = cursor.rowcount
+    conn.close()
+    return count
+
+
+WRITERS = {"csv": _write_csv, "jsonl": _write_jsonl, "sqlite": _write_sqlite}
 
-        # This is to leave out the output of the benchmark from the CSV
-        headers = [
-            "benchmark",
-            "runtime",
-            "run_index",
-            "elapsed_time_ns",
-            "score",
-            "return_code",
-        ]
-        if memory:
-            headers.extend(["max_rss_bytes", "max_vms_bytes"])
-
-        writer.writerow(headers)
-
-        for benchmark, runtimes in data.items():
-            for runtime, runs in runtimes.items():
-                for run_index, run in enumerate(runs):
-                    row = [
-                        benchmark,
-                        runtime,
-                        run_index + 1,
-                        run.get("elapsed_time_ns", ""),
-                        run.get("score", ""),
-                        run.get("return_code", ""),
-                    ]
-                    if memory:
-                        row.append(run.get("stats", {}).get("max_rss_bytes", ""))
-                        row.append(run.get("stats", {}).get("max_vms_bytes", ""))
-
-                    writer.writerow(row)
 
+def export_results(
+    results_file,
+    filename,
+    results_format=DEFAULT_FORMAT,
+    summary_filename=None,
+    outliers=utils.DEFAULT_OUTLIER_POLICY,
+    outlier_threshold=None,
+):
+    """Export every iteration of a results file, and optionally the summary
+    of its statistics.
+
+    Args:
+        results_file (str): Path to the results file.
+        filename (str): Path of the exported file.
+        results_format (str): Format of the exported files, one of FORMATS.
+        summary_filename (str): Path of the exported summary. Can be the same
+                                as filename for SQLite. No summary is
+                                exported if None.
+        outliers (str): The outlier policy, one of utils.OUTLIER_POLICIES.
+        outlier_threshold (float): Threshold of the outlier policy.
+
+    Returns:
+        int: The number of exported iterations.
+    """
+
+    write = WRITERS[results_format]
+
+    # The first pass finds the outliers, which need all the iterations of each
+    # benchmark, and the stats. Samples only hold numbers, so the file is
+    # still streamed.
+    stats_keys = {}
+    samples = load_samples(
+        _record_stats_keys(utils.iter_results_file(results_file), stats_keys)
+    )
+    flagged = _find_outlier_iterations(samples, outliers, outlier_threshold)
+
+    logging.debug(f"Exporting every iteration, with stats {list(stats_keys)}")
+    rows = _iteration_rows(utils.iter_results_file(results_file), stats_keys, flagged)
+    count = write(filename, "iterations", ITERATION_COLUMNS + list(stats_keys), rows)
+    if not count:
+        return 0
+    logging.info(f"Results exported to {filename}")
+
+    if summary_filename:
+        logging.debug("Exporting the summary")
+        statistics = compute_statistics(
+            samples,
+            resamples=BOOTSTRAP_RESAMPLES,
+            outliers=outliers,
+            outlier_threshold=outlier_threshold,
+        )
+        policy = utils.outlier_policy_name(outliers, outlier_threshold)
+        write(
+            summary_filename,
+            "summary",
+            SUMMARY_COLUMNS,
+            _summary_rows(statistics, policy),
+        )
+        logging.info(f"Summary exported to {summary_filename}")
+
+    return count
+
+
+def _write_atomic(filename, text):
+    """Write the text to a temporary file in the folder of filename, then
+    rename it to filename, so that readers see either the old or the new
+    file."""
+
+    folder, name = os.path.split(filename)
+    fd, temp = tempfile.mkstemp(prefix=f".{name}.", suffix=".tmp", dir=folder)
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp creates the file readable by its owner only, and the
+        # scraper may run as another user
+        os.chmod(temp, 0o644)
+        os.replace(temp, filename)
+    except BaseException:
+        os.remove(temp)
+        raise
+
+
+def _label_value(value):
+    """Escape a label value of the OpenMetrics text format."""
+
+    return (
+        str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    )
+
+
+def openmetrics_text(statistics, versions):
+    """Return the OpenMetrics text of OPENMETRICS_GAUGES.
+
+    Args:
+        statistics (dict): The statistics, as returned by
+                           statistics.compute_statistics.
+        versions (dict): Version of each runtime, if known. Configurations of
+                         a flag matrix share the version of their runtime.
+
+    Returns:
+        str: The gauges, with a runtime, runtime_version and benchmark label,
+             ending with the EOF marker.
+    """
+
+    lines = []
+    for gauge, definition in OPENMETRICS_GAUGES.items():
+        unit, description, metric, statistic, divisor = definition
+        name = OPENMETRICS_PREFIX + gauge
+        samples = []
+        for runtime, benchmarks in statistics.items():
+            version = versions.get(runtime, versions.get(runtime.partition("@")[0]))
+            for benchmark, data in benchmarks.items():
+                values = data.get(metric) or data["stats"].get(metric)
+                value = values.get(statistic) if values else None
+                if value is None or not math.isfinite(value):
+                    continue
+                # As in plot and compare, benchmarks without a score > 0 are
+                # measured by their elapsed time
+                if metric == "score" and value <= 0:
+                    continue
+                labels = ",".join(
+                    f'{label}="{_label_value(label_value)}"'
+                    for label, label_value in zip(
+                        OPENMETRICS_LABELS, (runtime, version or "", benchmark)
+                    )
+                )
+                samples.append(f"{name}{{{labels}}} {float(value) / divisor!r}")
+
+        if not samples:
+            continue
+        lines.append(f"# TYPE {name} gauge")
+        if unit:
+            lines.append(f"# UNIT {name} {unit}")
+        lines.append(f"# HELP {name} {description}.")
+        lines += samples
+
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+
+def _runtime_versions(results_file, runtimes_file, runtimes_folder):
+    """Return the version of each runtime: the one stored with the run for a
+    database, else the one of the installed runtimes."""
+
+    path, _, run = results_file.partition(utils.RUN_SEPARATOR)
+    if utils.is_database_file(path):
+        from . import db
+
+        return db.load_runtime_versions(path, run or None)
+
+    from . import runtimes
+
+    return runtimes.get_runtime_versions(runtimes_file, runtimes_folder)
+
+
+def export_openmetrics(
+    results_file,
+    filename,
+    versions,
+    outliers=utils.DEFAULT_OUTLIER_POLICY,
+    outlier_threshold=None,
+):
+    """Export the statistics of a results file as OpenMetrics gauges,
+    replacing filename atomically.
+
+    Args:
+        results_file (str): Path to the results file.
+        filename (str): Path of the exported file.
+        versions (dict): Version of each runtime, if known.
+        outliers (str): The outlier policy, one of utils.OUTLIER_POLICIES.
+        outlier_threshold (float): Threshold of the outlier policy.
+
+    Returns:
+        int: The number of exported runtime and benchmark pairs.
+    """
+
+    samples = load_samples(utils.iter_results_file(results_file))
+    if not samples:
+        return 0
+
+    statistics = compute_statistics(
+        samples, resamples=0, outliers=outliers, outlier_threshold=outlier_threshold
+    )
+    _write_atomic(filename, openmetrics_text(statistics, versions))
     logging.info(f"Results exported to {filename}")
 
+    return sum(len(benchmarks) for benchmarks in statistics.values())
+
 
 def main(args):
     logging.getLogger().setLevel(getattr(logging, args.log_level.upper()))
-    os.makedirs(args.csv_folder, exist_ok=True)
+    os.makedirs(args.output_folder, exist_ok=True)
 
     args.results_file = utils.get_absolute_path(args.results_file)
-    args.csv_folder = utils.get_absolute_path(args.csv_folder)
+    args.output_folder = utils.get_absolute_path(args.output_folder)
+    args.runtimes_file = utils.get_absolute_path(args.runtimes_file)
+    args.runtimes_folder = utils.get_absolute_path(args.runtimes_folder)
 
-    results = utils.load_results_file(args.results_file)
-    if not results:
+    if args.format == "openmetrics":
+        versions = _runtime_versions(
+            args.results_file, args.runtimes_file, args.runtimes_folder
+        )
+        if not export_openmetrics(
+            args.results_file,
+            os.path.join(args.output_folder, OPENMETRICS_FILE),
+            versions,
+            args.outliers,
+            args.outlier_threshold,
+        ):
+            logging.info("No results found in the file.")
         return
 
-    # CSV filename is the same as the results file, but with a .csv extension
-    filename = os.path.join(
-        args.csv_folder,
-        os.path.splitext(os.path.basename(args.results_file))[0] + ".csv",
-    )
+    # The exported file has the name of the results file, with the extension
+    # of the format. A SQLite database holds the summary as another table.
+    extension = FORMATS[args.format]
+    name = os.path.join(args.output_folder, utils.get_results_name(args.results_file))
+    filename = name + extension
+    summary_filename = None
+    if args.summary:
+        summary_filename = (
+            filename if args.format == "sqlite" else f"{name}_summary{extension}"
+        )
 
-    _write_benchmark_results_to_csv(results, filename, args.memory)
+    if args.format == "sqlite" and os.path.exists(filename):
+        os.remove(filename)
+
+    count = export_results(
+        args.results_file,
+        filename,
+        args.format,
+        summary_filename,
+        args.outliers,
+        args.outlier_threshold,
+    )
+    if not count:
+        logging.info("No results found in the file.")
+        os.remove(filename)
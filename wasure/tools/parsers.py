@@ -0,0 +1,245 @@
+"""Parses the output of benchmarks
+
+This module compiles the regexes that validate the output of a benchmark and
+extract its score and the runtime statistics. Compiled parsers are cached, so
+that every iteration of a benchmark, and every command using them, share the
+same compiled regexes.
+
+Statistics are converted to numbers when parsed. Times are normalized to
+nanoseconds and sizes to bytes, according to the unit of each statistic.
+"""
+
+import datetime
+import functools
+import json
+import logging
+import re
+
+# Multipliers that normalize a unit to nanoseconds (times) or bytes (sizes).
+# Other units (e.g. count, cycles) are stored as they are.
+STAT_UNITS = {
+    "ns": 1,
+    "us": 1e3,
+    "μs": 1e3,
+    "ms": 1e6,
+    "s": 1e9,
+    "bytes": 1,
+    "B": 1,
+    "KB": 1e3,
+    "MB": 1e6,
+    "GB": 1e9,
+    "KiB": 1024,
+    "MiB": 1024**2,
+    "GiB": 1024**3,
+}
+
+STAT_TYPES = ("int", "float", "timestamp", "string")
+
+DEFAULT_TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+
+def _parser_spec(parser):
+    """Returns the regex of a parser and whether it captures every match.
+
+    A parser is either a regex or an object with a "regex" and an optional
+    "all" flag, that captures every match instead of the first one.
+    """
+
+    if isinstance(parser, dict):
+        return parser.get("regex"), parser.get("all", False)
+    return parser, False
+
+
+def _to_number(value):
+    """Converts a string to an int or a float. Returns the string if it is
+    not a number."""
+
+    try:
+        return int(value)
+    except ValueError:
+        try:
+            return float(value)
+        except ValueError:
+            return value
+
+
+def _stat_converter(stat_name, parser):
+    """Returns a function that converts a parsed value to the declared type
+    of a statistic, normalized to its unit.
+
+    Statistics declare their type and unit in the parser object:
+    * "int" and "float" are numbers, multiplied by the multiplier of the unit
+    * "timestamp" is a date, converted to nanoseconds since the epoch. Its
+      format can be set with "format" (default: DEFAULT_TIMESTAMP_FORMAT)
+    * "string" is stored as it is
+    Statistics with no type are converted to numbers when possible.
+    """
+
+    if not isinstance(parser, dict):
+        return _to_number
+
+    stat_type = parser.get("type")
+    unit = parser.get("unit")
+    multiplier = STAT_UNITS.get(unit, 1)
+
+    if stat_type and stat_type not in STAT_TYPES:
+        logging.warning(f"Unknown type {stat_type} for stat {stat_name}.")
+
+    if stat_type == "string":
+        return str
+
+    if stat_type == "timestamp":
+        timestamp_format = parser.get("format", DEFAULT_TIMESTAMP_FORMAT)
+        epoch = datetime.datetime(1970, 1, 1)
+
+        def convert_timestamp(value):
+            date = datetime.datetime.strptime(value.strip(), timestamp_format)
+            return (date - epoch) // datetime.timedelta(microseconds=1) * 1000
+
+        return convert_timestamp
+
+    if stat_type == "int":
+        return lambda value: round(int(value) * multiplier)
+
+    if stat_type == "float":
+        return lambda value: float(value) * multiplier
+
+    return lambda value: (
+        number * multiplier
+        if isinstance(number := _to_number(value), (int, float))
+        else number
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def _compile_output_parser(validator, score_parser, stats_parser, derived_stats):
+    """Compiles the regexes of an output parser.
+
+    Args:
+        validator (str): The output validator regex, or None.
+        score_parser (str): The score parser, encoded as JSON.
+        stats_parser (str): The stats parser of the runtime, encoded as JSON.
+        derived_stats (str): The derived stats of the runtime, encoded as JSON.
+
+    Returns:
+        dict: The compiled parser. See get_output_parser.
+    """
+
+    score_regex, score_all = _parser_spec(json.loads(score_parser))
+
+    stats = []
+    for stat_name, parser in json.loads(stats_parser).items():
+        regex, capture_all = _parser_spec(parser)
+        stats.append(
+            (
+                stat_name,
+                re.compile(regex),
+                capture_all,
+                _stat_converter(stat_name, parser),
+            )
+        )
+
+    return {
+        "validator": re.compile(validator) if validator else None,
+        "score": (re.compile(score_regex), score_all) if score_regex else None,
+        "stats": stats,
+        "derived": [
+            (stat_name, start, end)
+            for stat_name, (start, end) in json.loads(derived_stats).items()
+        ],
+    }
+
+
+def get_output_parser(benchmark, runtime):
+    """Returns the compiled output parser of a benchmark with a runtime.
+
+    Parsers are cached by their regexes, so the same parser is returned for
+    every benchmark and runtime that share them.
+
+    Args:
+        benchmark (dict): The benchmark.
+        runtime (dict): The runtime.
+
+    Returns:
+        dict: The compiled parser, with the following keys:
+              * validator: The compiled output validator, or None
+              * score: A tuple with the compiled score parser and whether
+                it captures every match, or None
+              * stats: A list of tuples with the name of each statistic,
+                its compiled regex, whether it captures every match and the
+                function that converts its values
+              * derived: A list of tuples with the name of each derived
+                statistic and the names of the statistics it starts and
+                ends with
+    """
+
+    return _compile_output_parser(
+        benchmark.get("output-validator") or None,
+        json.dumps(benchmark.get("score-parser") or None, sort_keys=True),
+        json.dumps(runtime.get("stats-parser") or {}),
+        json.dumps(runtime.get("derived-stats") or {}),
+    )
+
+
+def validate_output(parser, output):
+    """Returns True if the output is valid, or if there is no validator."""
+
+    return parser["validator"] is None or bool(parser["validator"].search(output))
+
+
+def parse_score(parser, output):
+    """Parses the score from the output.
+
+    Returns:
+        tuple: The score and the list of samples. When the parser captures
+               every match, each match is a sample and the score is their
+               average. Otherwise, the list of samples is empty. The score
+               is 0 if the benchmark has no score parser or nothing matches.
+    """
+
+    if parser["score"] is None:
+        return 0, []
+
+    regex, capture_all = parser["score"]
+
+    if capture_all:
+        samples = [float(m.group("score")) for m in regex.finditer(output)]
+        return (sum(samples) / len(samples) if samples else 0), samples
+
+    match = regex.search(output)
+    if match:
+        return float(match.group("score")), []
+    return 0, []
+
+
+def parse_stats(parser, output):
+    """Parses the stats from the output.
+
+    Values are converted to their type and normalized to their unit. Stats
+    whose parser captures every match are stored as a list of values. Derived
+    stats are the difference between their end and start stats, e.g. the
+    duration of a phase between two timestamps. Values that can't be
+    converted are skipped.
+    """
+
+    stats = {}
+    for stat_name, regex, capture_all, convert in parser["stats"]:
+        try:
+            if capture_all:
+                if values := [
+                    convert(m.group(stat_name)) for m in regex.finditer(output)
+                ]:
+                    stats[stat_name] = values
+            elif match := regex.search(output):
+                stats[stat_name] = convert(match.group(stat_name))
+        except ValueError as e:
+            logging.warning(f"Failed to convert stat {stat_name}: {e}")
+
+    for stat_name, start, end in parser["derived"]:
+        start_value, end_value = stats.get(start), stats.get(end)
+        if isinstance(start_value, (int, float)) and isinstance(
+            end_value, (int, float)
+        ):
+            stats[stat_name] = end_value - start_value
+
+    return stats
@@ -0,0 +1,272 @@
+"""Plans the order in which a run executes its benchmarks
+
+A plan is a list of jobs, each with one or more pairs of runtime and
+benchmark that run one after the other on the same worker. The pairs of a
+runtime with an AOT command that compile the same benchmark file share a job:
+the compiled file has the same path for all of them, so they must not run at
+the same time, and the pairs of the same runtime reuse it.
+
+The cost of each pair is its number of iterations times the median elapsed
+time of an iteration in the previous results. With many workers, jobs are
+scheduled longest processing time first: the longest jobs start first and
+each job goes to the first free worker, so that no worker idles at the end
+while another still runs a long job.
+
+With a time budget, the number of iterations of each pair is the one that
+fits the budget, up to --repeat. It is planned again before each pair, from
+the remaining time and the actual time of the finished pairs, and the pairs
+that didn't start when the budget runs out are dropped.
+"""
+
+import heapq
+import logging
+import os
+import time
+
+from . import progress
+
+# Part of the time budget that the plan fills, as the estimates are not exact
+# and the results still have to be saved
+BUDGET_SAFETY = 0.9
+
+
+def _iteration_costs(pairs, estimates):
+    """Return the historical elapsed time of an iteration of each (runtime,
+    benchmark) pair, or None for the pairs without history, and the time to
+    assume for them: the median of the known ones, or 1 if none is known,
+    which keeps the jobs in order."""
+
+    known = sorted(estimates.values())
+    default_ns = known[len(known) // 2] if known else 1
+    return [estimates.get(pair) for pair in pairs], default_ns
+
+
+def build_plan(
+    runtimes_list,
+    benchmarks_list,
+    benchmarks_folder,
+    repeat,
+    estimates,
+    by_benchmark=False,
+):
+    """Group the pairs of runtime and benchmark into jobs and estimate their
+    cost.
+
+    Args:
+        runtimes_list (list): The runtimes of the run.
+        benchmarks_list (list): The benchmarks of the run.
+        benchmarks_folder (str): The absolute path of the benchmarks folder.
+        repeat (int): Number of iterations of each pair.
+        estimates (dict): Historical elapsed time in nanoseconds of an
+                          iteration of each pair, as returned by
+                          progress.load_estimates.
+        by_benchmark (bool): If True, the pairs of a benchmark with every
+                             runtime follow each other, so that a run cut
+                             short has every runtime on the benchmarks it ran.
+
+    Returns:
+        list: The jobs, in the order of the runtimes and benchmarks. Each job
+              is a dict with its "pairs" (a list of (runtime, benchmark)
+              tuples), its estimated "cost_ns" and the number of its pairs
+              that are "estimated" from history.
+    """
+
+    if by_benchmark:
+        pairs = [(r, b) for b in benchmarks_list for r in runtimes_list]
+    else:
+        pairs = [(r, b) for r in runtimes_list for b in benchmarks_list]
+
+    jobs, shared = [], {}
+    for runtime, benchmark in pairs:
+        if runtime.get("aot-command"):
+            path = os.path.join(benchmarks_folder, benchmark["path"])
+            if path not in shared:
+                shared[path] = {"pairs": []}
+                jobs.append(shared[path])
+            shared[path]["pairs"].append((runtime, benchmark))
+        else:
+            jobs.append({"pairs": [(runtime, benchmark)]})
+
+    for job in jobs:
+        costs, default_ns = _iteration_costs(
+            [(r["name"], b["name"]) for r, b in job["pairs"]], estimates
+        )
+        job["estimated"] = sum(cost is not None for cost in costs)
+        job["cost_ns"] = repeat * sum(
+            default_ns if cost is None else cost for cost in costs
+        )
+
+    return jobs
+
+
+def schedule(jobs, workers=1):
+    """Order the jobs and assign them to the workers.
+
+    With one worker the jobs keep their order. With more, they are ordered
+    longest processing time first, which is also the order in which the
+    workers take them.
+
+    Args:
+        jobs (list): The jobs, as returned by build_plan.
+        workers (int): Number of workers.
+
+    Returns:
+        tuple: The ordered jobs, and for each of them the index of the worker
+               expected to run it, its expected start and end in
+               nanoseconds.
+    """
+
+    if workers > 1:
+        jobs = sorted(jobs, key=lambda job: job["cost_ns"], reverse=True)
+
+    # The worker that is free first takes the next job
+    free = [(0, worker) for worker in range(workers)]
+    assignments = []
+    for job in jobs:
+        start_ns, worker = heapq.heappop(free)
+        end_ns = start_ns + job["cost_ns"]
+        assignments.append((worker, start_ns, end_ns))
+        heapq.heappush(free, (end_ns, worker))
+
+    return jobs, assignments
+
+
+def print_plan(jobs, assignments, workers):
+    """Print the jobs of each worker, with their expected start and end, and
+    the expected time of the run."""
+
+    for worker in range(workers):
+        print(f"Worker {worker + 1}:")
+        for job, (assigned, start_ns, end_ns) in zip(jobs, assignments):
+            if assigned != worker:
+                continue
+            names = ", ".join(
+                f"{runtime['name']} {benchmark['name']}"
+                for runtime, benchmark in job["pairs"]
+            )
+            known = "" if job["estimated"] == len(job["pairs"]) else " (guessed)"
+            print(
+                f"  {progress.format_duration(start_ns / 1e9):>8} - "
+                f"{progress.format_duration(end_ns / 1e9):>8}  {names}{known}"
+            )
+
+    total_ns = sum(job["cost_ns"] for job in jobs)
+    makespan_ns = max((end_ns for _, _, end_ns in assignments), default=0)
+    pairs = sum(len(job["pairs"]) for job in jobs)
+    estimated = sum(job["estimated"] for job in jobs)
+    print(
+        f"{len(jobs)} jobs of {pairs} pairs ({estimated} estimated from previous "
+        f"results) on {workers} workers: expected time "
+        f"{progress.format_duration(makespan_ns / 1e9)}, "
+        f"{progress.format_duration(total_ns / 1e9)} of work"
+    )
+
+
+def budget_repeat(pairs, estimates, seconds, workers, max_repeat):
+    """Return the number of iterations of each pair that fits the time
+    budget, from the historical durations, between 1 and max_repeat.
+
+    Args:
+        pairs (list): The (runtime, benchmark) names of the pairs.
+        estimates (dict): Historical elapsed time in nanoseconds of an
+                          iteration of each pair.
+        seconds (float): The time budget.
+        workers (int): Number of workers sharing the budget.
+        max_repeat (int): The maximum number of iterations of each pair.
+    """
+
+    costs, default_ns = _iteration_costs(pairs, estimates)
+    if all(cost is None for cost in costs):
+        # Nothing to plan from: the budget re-plans once pairs finish
+        return max_repeat
+    total_ns = sum(default_ns if cost is None else cost for cost in costs)
+    fit = int(seconds * 1e9 * workers * BUDGET_SAFETY // total_ns)
+    return max(1, min(max_repeat, fit))
+
+
+def select_benchmarks(runtimes_list, benchmarks_list, estimates, seconds, workers):
+    """Return the first benchmarks whose iteration with every runtime fits
+    the time budget, keeping at least one. The benchmarks are in the order of
+    their priority, e.g. the order of -b.
+
+    Args:
+        runtimes_list (list): The runtimes of the run.
+        benchmarks_list (list): The benchmarks of the run, by priority.
+        estimates (dict): Historical elapsed time in nanoseconds of an
+                          iteration of each pair.
+        seconds (float): The time budget.
+        workers (int): Number of workers sharing the budget.
+    """
+
+    capacity_ns = seconds * 1e9 * workers * BUDGET_SAFETY
+    selected, total_ns = [], 0
+    for benchmark in benchmarks_list:
+        costs, default_ns = _iteration_costs(
+            [(runtime["name"], benchmark["name"]) for runtime in runtimes_list],
+            estimates,
+        )
+        total_ns += sum(default_ns if cost is None else cost for cost in costs)
+        if selected and total_ns > capacity_ns:
+            break
+        selected.append(benchmark)
+    return selected
+
+
+class Budget:
+    """Fits the iterations of a run in a time budget.
+
+    Args:
+        seconds (float): The time budget, from start_ns.
+        tracker (Progress): The progress of the run, which estimates the time
+                            of an iteration of each pair from history and from
+                            the finished pairs.
+        max_repeat (int): The maximum number of iterations of each pair.
+        workers (int): Number of workers sharing the budget.
+        start_ns (int): Start of the run, from time.perf_counter_ns (default:
+                        now).
+    """
+
+    def __init__(self, seconds, tracker, max_repeat, workers=1, start_ns=None):
+        start_ns = start_ns or time.perf_counter_ns()
+        self.deadline_ns = start_ns + int(seconds * 1e9)
+        self.tracker = tracker
+        self.max_repeat = max_repeat
+        self.workers = workers
+
+    def expired(self):
+        """Return True if the budget ran out."""
+
+        return time.perf_counter_ns() >= self.deadline_ns
+
+    def repeat_for(self, runtime, benchmark, measured_ns=None):
+        """Return the number of iterations of a running pair, so that it and
+        the pairs that didn't start fit the remaining time.
+
+        Args:
+            runtime (str): The name of the runtime.
+            benchmark (str): The name of the benchmark.
+            measured_ns (int): Time of an iteration of the pair that already
+                               ran, used if nothing else is known about it.
+        """
+
+        cost_ns = self.tracker.iteration_cost_ns((runtime, benchmark))
+        cost_ns = cost_ns or measured_ns
+        if cost_ns is None:
+            # Nothing is known yet: one iteration tells how long it takes
+            return 1
+
+        costs = [
+            self.tracker.iteration_cost_ns(pair)
+            for pair in self.tracker.pending_pairs()
+        ]
+        total_ns = cost_ns + sum(cost_ns if c is None else c for c in costs)
+        remaining_ns = max(self.deadline_ns - time.perf_counter_ns(), 0)
+        fit = int(remaining_ns * self.workers * BUDGET_SAFETY // total_ns)
+        repeat = max(1, min(self.max_repeat, fit))
+
+        if self.tracker.set_repeat(repeat):
+            logging.info(
+                f"Planned {repeat} iterations of each benchmark left to fit the "
+                "time budget"
+            )
+        return repeat
@@ -1,11 +1,46 @@
-"""Plots results of the benchmarks"""
+"""Plots results of the benchmarks
+
+Besides the grouped bar chart, results with many runtimes and benchmarks can
+be plotted as a heatmap of the speedups of each runtime over a baseline, and
+as faceted charts with a small bar chart for each benchmark, paginated by
+benchmark group. The iterations themselves can be plotted as distributions
+(violins or boxes), in order as timelines, and as memory usage over time,
+paginated the same way. Figures are drawn in parallel by render.render_figures,
+which skips the ones whose data didn't change.
+"""
 
 import logging
+import math
 import os
 
+import matplotlib
 import matplotlib.pyplot as plt
+import numpy as np
+from matplotlib.colors import LogNorm
+from matplotlib.lines import Line2D
+from matplotlib.ticker import MaxNLocator
+
+from . import benchmarks, render, utils
+from .statistics import compute_statistics, find_outliers, load_samples
+from .summary import OTHER_GROUP
+
+KINDS = ["bars", "heatmap", "facets", "violin", "box", "timeline", "memory"]
+
+# Benchmarks in each page of the faceted charts, and charts in each row
+FACET_PAGE_SIZE = 16
+FACET_COLUMNS = 4
 
-from . import utils
+# Heatmaps with more cells than this are not annotated with the speedups
+HEATMAP_MAX_ANNOTATED_CELLS = 400
+
+# Keyword of violinplot and boxplot for horizontal plots. matplotlib 3.10 added
+# orientation, and later versions deprecate vert, which older ones still need.
+_HORIZONTAL = (
+    {"orientation": "horizontal"}
+    if tuple(int(part) for part in matplotlib.__version__.split(".")[:2])
+    >= (3, 10)
+    else {"vert": False}
+)
 
 
 def parse(parser):
@@ -27,43 +62,106 @@ def parse(parser):
         help=f"Path to the folder where plots will be saved (default: {utils.DEFAULT_PLOTS_FOLDER})",
     )
 
+    parser.add_argument(
+        "--stat",
+        metavar="NAME",
+        default=None,
+        help="""Plot a numeric runtime statistic (e.g. compile_time_ns) instead
+            of the elapsed time or score. Default: plot elapsed time or score""",
+    )
+
+    parser.add_argument(
+        "--scaling",
+        metavar="PARAMETER",
+        default=None,
+        help="""Plot the elapsed time of the variants of each benchmark against
+            the value of PARAMETER, fitting a line for each runtime
+            (e.g. --scaling size). Default: plot all results""",
+    )
+
+    parser.add_argument(
+        "--aggregate",
+        choices=["median", "avg"],
+        default="median",
+        help="""Value plotted for the iterations of each benchmark. Error bars
+            span from the minimum to the maximum (default: median)""",
+    )
+
+    parser.add_argument(
+        "--kind",
+        nargs="+",
+        choices=KINDS,
+        default=["bars"],
+        help="""Figures to plot: a grouped bar chart, a heatmap of the speedups
+            over the baseline, faceted charts with a chart for each benchmark,
+            the distribution of the iterations as violins or boxes, the
+            iterations in order (to spot warm-up and drift) and/or the memory
+            usage over time recorded by `run --memory-timeline`. All but the
+            first two are paginated by benchmark group (default: bars)""",
+    )
+
+    parser.add_argument(
+        "--baseline",
+        metavar="RUNTIME",
+        default=None,
+        help="""Runtime the speedups of the heatmap are relative to
+            (default: the first runtime)""",
+    )
+
+    parser.add_argument(
+        "--benchmarks-folder",
+        default=os.path.join(script_dir, utils.DEFAULT_BENCHMARKS_FOLDER),
+        help=f"""Path to the folder containing benchmarks, used to group the
+            faceted charts (default: {utils.DEFAULT_BENCHMARKS_FOLDER})""",
+    )
+
+    parser.add_argument(
+        "--page-size",
+        type=int,
+        default=FACET_PAGE_SIZE,
+        help=f"""Benchmarks in each page of the faceted charts
+            (default: {FACET_PAGE_SIZE})""",
+    )
+
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=None,
+        help="Number of processes drawing the figures (default: number of CPUs)",
+    )
+
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        default=False,
+        help="Draw every figure, even if its data didn't change (default: False)",
+    )
+
+    utils.add_outlier_arguments(parser)
     utils.add_log_level_argument(parser)
 
     return parser
 
 
-def _compute_statistics(results):
-    """Compute average, min, and max values for each benchmark and runtime."""
+def _select_aggregate(statistics, aggregate):
+    """Keep only the aggregate (e.g. the median), the min and the max of each
+    series of the statistics, as their "value", "min" and "max"."""
 
-    statistics = {}
-    for runtime, benchmarks in results.items():
-        statistics[runtime] = {}
-        for benchmark, runs in benchmarks.items():
-            # filters out runs with elapsed_time_ns <= 0.
-            runs = [run for run in runs if run["elapsed_time_ns"] > 0]
-            if not runs:
-                continue
+    def select(data):
+        return {"value": data[aggregate], "min": data["min"], "max": data["max"]}
 
-            elapsed_times = [run["elapsed_time_ns"] for run in runs]
-            scores = [run["score"] for run in runs]
-            statistics[runtime][benchmark] = {
-                "elapsed_time_ns": {
-                    "avg": sum(elapsed_times) / len(elapsed_times),
-                    "min": min(elapsed_times),
-                    "max": max(elapsed_times),
-                },
-                "score": {
-                    "avg": sum(scores) / len(scores),
-                    "min": min(scores),
-                    "max": max(scores),
-                },
+    return {
+        runtime: {
+            benchmark: {
+                "elapsed_time_ns": select(data["elapsed_time_ns"]),
+                "score": select(data["score"]),
+                "stats": {name: select(d) for name, d in data["stats"].items()},
             }
-
-        # Remove runtimes with no valid benchmarks in order to avoid empty plots later
-        if not statistics[runtime]:
-            del statistics[runtime]
-
-    return statistics
+            for benchmark, data in benchmarks.items()
+        }
+        for runtime, benchmarks in statistics.items()
+    }
 
 
 def _collect_benchmarks(results):
@@ -83,7 +181,7 @@ def _determine_benchmark_metrics(results, benchmarks_list):
     benchmark_metrics = {}
     for benchmark in benchmarks_list:
         use_score = any(
-            results[runtime][benchmark]["score"]["avg"] > 0
+            results[runtime][benchmark]["score"]["value"] > 0
             for runtime in results
             if benchmark in results[runtime]
         )
@@ -98,7 +196,7 @@ def _transpose_benchmark_data(results, benchmarks_list, benchmark_metrics):
     The expected format is:
     {
         "runtime1": {
-            "benchmark1": {"avg": value1, "min": value2, "max": value3},
+            "benchmark1": {"value": value1, "min": value2, "max": value3},
             "benchmark2": {...},
         },
         "runtime2": {...},
@@ -108,7 +206,7 @@ def _transpose_benchmark_data(results, benchmarks_list, benchmark_metrics):
 
     {
         "benchmark1": {
-            "runtime1": {"avg": value1, "min": value2, "max": value3},
+            "runtime1": {"value": value1, "min": value2, "max": value3},
             "runtime2": {...},
         },
         "benchmark2": {...},
@@ -127,23 +225,20 @@ def _transpose_benchmark_data(results, benchmarks_list, benchmark_metrics):
     return raw_values
 
 
-def _normalize_values(benchmarks_list, benchmark_metrics, raw_values):
+def _normalize_values(runtimes, benchmarks_list, benchmark_metrics, raw_values):
     """Normalize raw values for each benchmark.
 
     For scores, normalize by the maximum value.
     For elapsed times, normalize by the minimum value.
     """
 
-    runtime_data = {
-        runtime: {"values": {}, "errors": {}}
-        for runtime in raw_values[benchmarks_list[0]]
-    }
+    runtime_data = {runtime: {"values": {}, "errors": {}} for runtime in runtimes}
     for benchmark in benchmarks_list:
         values = {
-            runtime: data["avg"] for runtime, data in raw_values[benchmark].items()
+            runtime: data["value"] for runtime, data in raw_values[benchmark].items()
         }
         errors = {
-            runtime: (data["avg"] - data["min"], data["max"] - data["avg"])
+            runtime: (data["value"] - data["min"], data["max"] - data["value"])
             for runtime, data in raw_values[benchmark].items()
         }
         if benchmark_metrics[benchmark] == "score":
@@ -189,37 +284,55 @@ def _all_benchmarks_single_runtime(statistics, benchmarks_list):
     return True
 
 
-def _absolute_values(benchmarks_list, raw_values):
+def _absolute_values(runtimes, benchmarks_list, raw_values):
     """Prepare absolute values for plotting (no normalization)."""
 
-    runtime_data = {
-        runtime: {"values": {}, "errors": {}}
-        for runtime in raw_values[benchmarks_list[0]]
-    }
+    runtime_data = {runtime: {"values": {}, "errors": {}} for runtime in runtimes}
     for benchmark in benchmarks_list:
         for runtime, data in raw_values[benchmark].items():
-            runtime_data[runtime]["values"][benchmark] = data["avg"]
+            runtime_data[runtime]["values"][benchmark] = data["value"]
             runtime_data[runtime]["errors"][benchmark] = (
-                data["avg"] - data["min"],
-                data["max"] - data["avg"],
+                data["value"] - data["min"],
+                data["max"] - data["value"],
             )
     return runtime_data
 
 
-def _plot_results(
-    runtime_data, benchmarks_list, benchmark_metrics, results_file, plots_folder, ylabel
-):
-    """Plot the normalized benchmark results with error bars and save the file."""
+def _select_stat(statistics, stat):
+    """Keep only the values of a runtime statistic, as the metric of each
+    benchmark. Benchmarks and runtimes without the statistic are removed."""
+
+    selected = {
+        runtime: {
+            benchmark: {stat: data["stats"][stat]}
+            for benchmark, data in benchmarks.items()
+            if stat in data["stats"]
+        }
+        for runtime, benchmarks in statistics.items()
+    }
+
+    return {runtime: data for runtime, data in selected.items() if data}
+
+
+def _draw_bars(data, path):
+    """Draw the benchmark results as bars grouped by benchmark, with error
+    bars, and save the figure."""
+
+    runtime_data = data["runtime_data"]
+    benchmarks_list = data["benchmarks"]
 
     x = range(len(benchmarks_list))
     bar_width = 0.8 / len(runtime_data)
     colors = plt.cm.tab10.colors
     plt.figure(figsize=(16, 10))
 
-    for i, (runtime, data) in enumerate(runtime_data.items()):
-        y_values = [data["values"].get(benchmark, 0) for benchmark in benchmarks_list]
+    for i, (runtime, runtime_values) in enumerate(runtime_data.items()):
+        y_values = [
+            runtime_values["values"].get(benchmark, 0) for benchmark in benchmarks_list
+        ]
         y_errors = [
-            data["errors"].get(benchmark, (0, 0)) for benchmark in benchmarks_list
+            runtime_values["errors"].get(benchmark, (0, 0))
+            for benchmark in benchmarks_list
         ]
         y_err_lower = [err[0] for err in y_errors]
         y_err_upper = [err[1] for err in y_errors]
@@ -234,23 +347,594 @@ def _plot_results(
         )
 
     plt.grid(axis="y", linestyle="--", alpha=0.7)
-    plt.title("Benchmark Results Grouped by Runtime")
-    plt.ylabel(ylabel)
+    plt.title(data["title"])
+    plt.ylabel(data["ylabel"])
     plt.xlabel("Benchmark")
     plt.xticks(
         [pos + (len(runtime_data) - 1) * bar_width / 2 for pos in x],
-        [f"{b}\n({benchmark_metrics[b]})" for b in benchmarks_list],
+        [f"{b}\n({data['metrics'][b]})" for b in benchmarks_list],
         rotation=45,
         ha="right",
     )
     plt.legend()
     plt.tight_layout()
+    plt.savefig(path)
+    plt.close()
+
+
+def _speedup_matrix(statistics, benchmarks_list, benchmark_metrics, baseline):
+    """Return the speedup of each runtime over the baseline on each benchmark,
+    as a row for each runtime with a value for each benchmark.
+
+    The speedup is the ratio of the scores, or the inverse ratio of the other
+    metrics, so that a speedup > 1 is always better. It is None if the runtime
+    or the baseline didn't run the benchmark, or if a value is not positive.
+    """
+
+    matrix = []
+    for runtime_benchmarks in statistics.values():
+        row = []
+        for benchmark in benchmarks_list:
+            metric = benchmark_metrics[benchmark]
+            data = runtime_benchmarks.get(benchmark)
+            base = statistics[baseline].get(benchmark)
+            if data is None or base is None:
+                row.append(None)
+                continue
+
+            new, old = data[metric]["value"], base[metric]["value"]
+            numerator, denominator = (new, old) if metric == "score" else (old, new)
+            row.append(numerator / denominator if numerator > 0 < denominator else None)
+        matrix.append(row)
+
+    return matrix
+
+
+def _draw_heatmap(data, path):
+    """Draw the speedups of each runtime over the baseline as a heatmap, on a
+    logarithmic scale centered on 1, and save the figure."""
+
+    speedups = np.array(data["speedups"], dtype=float)
+    rows, columns = speedups.shape
+
+    # Symmetric around 1 on the logarithmic scale, at least 0.9x to 1.1x
+    finite = np.abs(np.log(speedups[np.isfinite(speedups)]))
+    limit = math.exp(max(finite.max() if finite.size else 0, math.log(1.1)))
+
+    colormap = plt.get_cmap("RdYlGn").copy()
+    colormap.set_bad("lightgray")
+
+    figure, axes = plt.subplots(
+        figsize=(max(8, 0.3 * columns + 4), max(4, 0.35 * rows + 2.5))
+    )
+    image = axes.imshow(
+        np.ma.masked_invalid(speedups),
+        cmap=colormap,
+        norm=LogNorm(vmin=1 / limit, vmax=limit),
+        aspect="auto",
+    )
+    colorbar = figure.colorbar(image, ax=axes, fraction=0.03, pad=0.01)
+    colorbar.set_label(f"Speedup over {data['baseline']}")
+    ticks = np.geomspace(1 / limit, limit, 5)
+    colorbar.set_ticks(ticks, labels=[f"{tick:.2f}x" for tick in ticks])
+    colorbar.ax.minorticks_off()
+
+    if rows * columns <= HEATMAP_MAX_ANNOTATED_CELLS:
+        for (row, column), speedup in np.ndenumerate(speedups):
+            if np.isfinite(speedup):
+                axes.text(
+                    column, row, f"{speedup:.2f}", ha="center", va="center", fontsize=7
+                )
+
+    axes.set_xticks(range(columns), data["benchmarks"], rotation=90, fontsize=8)
+    axes.set_yticks(range(rows), data["runtimes"], fontsize=8)
+    axes.set_xlabel("Benchmark")
+    axes.set_ylabel("Runtime")
+    axes.set_title(data["title"])
+    figure.tight_layout()
+    figure.savefig(path)
+    plt.close(figure)
+
+
+def _paginate(benchmarks_list, groups, page_size):
+    """Split the benchmarks by group, and each group in pages of at most
+    page_size benchmarks.
+
+    Returns:
+        list: A (group, page number, number of pages of the group, benchmarks)
+              tuple for each page.
+    """
+
+    by_group = {}
+    for benchmark in benchmarks_list:
+        base, _ = utils.split_benchmark_variant(benchmark)
+        group = groups.get(benchmark, groups.get(base, OTHER_GROUP))
+        by_group.setdefault(group, []).append(benchmark)
+
+    pages = []
+    for group, group_benchmarks in sorted(by_group.items()):
+        count = math.ceil(len(group_benchmarks) / page_size)
+        for page in range(count):
+            start = page * page_size
+            pages.append(
+                (group, page + 1, count, group_benchmarks[start : start + page_size])
+            )
+
+    return pages
+
+
+def _page_figure(panels, row_height, sharey=False):
+    """Create a figure with a grid of FACET_COLUMNS charts per row, for the
+    given number of panels."""
+
+    columns = min(FACET_COLUMNS, panels)
+    rows = math.ceil(panels / columns)
+    return plt.subplots(
+        rows,
+        columns,
+        figsize=(4.5 * columns, row_height * rows),
+        sharey=sharey,
+        squeeze=False,
+    )
+
+
+def _save_page(figure, axes, panels, title, path, legend=None):
+    """Hide the unused charts of a page, add its title and an optional legend
+    of the runtimes at the bottom, and save the figure."""
+
+    for ax in axes.flat[panels:]:
+        ax.set_visible(False)
+
+    # The title is taken into account by tight_layout, the legend is not
+    bottom = 0
+    if legend:
+        columns = min(len(legend), 8)
+        figure.legend(handles=legend, loc="lower center", ncol=columns, fontsize=8)
+        rows = math.ceil(len(legend) / columns)
+        bottom = (0.25 * rows + 0.15) / figure.get_figheight()
+
+    figure.suptitle(title)
+    figure.tight_layout(rect=(0, bottom, 1, 1))
+    figure.savefig(path)
+    plt.close(figure)
+
+
+def _runtime_legend(runtimes):
+    """Return the legend entries of the runtimes, in the colors of the
+    charts."""
+
+    colors = plt.cm.tab10.colors
+    return [
+        Line2D([], [], color=colors[i % len(colors)], marker="o", label=runtime)
+        for i, runtime in enumerate(runtimes)
+    ]
+
+
+def _bar_panels(runtime_data, page_benchmarks, benchmark_metrics):
+    """Return the panels of a page of faceted charts: the name, the metric,
+    the value of each runtime and the lower and upper errors of each runtime
+    of each benchmark."""
+
+    panels = []
+    for benchmark in page_benchmarks:
+        errors = [
+            data["errors"].get(benchmark, (0, 0)) for data in runtime_data.values()
+        ]
+        panels.append(
+            {
+                "name": benchmark,
+                "metric": benchmark_metrics[benchmark],
+                "values": [
+                    data["values"].get(benchmark, 0) for data in runtime_data.values()
+                ],
+                "errors": [[e[0] for e in errors], [e[1] for e in errors]],
+            }
+        )
+    return panels
+
+
+def _draw_facets(data, path):
+    """Draw a horizontal bar chart for each benchmark of a page, with a bar
+    for each runtime, and save the figure."""
+
+    panels, runtimes = data["panels"], data["runtimes"]
+    colors = plt.cm.tab10.colors
+    positions = range(len(runtimes))
+
+    figure, axes = _page_figure(
+        len(panels), 0.25 * len(runtimes) + 1.5, sharey=True
+    )
+
+    for ax, panel in zip(axes.flat, panels):
+        ax.barh(
+            positions,
+            panel["values"],
+            xerr=panel["errors"],
+            color=[colors[i % len(colors)] for i in positions],
+            capsize=3,
+        )
+        ax.set_title(f"{panel['name']}\n({panel['metric']})", fontsize=9)
+        ax.set_xlabel(data["xlabel"], fontsize=8)
+        ax.tick_params(labelsize=8)
+        ax.grid(axis="x", linestyle="--", alpha=0.7)
+
+    # The y axis is shared, so this labels the runtimes of every chart
+    axes[0][0].set_yticks(positions, runtimes)
+    axes[0][0].invert_yaxis()
+
+    _save_page(figure, axes, len(panels), data["title"], path)
+
+
+def _metric_samples(data, metric):
+    """Return the samples of a metric, as a list, and the label of its axis.
+    Elapsed times are converted to milliseconds."""
+
+    if metric == "elapsed_time_ns":
+        return (data["elapsed_time_ns"] / 1e6).tolist(), "Elapsed time (ms)"
+    if metric == "score":
+        return data["score"].tolist(), "Score"
+    return data["stats"].get(metric, np.empty(0)).tolist(), metric
+
+
+def _distribution_panels(samples, page_benchmarks, benchmark_metrics):
+    """Return the panels of a page of distribution charts: the name, the
+    label of the metric and the samples of each runtime of each benchmark.
+    Runtimes that didn't run a benchmark have no samples."""
+
+    panels = []
+    for benchmark in page_benchmarks:
+        metric = benchmark_metrics[benchmark]
+        panel = {"name": benchmark, "label": "", "samples": []}
+        for benchmarks_samples in samples.values():
+            values = []
+            if benchmark in benchmarks_samples:
+                values, panel["label"] = _metric_samples(
+                    benchmarks_samples[benchmark], metric
+                )
+            panel["samples"].append(values)
+        panels.append(panel)
+    return panels
+
+
+def _draw_distributions(data, path):
+    """Draw the distribution of the samples of each runtime on each benchmark
+    of a page, as violins or boxes, and save the figure."""
+
+    panels, runtimes = data["panels"], data["runtimes"]
+    colors = plt.cm.tab10.colors
+    positions = range(len(runtimes))
+
+    figure, axes = _page_figure(len(panels), 0.3 * len(runtimes) + 1.5, sharey=True)
+
+    for ax, panel in zip(axes.flat, panels):
+        present = [i for i in positions if panel["samples"][i]]
 
-    plot_filename = os.path.splitext(os.path.basename(results_file))[0] + ".png"
-    plot_path = os.path.join(plots_folder, plot_filename)
-    plt.savefig(plot_path)
+        if data["kind"] == "box":
+            boxes = ax.boxplot(
+                [panel["samples"][i] for i in present],
+                positions=present,
+                **_HORIZONTAL,
+                widths=0.6,
+                patch_artist=True,
+            )["boxes"]
+            for i, box in zip(present, boxes):
+                box.set_facecolor(colors[i % len(colors)])
+        else:
+            # A density needs at least two different values, others are points
+            spread = [i for i in present if len(set(panel["samples"][i])) > 1]
+            if spread:
+                bodies = ax.violinplot(
+                    [panel["samples"][i] for i in spread],
+                    positions=spread,
+                    **_HORIZONTAL,
+                    showmedians=True,
+                )["bodies"]
+                for i, body in zip(spread, bodies):
+                    body.set_facecolor(colors[i % len(colors)])
+            for i in set(present) - set(spread):
+                values = panel["samples"][i]
+                ax.scatter(values, [i] * len(values), color=colors[i % len(colors)])
+
+        ax.set_title(panel["name"], fontsize=9)
+        ax.set_xlabel(panel["label"], fontsize=8)
+        ax.tick_params(labelsize=8)
+        ax.grid(axis="x", linestyle="--", alpha=0.7)
+
+    # The y axis is shared, so this labels the runtimes of every chart
+    axes[0][0].set_yticks(positions, runtimes)
+    axes[0][0].set_ylim(len(runtimes) - 0.5, -0.5)
+
+    _save_page(figure, axes, len(panels), data["title"], path)
+
+
+def _timeline_panels(samples, page_benchmarks, benchmark_metrics, outliers):
+    """Return the panels of a page of timelines: the name, the label of the
+    metric and, for each runtime, the iterations, their values and the
+    iterations that are outliers (None if the runtime didn't run the
+    benchmark).
+
+    The metric of the benchmark is used if it has a value for each iteration,
+    otherwise the elapsed time.
+    """
+
+    panels = []
+    for benchmark in page_benchmarks:
+        panel = {"name": benchmark, "label": "", "lines": []}
+        for runtime, benchmarks_samples in samples.items():
+            data = benchmarks_samples.get(benchmark)
+            if data is None:
+                panel["lines"].append(None)
+                continue
+
+            iterations = (data["iterations"] + 1).tolist()
+            values, label = _metric_samples(data, benchmark_metrics[benchmark])
+            if len(values) != len(iterations):
+                values, label = _metric_samples(data, "elapsed_time_ns")
+            panel["label"] = label
+            panel["lines"].append(
+                {
+                    "iterations": iterations,
+                    "values": values,
+                    "outliers": [
+                        i
+                        for i, flagged in zip(iterations, outliers[runtime][benchmark])
+                        if flagged
+                    ],
+                }
+            )
+        panels.append(panel)
+    return panels
+
+
+def _draw_timelines(data, path):
+    """Draw the value of each iteration in order, with a line for each
+    runtime and the outliers circled in red, for each benchmark of a page,
+    and save the figure."""
+
+    panels, runtimes = data["panels"], data["runtimes"]
+    colors = plt.cm.tab10.colors
+
+    figure, axes = _page_figure(len(panels), 3.5)
+
+    for ax, panel in zip(axes.flat, panels):
+        for i, line in enumerate(panel["lines"]):
+            if line is None:
+                continue
+            ax.plot(
+                line["iterations"],
+                line["values"],
+                marker=".",
+                color=colors[i % len(colors)],
+            )
+            circled = [
+                (x, y)
+                for x, y in zip(line["iterations"], line["values"])
+                if x in set(line["outliers"])
+            ]
+            if circled:
+                ax.scatter(
+                    *zip(*circled),
+                    s=80,
+                    facecolors="none",
+                    edgecolors="red",
+                    zorder=3,
+                )
+
+        ax.set_title(panel["name"], fontsize=9)
+        ax.set_xlabel("Iteration", fontsize=8)
+        ax.xaxis.set_major_locator(MaxNLocator(integer=True))
+        ax.set_ylabel(panel["label"], fontsize=8)
+        ax.tick_params(labelsize=8)
+        ax.grid(linestyle="--", alpha=0.7)
+
+    _save_page(
+        figure, axes, len(panels), data["title"], path, _runtime_legend(runtimes)
+    )
+
+
+def _record_memory_samples(records, memory_samples):
+    """Yield the records, storing the memory samples of their iterations in
+    memory_samples[benchmark][runtime], so that the results file is only
+    read once."""
+
+    for record in records:
+        runtime, benchmark, _, run = record
+        if run.get("memory_samples"):
+            memory_samples.setdefault(benchmark, {}).setdefault(runtime, []).append(
+                run["memory_samples"]
+            )
+        yield record
+
+
+def _memory_panels(memory_samples, runtimes, page_benchmarks):
+    """Return the panels of a page of memory curves: the name and, for each
+    runtime, the times in milliseconds and the RSS in MiB of each
+    iteration."""
+
+    panels = []
+    for benchmark in page_benchmarks:
+        lines = []
+        for runtime in runtimes:
+            lines.append(
+                [
+                    [
+                        [t / 1e6 for t, _ in iteration],
+                        [rss / 2**20 for _, rss in iteration],
+                    ]
+                    for iteration in memory_samples[benchmark].get(runtime, [])
+                ]
+            )
+        panels.append({"name": benchmark, "lines": lines})
+    return panels
+
+
+def _draw_memory(data, path):
+    """Draw the memory usage over time of each iteration, in the color of
+    its runtime, for each benchmark of a page, and save the figure."""
+
+    panels, runtimes = data["panels"], data["runtimes"]
+    colors = plt.cm.tab10.colors
+
+    figure, axes = _page_figure(len(panels), 3.5)
+
+    for ax, panel in zip(axes.flat, panels):
+        for i, iterations in enumerate(panel["lines"]):
+            for times, rss in iterations:
+                ax.plot(times, rss, color=colors[i % len(colors)], alpha=0.6)
+
+        ax.set_title(panel["name"], fontsize=9)
+        ax.set_xlabel("Time (ms)", fontsize=8)
+        ax.set_ylabel("RSS (MiB)", fontsize=8)
+        ax.tick_params(labelsize=8)
+        ax.grid(linestyle="--", alpha=0.7)
+
+    _save_page(
+        figure, axes, len(panels), data["title"], path, _runtime_legend(runtimes)
+    )
+
+
+def _collect_scaling_series(statistics, parameter):
+    """Group the statistics of benchmark variants by the value of a parameter.
+
+    Variants that only differ in the value of the parameter are part of the
+    same series, named after the benchmark and its other parameters.
+
+    The output format is:
+    {
+        "benchmark@threads=1": {
+            "runtime1": [(value1, {"value": ..., "min": ..., "max": ...}), ...],
+            "runtime2": [...],
+        },
+        ...
+    }
+
+    Points are sorted by the value of the parameter. The statistics are the
+    ones of the elapsed time.
+    """
+
+    series = {}
+    for runtime, runtime_statistics in statistics.items():
+        for benchmark, data in runtime_statistics.items():
+            base, parameters = utils.split_benchmark_variant(benchmark)
+            value = parameters.pop(parameter, None)
+            if not isinstance(value, (int, float)):
+                continue
+
+            name = base
+            if parameters:
+                name += "@" + ",".join(f"{k}={v}" for k, v in parameters.items())
+
+            series.setdefault(name, {}).setdefault(runtime, []).append(
+                (value, data["elapsed_time_ns"])
+            )
+
+    for runtimes in series.values():
+        for points in runtimes.values():
+            points.sort(key=lambda point: point[0])
+
+    return series
+
+
+def _fit_linear(xs, ys):
+    """Least-squares fit of ys = intercept + slope * xs.
+
+    Returns:
+        tuple: The intercept and the slope of the line. The slope is 0 if all
+               the xs are the same.
+    """
+
+    mean_x = sum(xs) / len(xs)
+    mean_y = sum(ys) / len(ys)
+    variance = sum((x - mean_x) ** 2 for x in xs)
+    if variance == 0:
+        return mean_y, 0.0
+
+    slope = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / variance
+    return mean_y - slope * mean_x, slope
+
+
+def _scaling_figures(series, parameter, results_name, subtitle=""):
+    """Return the figures of the elapsed time against the parameter value of
+    each series.
+
+    Each runtime gets its measured points, with min/max error bars, and the
+    fitted line. The intercept of the line estimates the fixed overhead of the
+    runtime (startup, compilation), while the slope estimates the cost of each
+    unit of the parameter.
+    """
+
+    figures = []
+    for name, runtimes in series.items():
+        # A line needs at least two different values to be meaningful
+        if all(len({p[0] for p in points}) < 2 for points in runtimes.values()):
+            logging.debug(f"Not enough values of {parameter} for {name}. Skipping.")
+            continue
+
+        lines = {}
+        for runtime, points in runtimes.items():
+            xs = [value for value, _ in points]
+            ys = [data["value"] / 1e6 for _, data in points]
+            intercept, slope = _fit_linear(xs, ys)
+            logging.info(
+                f"{name} with {runtime}: fixed cost {intercept:.3f} ms, "
+                f"{slope:.6g} ms per unit of {parameter}"
+            )
+            lines[runtime] = {
+                "xs": xs,
+                "ys": ys,
+                "errors": [
+                    [(data["value"] - data["min"]) / 1e6 for _, data in points],
+                    [(data["max"] - data["value"]) / 1e6 for _, data in points],
+                ],
+                "intercept": intercept,
+                "slope": slope,
+            }
+
+        data = {
+            "parameter": parameter,
+            "lines": lines,
+            "title": f"Scaling of {name} with {parameter}\n{subtitle}".strip(),
+        }
+        figures.append((_draw_scaling, data, f"{results_name}_{name}_{parameter}.png"))
+
+    return figures
+
+
+def _draw_scaling(data, path):
+    """Draw the points and the fitted line of each runtime of a scaling series,
+    and save the figure."""
+
+    colors = plt.cm.tab10.colors
+    parameter = data["parameter"]
+    plt.figure(figsize=(12, 8))
+
+    for i, (runtime, line) in enumerate(data["lines"].items()):
+        color = colors[i % len(colors)]
+        xs, intercept, slope = line["xs"], line["intercept"], line["slope"]
+        plt.errorbar(
+            xs,
+            line["ys"],
+            yerr=line["errors"],
+            fmt="o",
+            color=color,
+            capsize=5,
+            label=f"{runtime}: {intercept:.3f} ms {slope:+.6g} ms × {parameter}",
+        )
+        plt.plot(
+            [min(xs), max(xs)],
+            [intercept + slope * min(xs), intercept + slope * max(xs)],
+            linestyle="--",
+            color=color,
+        )
+
+    plt.grid(linestyle="--", alpha=0.7)
+    plt.title(data["title"])
+    plt.ylabel("Elapsed time (ms)")
+    plt.xlabel(parameter)
+    plt.legend()
+    plt.tight_layout()
+    plt.savefig(path)
     plt.close()
-    logging.info(f"Saved plot to {plot_path}")
 
 
 def main(args):
@@ -260,35 +944,184 @@ def main(args):
     args.results_file = utils.get_absolute_path(args.results_file)
     args.plots_folder = utils.get_absolute_path(args.plots_folder)
 
-    results = utils.load_results_file(args.results_file)
-    if not results:
-        logging.info("No results found in the file.")
-        return
+    if args.page_size < 1:
+        logging.error("The page size must be at least 1.")
+        return 1
+
+    # The memory samples are only kept if they are plotted
+    memory_samples = {}
+    records = utils.iter_results_file(args.results_file)
+    if "memory" in args.kind:
+        records = _record_memory_samples(records, memory_samples)
 
-    statistics = _compute_statistics(results)
+    samples = load_samples(records)
+    statistics = compute_statistics(
+        samples,
+        outliers=args.outliers,
+        outlier_threshold=args.outlier_threshold,
+    )
     # Avoids empty plots
     if not statistics:
         logging.info("No valid results found in the file.")
         return
 
+    statistics = _select_aggregate(statistics, args.aggregate)
+    # Recorded in the title of the plots
+    subtitle = (
+        f"{args.aggregate} of the iterations, outliers: "
+        f"{utils.outlier_policy_name(args.outliers, args.outlier_threshold)}"
+    )
+
+    results_name = utils.get_results_name(args.results_file)
+
+    if args.scaling:
+        series = _collect_scaling_series(statistics, args.scaling)
+        if not series:
+            logging.info(f"No benchmark variants with parameter {args.scaling} found.")
+            return
+
+        figures = _scaling_figures(series, args.scaling, results_name, subtitle)
+        render.render_figures(figures, args.plots_folder, args.jobs, args.force)
+        return
+
+    if args.stat:
+        statistics = _select_stat(statistics, args.stat)
+        if not statistics:
+            logging.info(f"No values of stat {args.stat} found in the file.")
+            return
+
     benchmarks_list = _collect_benchmarks(statistics)
-    benchmark_metrics = _determine_benchmark_metrics(statistics, benchmarks_list)
+    benchmark_metrics = (
+        {benchmark: args.stat for benchmark in benchmarks_list}
+        if args.stat
+        else _determine_benchmark_metrics(statistics, benchmarks_list)
+    )
     raw_values = _transpose_benchmark_data(
         statistics, benchmarks_list, benchmark_metrics
     )
 
     if _all_benchmarks_single_runtime(statistics, benchmarks_list):
-        runtime_data = _absolute_values(benchmarks_list, raw_values)
+        runtime_data = _absolute_values(statistics, benchmarks_list, raw_values)
         ylabel = "Absolute Metric Value"
     else:
-        runtime_data = _normalize_values(benchmarks_list, benchmark_metrics, raw_values)
+        runtime_data = _normalize_values(
+            statistics, benchmarks_list, benchmark_metrics, raw_values
+        )
         ylabel = "Normalized Metric Value (%)"
 
-    _plot_results(
-        runtime_data,
-        benchmarks_list,
-        benchmark_metrics,
-        args.results_file,
-        args.plots_folder,
-        ylabel,
+    suffix = f"_{args.stat}" if args.stat else ""
+    figures = []
+
+    if "bars" in args.kind:
+        data = {
+            "runtime_data": runtime_data,
+            "benchmarks": benchmarks_list,
+            "metrics": benchmark_metrics,
+            "ylabel": ylabel,
+            "title": f"Benchmark Results Grouped by Runtime\n{subtitle}".strip(),
+        }
+        figures.append((_draw_bars, data, f"{results_name}{suffix}.png"))
+
+    if "heatmap" in args.kind:
+        baseline = args.baseline or next(iter(statistics))
+        if baseline not in statistics:
+            logging.error(f"Baseline runtime {baseline} not found in the results.")
+            return 1
+
+        data = {
+            "speedups": _speedup_matrix(
+                statistics, benchmarks_list, benchmark_metrics, baseline
+            ),
+            "runtimes": list(statistics),
+            "benchmarks": benchmarks_list,
+            "baseline": baseline,
+            "title": f"Speedup over {baseline}\n{subtitle}".strip(),
+        }
+        figures.append((_draw_heatmap, data, f"{results_name}{suffix}_heatmap.png"))
+
+    groups = benchmarks.get_benchmark_groups(
+        utils.get_absolute_path(args.benchmarks_folder)
     )
+    pages = _paginate(benchmarks_list, groups, args.page_size)
+
+    if "facets" in args.kind:
+        for group, page, count, page_benchmarks in pages:
+            data = {
+                "panels": _bar_panels(runtime_data, page_benchmarks, benchmark_metrics),
+                "runtimes": list(runtime_data),
+                "xlabel": ylabel,
+                "title": f"{group}, page {page} of {count}\n{subtitle}",
+            }
+            filename = f"{results_name}{suffix}_facets_{group}_{page}.png"
+            figures.append((_draw_facets, data, filename))
+
+    # Distributions show every iteration, outliers included
+    for kind in ("violin", "box"):
+        if kind not in args.kind:
+            continue
+        for group, page, count, page_benchmarks in pages:
+            data = {
+                "kind": kind,
+                "panels": _distribution_panels(
+                    samples, page_benchmarks, benchmark_metrics
+                ),
+                "runtimes": list(samples),
+                "title": f"{group}, page {page} of {count}\n"
+                "distribution of the iterations, outliers included",
+            }
+            filename = f"{results_name}{suffix}_{kind}_{group}_{page}.png"
+            figures.append((_draw_distributions, data, filename))
+
+    if "timeline" in args.kind:
+        keys = [
+            (runtime, benchmark)
+            for runtime, benchmarks_samples in samples.items()
+            for benchmark in benchmarks_samples
+        ]
+        flagged = find_outliers(
+            [samples[r][b]["elapsed_time_ns"] for r, b in keys],
+            args.outliers,
+            args.outlier_threshold,
+        )
+        outliers = {}
+        for (runtime, benchmark), mask in zip(keys, flagged):
+            outliers.setdefault(runtime, {})[benchmark] = mask.tolist()
+
+        policy = utils.outlier_policy_name(args.outliers, args.outlier_threshold)
+        for group, page, count, page_benchmarks in pages:
+            data = {
+                "panels": _timeline_panels(
+                    samples, page_benchmarks, benchmark_metrics, outliers
+                ),
+                "runtimes": list(samples),
+                "title": f"{group}, page {page} of {count}\n"
+                f"iterations in order, outliers ({policy}) circled in red",
+            }
+            filename = f"{results_name}{suffix}_timeline_{group}_{page}.png"
+            figures.append((_draw_timelines, data, filename))
+
+    if "memory" in args.kind:
+        if not memory_samples:
+            logging.info(
+                "No memory samples found in the file. Run with --memory-timeline "
+                "to record them."
+            )
+        runtimes = list(samples)
+        memory_benchmarks = [
+            benchmark
+            for benchmark in _collect_benchmarks(samples)
+            if benchmark in memory_samples
+        ]
+        for group, page, count, page_benchmarks in _paginate(
+            memory_benchmarks, groups, args.page_size
+        ):
+            data = {
+                "panels": _memory_panels(memory_samples, runtimes, page_benchmarks),
+                "runtimes": runtimes,
+                "title": f"{group}, page {page} of {count}\n"
+                "memory usage over time of each iteration",
+            }
+            filename = f"{results_name}_memory_{group}_{page}.png"
+            figures.append((_draw_memory, data, filename))
+
+    render.render_figures(figures, args.plots_folder, args.jobs, args.force)
@@ -0,0 +1,314 @@
+"""Shows the progress of a run, with its throughput and an ETA
+
+The ETA is estimated from the median elapsed time of each runtime and
+benchmark in the previous results files, as summarized by trend, scaled by
+how long the finished pairs actually took compared to their estimate (which
+accounts for the compilation, the harness and a slower or faster machine).
+Pairs without history are estimated from the average time of the finished
+iterations.
+
+On a terminal, a status line is redrawn below the log messages every
+REFRESH_SECONDS. Otherwise, a log line is written every LOG_SECONDS.
+"""
+
+import logging
+import os
+import shutil
+import sys
+import threading
+import time
+
+MODES = ["auto", "live", "log", "off"]
+DEFAULT_MODE = "auto"
+
+REFRESH_SECONDS = 1
+LOG_SECONDS = 60
+
+
+def load_estimates(results_folder):
+    """Return the median elapsed time in nanoseconds of an iteration of each
+    runtime and benchmark in the most recent results file that has them.
+
+    Args:
+        results_folder (str): The folder with the previous results files.
+
+    Returns:
+        dict: The estimates, by (runtime, benchmark).
+    """
+
+    if not os.path.isdir(results_folder):
+        return {}
+
+    # trend imports numpy, which the run doesn't need otherwise
+    from . import trend
+
+    estimates = {}
+    for _, summary in trend.load_history(results_folder):
+        for runtime, benchmarks in summary.items():
+            for benchmark, data in benchmarks.items():
+                if data["count"] and data["elapsed_time_ns"] > 0:
+                    estimates[(runtime, benchmark)] = data["elapsed_time_ns"]
+    return estimates
+
+
+def format_duration(seconds):
+    """Format a duration as e.g. 1h 02m, 3m 05s, 12s or 1.5s."""
+
+    if seconds < 10:
+        return f"{seconds:.1f}s"
+    seconds = int(round(seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours}h {minutes:02d}m"
+    if minutes:
+        return f"{minutes}m {seconds:02d}s"
+    return f"{seconds}s"
+
+
+class _ClearLine(logging.Filter):
+    """Clears the status line before a log message is written over it."""
+
+    def __init__(self, progress):
+        super().__init__()
+        self.progress = progress
+
+    def filter(self, record):
+        self.progress._clear()
+        return True
+
+
+class Progress:
+    """Tracks the pairs of runtime and benchmark of a run and shows their
+    progress. Safe to update from many worker threads.
+
+    Args:
+        pairs (list): The (runtime, benchmark) pairs of the run.
+        repeat (int): Number of iterations of each pair. A time budget may
+                      change it as the run goes.
+        estimates (dict): Historical elapsed time in nanoseconds of an
+                          iteration of each pair, as returned by
+                          load_estimates.
+        jobs (int): Number of pairs run at the same time.
+        mode (str): One of MODES. "auto" is "live" on a terminal, "log"
+                    otherwise.
+        stream: The stream of the status line (default: sys.stdout).
+    """
+
+    def __init__(
+        self, pairs, repeat, estimates=None, jobs=1, mode=DEFAULT_MODE, stream=None
+    ):
+        self.stream = stream or sys.stdout
+        if mode == "auto":
+            mode = "live" if self.stream.isatty() else "log"
+        self.mode = mode
+        self.repeat = repeat
+        self.jobs = jobs
+        self.estimates = estimates or {}
+        # Pairs not started yet, as an ordered set
+        self.pending = dict.fromkeys(pairs)
+        self.total = len(self.pending)
+
+        self.finished = 0
+        self.iterations = 0
+        # Wall time and estimated time of the finished pairs with history
+        self.estimated_wall_ns = 0
+        self.estimated_ns = 0
+        # Wall time and iterations of every finished pair
+        self.wall_ns = 0
+        self.wall_iterations = 0
+        # State of each worker: pair, iterations done and start time
+        self.workers = {}
+
+        self._lock = threading.Lock()
+        # Serializes the writes of the status line
+        self._draw_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._line = ""
+        self._filters = []
+        self.start_ns = time.perf_counter_ns()
+
+    def start(self):
+        """Start refreshing the status line, or logging the progress."""
+
+        if self.mode == "off":
+            return
+
+        if self.mode == "live":
+            for handler in logging.getLogger().handlers:
+                clear = _ClearLine(self)
+                handler.addFilter(clear)
+                self._filters.append((handler, clear))
+
+        known = sum(pair in self.estimates for pair in self.pending)
+        logging.info(
+            f"Running {self.total} pairs of runtime and benchmark, "
+            f"{known} with durations from previous results"
+        )
+        self._thread = threading.Thread(
+            target=self._refresh, name="progress", daemon=True
+        )
+        self._thread.start()
+
+    def start_pair(self, runtime, benchmark):
+        """Mark a pair as running on the calling worker."""
+
+        with self._lock:
+            self.workers[threading.current_thread().name] = [
+                (runtime, benchmark),
+                0,
+                time.perf_counter_ns(),
+            ]
+            self.pending.pop((runtime, benchmark), None)
+        self._draw()
+
+    def iteration_done(self):
+        """Count an iteration of the pair of the calling worker."""
+
+        with self._lock:
+            state = self.workers.get(threading.current_thread().name)
+            if state:
+                state[1] += 1
+            self.iterations += 1
+        self._draw()
+
+    def finish_pair(self):
+        """Mark the pair of the calling worker as finished."""
+
+        with self._lock:
+            state = self.workers.pop(threading.current_thread().name, None)
+            self.finished += 1
+            if state:
+                pair, iterations, start_ns = state
+                wall_ns = time.perf_counter_ns() - start_ns
+                if iterations:
+                    self.wall_ns += wall_ns
+                    self.wall_iterations += iterations
+                if iterations and pair in self.estimates:
+                    self.estimated_wall_ns += wall_ns
+                    self.estimated_ns += self.estimates[pair] * iterations
+        self._draw()
+
+    def iteration_cost_ns(self, pair):
+        """Return the expected time of an iteration of a pair, from history or
+        the finished iterations, or None if there is nothing to estimate it
+        from yet."""
+
+        with self._lock:
+            if pair in self.estimates:
+                # Ratio of the actual time to the historical estimate
+                scale = (
+                    self.estimated_wall_ns / self.estimated_ns
+                    if self.estimated_ns
+                    else 1
+                )
+                return self.estimates[pair] * scale
+            if self.wall_iterations:
+                return self.wall_ns / self.wall_iterations
+            return None
+
+    def set_repeat(self, repeat):
+        """Set the number of iterations of each pair. Return True if it
+        changed."""
+
+        with self._lock:
+            changed, self.repeat = repeat != self.repeat, repeat
+        return changed
+
+    def pending_pairs(self):
+        """Return the pairs that didn't start yet."""
+
+        with self._lock:
+            return list(self.pending)
+
+    def eta(self):
+        """Return the estimated remaining time in seconds, or None if there
+        is nothing to estimate it from yet."""
+
+        with self._lock:
+            remaining = [(pair, self.repeat) for pair in self.pending] + [
+                (pair, max(self.repeat - done, 0))
+                for pair, done, _ in self.workers.values()
+            ]
+
+        total_ns = 0
+        for pair, iterations in remaining:
+            cost_ns = self.iteration_cost_ns(pair)
+            if cost_ns is None and iterations:
+                return None
+            total_ns += (cost_ns or 0) * iterations
+
+        # Pairs run in parallel on the workers
+        return total_ns / 1e9 / self.jobs
+
+    def status(self):
+        """Return the status line."""
+
+        elapsed = (time.perf_counter_ns() - self.start_ns) / 1e9
+        eta = self.eta()
+        with self._lock:
+            rate = self.iterations / elapsed * 60 if elapsed else 0
+            workers = [
+                f"{runtime} {benchmark} {done}/{self.repeat}"
+                for (runtime, benchmark), done, _ in self.workers.values()
+            ]
+            finished = self.finished
+
+        return " | ".join(
+            [
+                f"{finished}/{self.total} pairs",
+                f"{rate:.1f} it/min",
+                f"elapsed {format_duration(elapsed)}",
+                f"ETA {format_duration(eta) if eta is not None else '?'}",
+            ]
+            + workers
+        )
+
+    def _clear(self):
+        """Clear the status line, if it's shown."""
+
+        if self.mode != "live":
+            return
+        with self._draw_lock:
+            if self._line:
+                self.stream.write("\r\033[K")
+                self.stream.flush()
+                self._line = ""
+
+    def _draw(self):
+        """Redraw the status line, if live."""
+
+        if self.mode != "live":
+            return
+        width = shutil.get_terminal_size().columns
+        line = self.status()[: width - 1]
+        with self._draw_lock:
+            self.stream.write("\r\033[K" + line)
+            self.stream.flush()
+            self._line = line
+
+    def _refresh(self):
+        """Redraw the status line every REFRESH_SECONDS, or log it every
+        LOG_SECONDS, until the run is closed."""
+
+        interval = REFRESH_SECONDS if self.mode == "live" else LOG_SECONDS
+        while not self._stop.wait(interval):
+            if self.mode == "live":
+                self._draw()
+            else:
+                logging.info(f"Progress: {self.status()}")
+
+    def close(self):
+        """Stop showing the progress and log the final status."""
+
+        if self.mode == "off":
+            return
+
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self._clear()
+        for handler, clear in self._filters:
+            handler.removeFilter(clear)
+        logging.info(f"Progress: {self.status()}")
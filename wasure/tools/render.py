@@ -0,0 +1,127 @@
+"""Renders figures in parallel, skipping the ones that didn't change
+
+A figure is a draw function, the data it plots and the name of its file. The
+hash of the function and of the data is stored in a cache in the plots
+folder, so that a figure is only drawn again when its data changed. Figures
+are drawn by a pool of processes with the non-interactive Agg backend.
+"""
+
+import concurrent.futures
+import hashlib
+import json
+import logging
+import os
+
+import matplotlib
+
+from ..wasure import VERSION_NUMBER
+
+matplotlib.use("Agg")
+
+CACHE_VERSION = 1
+CACHE_FILE = ".plot-cache.json"
+
+
+def figure_hash(draw, data):
+    """Return the hash of a figure, from its draw function and its data. The
+    version of wasure is part of it, so that figures are drawn again when the
+    draw functions change."""
+
+    key = [CACHE_VERSION, VERSION_NUMBER, draw.__module__, draw.__qualname__, data]
+    encoded = json.dumps(key, sort_keys=True, default=str).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def _load_cache(cache_file):
+    """Return the hashes of the figures in the cache, by file name."""
+
+    if not os.path.exists(cache_file):
+        return {}
+
+    try:
+        with open(cache_file, "r") as f:
+            cache = json.load(f)
+    except json.JSONDecodeError:
+        logging.warning(f"Invalid cache {cache_file}. Rebuilding it.")
+        return {}
+
+    return cache["figures"] if cache.get("version") == CACHE_VERSION else {}
+
+
+def _draw(draw, data, path):
+    """Draw a figure in a worker. Exceptions are returned, since they may not
+    be picklable."""
+
+    try:
+        draw(data, path)
+    except Exception as e:
+        return f"{type(e).__name__}: {e}"
+    return None
+
+
+def render_figures(figures, plots_folder, jobs=None, force=False):
+    """Draw the figures whose data changed since they were last drawn.
+
+    Args:
+        figures (list): A (draw function, data, file name) tuple for each
+                        figure. The draw function must be a module-level
+                        function taking the data and the path of the file,
+                        and the data must be JSON serializable.
+        plots_folder (str): The folder where the figures are saved.
+        jobs (int): Number of processes drawing the figures (default: the
+                    number of CPUs).
+        force (bool): If True, draw every figure.
+
+    Returns:
+        int: The number of figures drawn.
+    """
+
+    cache_file = os.path.join(plots_folder, CACHE_FILE)
+    cache = _load_cache(cache_file)
+
+    pending = {}
+    for draw, data, filename in figures:
+        filename = filename.replace(os.sep, "_")
+        path = os.path.join(plots_folder, filename)
+        digest = figure_hash(draw, data)
+        if not force and cache.get(filename) == digest and os.path.exists(path):
+            logging.debug(f"{path} is up to date. Skipping.")
+            continue
+        pending[filename] = (draw, data, path, digest)
+
+    skipped = len(figures) - len(pending)
+    if skipped:
+        logging.info(f"{skipped} figures are up to date")
+    if not pending:
+        return 0
+
+    jobs = min(jobs or os.cpu_count() or 1, len(pending))
+    logging.info(f"Drawing {len(pending)} figures with {jobs} processes")
+
+    if jobs == 1:
+        errors = {
+            filename: _draw(draw, data, path)
+            for filename, (draw, data, path, _) in pending.items()
+        }
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = {
+                filename: executor.submit(_draw, draw, data, path)
+                for filename, (draw, data, path, _) in pending.items()
+            }
+            errors = {filename: f.result() for filename, f in futures.items()}
+
+    drawn = 0
+    for filename, (_, _, path, digest) in pending.items():
+        if errors[filename]:
+            logging.error(f"Failed to draw {path}: {errors[filename]}")
+            cache.pop(filename, None)
+            continue
+        cache[filename] = digest
+        drawn += 1
+        logging.info(f"Saved plot to {path}")
+
+    with open(cache_file, "w") as f:
+        json.dump({"version": CACHE_VERSION, "figures": cache}, f)
+
+    return drawn
@@ -0,0 +1,490 @@
+"""Generates a self-contained HTML report of a results file
+
+The report is a single HTML file that needs no network: the results are
+pre-aggregated and embedded as compact JSON, and rendered by inline
+JavaScript. It has sortable, filterable tables of the leaderboard of the
+runtimes, of the speedups over a baseline on each benchmark, of the
+statistics of each runtime and benchmark and of the runtime statistics (e.g.
+compile times). Runtimes and benchmarks link to their rows in the other
+tables.
+"""
+
+import html
+import json
+import logging
+import math
+import os
+
+from ..wasure import VERSION_NUMBER
+from . import benchmarks, utils
+from .statistics import (
+    BOOTSTRAP_RESAMPLES,
+    CONFIDENCE,
+    benchmark_metrics,
+    compute_statistics,
+    load_samples,
+    remove_sample_outliers,
+)
+from .summary import OTHER_GROUP, OVERALL, compute_summary
+
+# Significant digits of the numbers embedded in the report
+DIGITS = 4
+
+# Columns of the rows of the statistics of each runtime and benchmark, after
+# the indexes of the runtime and of the benchmark. Times are in ms.
+AGGREGATE_COLUMNS = [
+    "iterations",
+    "outliers",
+    "median_ms",
+    "p5_ms",
+    "p95_ms",
+    "stddev_ms",
+    "mad_ms",
+    "ci_low_ms",
+    "ci_high_ms",
+    "score",
+    "speedup",
+]
+
+
+def parse(parser):
+    """Parse command-line arguments for the report module."""
+
+    # We use os.path.dirname two times because the script is in the tools
+    # folder and we want to get the plots folder.
+    script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    parser.add_argument(
+        "results_file",
+        help="""Path to the results file. For a database, the name of the run
+            can follow the path after a '#' (default: the most recent run)""",
+    )
+
+    parser.add_argument(
+        "--plots-folder",
+        default=os.path.join(script_dir, utils.DEFAULT_PLOTS_FOLDER),
+        help=f"""Path to the folder where the report will be saved
+            (default: {utils.DEFAULT_PLOTS_FOLDER})""",
+    )
+
+    parser.add_argument(
+        "--baseline",
+        metavar="RUNTIME",
+        default=None,
+        help="Runtime the speedups are relative to (default: the first runtime)",
+    )
+
+    parser.add_argument(
+        "--benchmarks-folder",
+        default=os.path.join(script_dir, utils.DEFAULT_BENCHMARKS_FOLDER),
+        help=f"""Path to the folder containing benchmarks, used to find the group
+            of each benchmark (default: {utils.DEFAULT_BENCHMARKS_FOLDER})""",
+    )
+
+    parser.add_argument(
+        "--resamples",
+        type=int,
+        default=BOOTSTRAP_RESAMPLES,
+        help=f"""Number of bootstrap resamples of the confidence intervals
+            (default: {BOOTSTRAP_RESAMPLES})""",
+    )
+
+    utils.add_outlier_arguments(parser)
+    utils.add_log_level_argument(parser)
+
+    return parser
+
+
+def _round(value, scale=1):
+    """Round a value to DIGITS significant digits, after dividing it by scale.
+    Missing and non-finite values are None."""
+
+    if value is None or not math.isfinite(value):
+        return None
+    return float(f"{value / scale:.{DIGITS}g}")
+
+
+def build_report_data(
+    samples,
+    baseline,
+    groups,
+    resamples=BOOTSTRAP_RESAMPLES,
+    outliers=utils.DEFAULT_OUTLIER_POLICY,
+    outlier_threshold=None,
+):
+    """Aggregate the samples into the data embedded in the report.
+
+    Runtimes and benchmarks are stored once, and referred to by their index
+    in the rows of the tables.
+
+    Args:
+        samples (dict): The samples, as returned by statistics.load_samples.
+                        Outliers are removed from them.
+        baseline (str): The runtime the speedups are relative to.
+        groups (dict): The group of each benchmark. Benchmarks that are not in
+                       it are in OTHER_GROUP.
+        resamples (int): Number of bootstrap resamples.
+        outliers (str): The outlier policy, one of utils.OUTLIER_POLICIES.
+        outlier_threshold (float): Threshold of the outlier policy.
+
+    Returns:
+        dict: The data of the report, with:
+              * runtimes, benchmarks and groups (of each benchmark)
+              * aggregates: a row for each runtime and benchmark, with their
+                indexes and the AGGREGATE_COLUMNS
+              * speedups: a row for each benchmark, with the speedup of each
+                runtime (None if missing)
+              * summary: the groups and a row for each runtime, with its index
+                and a (geometric mean, lower bound, upper bound, number of
+                benchmarks) list for each group (None if missing)
+              * stats: the names of the runtime statistics and a row for each
+                runtime and benchmark that has some, with their indexes and
+                the median of each statistic (None if missing)
+    """
+
+    statistics = compute_statistics(
+        samples, resamples, CONFIDENCE, outliers, outlier_threshold
+    )
+    metrics = benchmark_metrics(samples)
+    remove_sample_outliers(samples, outliers, outlier_threshold)
+    summary = compute_summary(samples, baseline, groups, resamples)
+
+    runtimes = list(statistics)
+    benchmarks_list = sorted({b for r in statistics.values() for b in r})
+    benchmark_index = {benchmark: i for i, benchmark in enumerate(benchmarks_list)}
+
+    def speedup(runtime, benchmark):
+        metric, higher_is_better = metrics[benchmark]
+        base = statistics[baseline].get(benchmark)
+        if base is None:
+            return None
+        new = statistics[runtime][benchmark][metric]["median"]
+        old = base[metric]["median"]
+        numerator, denominator = (new, old) if higher_is_better else (old, new)
+        return numerator / denominator if numerator > 0 < denominator else None
+
+    aggregates, stats_rows = [], []
+    speedups = [[None] * len(runtimes) for _ in benchmarks_list]
+    stat_names = sorted(
+        {
+            name
+            for benchmarks_statistics in statistics.values()
+            for data in benchmarks_statistics.values()
+            for name in data["stats"]
+        }
+    )
+
+    for r, (runtime, benchmarks_statistics) in enumerate(statistics.items()):
+        for benchmark, data in benchmarks_statistics.items():
+            b = benchmark_index[benchmark]
+            elapsed = data["elapsed_time_ns"]
+            speedups[b][r] = _round(speedup(runtime, benchmark))
+            aggregates.append(
+                [
+                    r,
+                    b,
+                    elapsed["count"],
+                    elapsed["outliers"],
+                    *(
+                        _round(elapsed.get(key), 1e6)
+                        for key in (
+                            "median",
+                            "p5",
+                            "p95",
+                            "stddev",
+                            "mad",
+                            "ci_low",
+                            "ci_high",
+                        )
+                    ),
+                    _round(data["score"]["median"]),
+                    speedups[b][r],
+                ]
+            )
+            if data["stats"]:
+                stats_rows.append(
+                    [r, b]
+                    + [
+                        _round(data["stats"][name]["median"])
+                        if name in data["stats"]
+                        else None
+                        for name in stat_names
+                    ]
+                )
+
+    summary_groups = [OVERALL] + sorted(
+        {g for s in summary.values() for g in s if g != OVERALL}
+    )
+    summary_rows = [
+        [
+            runtimes.index(runtime),
+            [
+                [_round(v) for v in runtime_summary[group][:3]]
+                + [runtime_summary[group][3]]
+                if group in runtime_summary
+                else None
+                for group in summary_groups
+            ],
+        ]
+        for runtime, runtime_summary in summary.items()
+    ]
+
+    return {
+        "runtimes": runtimes,
+        "benchmarks": benchmarks_list,
+        "groups": [groups.get(b, OTHER_GROUP) for b in benchmarks_list],
+        "aggregates": {"columns": AGGREGATE_COLUMNS, "rows": aggregates},
+        "speedups": speedups,
+        "summary": {"groups": summary_groups, "rows": summary_rows},
+        "stats": {"names": stat_names, "rows": stats_rows},
+    }
+
+
+def render_report(data, title, subtitle):
+    """Return the HTML of the report, with the data embedded."""
+
+    # Escaped, as "</script>" or "<!--" in a name would break the HTML
+    encoded = json.dumps(data, separators=(",", ":")).replace("<", "\\u003c")
+    return (
+        TEMPLATE.replace("{{title}}", html.escape(title))
+        .replace("{{subtitle}}", html.escape(subtitle))
+        .replace("{{data}}", encoded)
+    )
+
+
+def main(args):
+    logging.getLogger().setLevel(getattr(logging, args.log_level.upper()))
+    os.makedirs(args.plots_folder, exist_ok=True)
+
+    args.results_file = utils.get_absolute_path(args.results_file)
+    args.plots_folder = utils.get_absolute_path(args.plots_folder)
+
+    samples = load_samples(utils.iter_results_file(args.results_file))
+    if not samples:
+        logging.error("No valid results found in the file.")
+        return 1
+
+    baseline = args.baseline or next(iter(samples))
+    if baseline not in samples:
+        logging.error(f"Baseline runtime {baseline} not found in the results.")
+        return 1
+
+    data = build_report_data(
+        samples,
+        baseline,
+        benchmarks.get_benchmark_groups(
+            utils.get_absolute_path(args.benchmarks_folder)
+        ),
+        args.resamples,
+        args.outliers,
+        args.outlier_threshold,
+    )
+
+    results_name = utils.get_results_name(args.results_file)
+    subtitle = (
+        f"Speedups over {baseline}, {CONFIDENCE:.0%} confidence intervals, "
+        f"outliers: {utils.outlier_policy_name(args.outliers, args.outlier_threshold)}"
+        f" · WASURE {VERSION_NUMBER}"
+    )
+
+    report_path = os.path.join(args.plots_folder, f"{results_name}_report.html")
+    with open(report_path, "w") as f:
+        f.write(render_report(data, f"WASURE report: {results_name}", subtitle))
+
+    logging.info(f"Report saved to {report_path}")
+
+
+TEMPLATE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>{{title}}</title>
+<style>
+body { font-family: system-ui, sans-serif; margin: 0 2em 2em; color: #222; }
+nav { position: sticky; top: 0; background: #fff; padding: 0.8em 0;
+  border-bottom: 1px solid #ddd; }
+nav a { margin-right: 1.5em; font-weight: 600; }
+nav a.active { color: #222; text-decoration: none; }
+section { display: none; }
+section.active { display: block; }
+input { margin: 1em 0; padding: 0.3em; width: 20em; }
+table { border-collapse: collapse; font-size: 13px; }
+th, td { padding: 0.25em 0.6em; border-bottom: 1px solid #eee; }
+th { position: sticky; top: 3em; background: #f6f6f6; cursor: pointer;
+  white-space: nowrap; user-select: none; }
+th.asc::after { content: " \\25B2"; }
+th.desc::after { content: " \\25BC"; }
+td.num { text-align: right; font-variant-numeric: tabular-nums; }
+a { color: #1565c0; }
+.muted { color: #888; }
+</style>
+</head>
+<body>
+<h1>{{title}}</h1>
+<p class="muted">{{subtitle}}</p>
+<nav>
+<a href="#leaderboard">Leaderboard</a>
+<a href="#speedups">Speedups</a>
+<a href="#aggregates">Statistics</a>
+<a href="#stats">Runtime statistics</a>
+</nav>
+<section id="leaderboard"></section>
+<section id="speedups"></section>
+<section id="aggregates"></section>
+<section id="stats"></section>
+<script type="application/json" id="data">{{data}}</script>
+<script>
+"use strict";
+const DATA = JSON.parse(document.getElementById("data").textContent);
+const RUNTIMES = DATA.runtimes, BENCHMARKS = DATA.benchmarks;
+const tables = {};
+
+function esc(text) {
+  return String(text).replace(/[&<>"]/g, c =>
+    ({"&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;"})[c]);
+}
+
+function num(value, digits = 4) {
+  return value === null ? '<span class="muted">-</span>' :
+    Number(value.toPrecision(digits)).toLocaleString("en");
+}
+
+// Links to a view, filtered on exactly a runtime or a benchmark
+function link(view, name) {
+  const filter = encodeURIComponent(`"${name}"`);
+  return `<a href="#${view}:${filter}">${esc(name)}</a>`;
+}
+
+// Background of a speedup: green if faster than the baseline, red if slower
+function shade(speedup) {
+  if (speedup === null) return "";
+  const t = Math.max(-1, Math.min(1, Math.log2(speedup)));
+  const hue = t >= 0 ? 120 : 0;
+  return `background: hsla(${hue}, 60%, 50%, ${Math.abs(t) * 0.6})`;
+}
+
+// A sortable, filterable table. Each column has a title, a value to sort on,
+// the HTML of its cells and whether it is numeric. Rows are filtered on the
+// texts of the columns that have them: rows with a text containing the
+// filter, or equal to it if it is quoted.
+function makeTable(id, columns, rows) {
+  const section = document.getElementById(id);
+  section.innerHTML =
+    '<input type="search" placeholder="Filter"><table><thead><tr>' +
+    columns.map(c => `<th>${esc(c.title)}</th>`).join("") +
+    "</tr></thead><tbody></tbody></table>";
+  const input = section.querySelector("input");
+  const headers = section.querySelectorAll("th");
+  const body = section.querySelector("tbody");
+  const texts = rows.map(row =>
+    columns.filter(c => c.text).flatMap(c => c.text(row)).map(t =>
+      t.toLowerCase()));
+  const state = {column: -1, descending: false};
+
+  function render() {
+    const filter = input.value.trim().toLowerCase();
+    const exact = filter.match(/^"(.*)"$/);
+    let shown = rows.map((row, i) => i).filter(i => texts[i].some(t =>
+      exact ? t === exact[1] : t.includes(filter)));
+    if (state.column >= 0) {
+      const value = columns[state.column].value;
+      const sign = state.descending ? -1 : 1;
+      shown.sort((a, b) => {
+        const x = value(rows[a]), y = value(rows[b]);
+        if (x === y) return 0;
+        if (x === null) return 1;
+        if (y === null) return -1;
+        return (x < y ? -1 : 1) * sign;
+      });
+    }
+    body.innerHTML = shown.length ? shown.map(i => "<tr>" + columns.map(c =>
+      `<td class="${c.numeric ? "num" : ""}" style="${c.style ?
+        c.style(rows[i]) : ""}">${c.html(rows[i])}</td>`).join("") +
+      "</tr>").join("") :
+      `<tr><td class="muted" colspan="${columns.length}">No rows</td></tr>`;
+  }
+
+  headers.forEach((header, i) => header.addEventListener("click", () => {
+    state.descending = state.column === i ? !state.descending :
+      columns[i].numeric;
+    state.column = i;
+    headers.forEach(h => h.className = "");
+    header.className = state.descending ? "desc" : "asc";
+    render();
+  }));
+  input.addEventListener("input", render);
+  render();
+  return {filter: text => { input.value = text; render(); }};
+}
+
+const runtimeColumn = {
+  title: "Runtime", value: r => RUNTIMES[r[0]], text: r => RUNTIMES[r[0]],
+  html: r => link("aggregates", RUNTIMES[r[0]]),
+};
+const benchmarkColumn = {
+  title: "Benchmark", value: r => BENCHMARKS[r[1]],
+  text: r => [BENCHMARKS[r[1]], DATA.groups[r[1]]],
+  html: r => link("speedups", BENCHMARKS[r[1]]),
+};
+const groupColumn = {
+  title: "Group", value: r => DATA.groups[r[1]],
+  html: r => esc(DATA.groups[r[1]]),
+};
+function numberColumn(title, index) {
+  return {title, value: r => r[index], html: r => num(r[index]),
+          numeric: true};
+}
+
+tables.leaderboard = makeTable("leaderboard", [
+  runtimeColumn,
+  ...DATA.summary.groups.map((group, g) => ({
+    title: group, numeric: true,
+    value: r => r[1][g] && r[1][g][0],
+    html: r => r[1][g] === null ? num(null) :
+      `${num(r[1][g][0], 3)} <span class="muted">[${num(r[1][g][1], 3)}, ` +
+      `${num(r[1][g][2], 3)}] (${r[1][g][3]})</span>`,
+    style: r => shade(r[1][g] && r[1][g][0]),
+  })),
+], DATA.summary.rows);
+
+tables.speedups = makeTable("speedups", [
+  {title: "Benchmark", value: r => BENCHMARKS[r[0]],
+   text: r => [BENCHMARKS[r[0]], DATA.groups[r[0]]],
+   html: r => link("aggregates", BENCHMARKS[r[0]])},
+  {title: "Group", value: r => DATA.groups[r[0]],
+   html: r => esc(DATA.groups[r[0]])},
+  ...RUNTIMES.map((runtime, i) => ({
+    title: runtime, numeric: true, value: r => r[1][i],
+    html: r => num(r[1][i], 3), style: r => shade(r[1][i]),
+  })),
+], DATA.speedups.map((row, b) => [b, row]));
+
+const aggregateColumns = DATA.aggregates.columns;
+tables.aggregates = makeTable("aggregates", [
+  runtimeColumn, benchmarkColumn, groupColumn,
+  ...aggregateColumns.map((title, i) => Object.assign(
+    numberColumn(title, i + 2),
+    title === "speedup" ? {style: r => shade(r[i + 2])} : {})),
+], DATA.aggregates.rows);
+
+tables.stats = makeTable("stats", [
+  runtimeColumn, benchmarkColumn, groupColumn,
+  ...DATA.stats.names.map((name, i) => numberColumn(name, i + 2)),
+], DATA.stats.rows);
+
+// Views are selected by the fragment, e.g. #aggregates:wasmtime shows the
+// statistics filtered on wasmtime
+function route() {
+  const [view, filter] = (location.hash.slice(1) || "leaderboard").split(":");
+  if (!tables[view]) return;
+  document.querySelectorAll("section, nav a").forEach(e =>
+    e.classList.toggle("active",
+      e.id === view || e.getAttribute("href") === "#" + view));
+  if (filter !== undefined) tables[view].filter(decodeURIComponent(filter));
+}
+window.addEventListener("hashchange", route);
+route();
+</script>
+</body>
+</html>
+"""
@@ -5,16 +5,37 @@ different runtimes. It allows users to specify which benchmarks and
 runtimes to use, and saves the results to a specified folder.
 """
 
+import concurrent.futures
+import itertools
 import json
 import logging
 import os
-import re
 import subprocess
 import time
 
-import psutil
-
-from . import benchmarks, runtimes, utils
+from . import (
+    benchmarks,
+    compact,
+    db,
+    parsers,
+    plan,
+    progress,
+    runtimes,
+    trace,
+    utils,
+)
+
+# Maximum number of samples in the memory timeline of an iteration
+MEMORY_TIMELINE_SAMPLES = 1000
+
+# Stats of the time spent by the harness around each iteration, with
+# --profile-harness. Only the spawn time is part of the elapsed time.
+HARNESS_STATS = {
+    "harness_prepare_ns": "command formatting",
+    "harness_spawn_ns": "process spawn",
+    "harness_decode_ns": "output decoding",
+    "harness_parse_ns": "output validation and parsing",
+}
 
 
 def parse(parser):
@@ -77,6 +98,31 @@ def parse(parser):
         help=f"Path to the folder where results will be saved (default: {utils.DEFAULT_RESULTS_FOLDER})",
     )
 
+    parser.add_argument(
+        "--format",
+        choices=["json", "compact"],
+        default="json",
+        help="""Format of the results file. 'compact' stores the iterations as
+            typed arrays, with deduplicated outputs (default: json)""",
+    )
+
+    parser.add_argument(
+        "--compression",
+        choices=list(compact.COMPRESSIONS),
+        default="gzip",
+        help="""Compression of the compact results file. zstd needs the
+            zstandard package (default: gzip)""",
+    )
+
+    parser.add_argument(
+        "--db",
+        nargs="?",
+        const=os.path.join(script_dir, utils.DEFAULT_DATABASE_FILE),
+        default=None,
+        help=f"""Also store the results, with the runtime versions, in a SQLite
+            database. The path is optional (default: {utils.DEFAULT_DATABASE_FILE})""",
+    )
+
     parser.add_argument(
         "--repeat",
         type=int,
@@ -91,6 +137,14 @@ def parse(parser):
         help="Pool memory usage for the benchmark (default: False)",
     )
 
+    parser.add_argument(
+        "--memory-timeline",
+        action="store_true",
+        default=False,
+        help="""Also record the memory usage of each iteration over time, to plot
+            it with `plot --kind memory`. Implies --memory (default: False)""",
+    )
+
     parser.add_argument(
         "--timeout",
         type=int,
@@ -98,17 +152,102 @@ def parse(parser):
         help="Maximum time in seconds for each benchmark to run. If not specified, no timeout is applied.",
     )
 
+    parser.add_argument(
+        "--trace",
+        default=None,
+        metavar="FILE",
+        help="""Write a timeline of the run, with a span for each compilation,
+            iteration and parsing of an output, to a Trace Event Format JSON
+            file that can be opened with Perfetto or chrome://tracing""",
+    )
+
+    parser.add_argument(
+        "--profile-harness",
+        action="store_true",
+        default=False,
+        help="""Add the time spent by WASURE around each iteration (command
+            formatting, process spawn, output decoding and parsing) to its
+            stats, and print how the time of the run was split between the
+            benchmarks and the harness (default: False)""",
+    )
+
+    parser.add_argument(
+        "--profile-pstats",
+        default=None,
+        metavar="FILE",
+        help="""Also profile the harness with cProfile, writing the statistics
+            to a .pstats file that can be read with `python -m pstats`.
+            Implies --profile-harness""",
+    )
+
+    parser.add_argument(
+        "--progress",
+        choices=progress.MODES,
+        default=progress.DEFAULT_MODE,
+        help=f"""Show the finished pairs of runtime and benchmark, the
+            iterations per minute, what is running and an ETA estimated from
+            the previous results in the results folder. 'live' redraws a
+            status line, 'log' logs it every {progress.LOG_SECONDS} seconds and
+            'auto' picks 'live' on a terminal (default: {progress.DEFAULT_MODE})""",
+    )
+
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="""Number of benchmarks to run at the same time. The longest ones,
+            according to the previous results in the results folder, start
+            first. Benchmarks running at the same time compete for the CPU and
+            the memory, so their timings are noisier (default: 1)""",
+    )
+
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        default=False,
+        help="""Print the plan of the run, with the expected start and end of
+            each benchmark on each worker and the expected time of the run,
+            without running it (default: False)""",
+    )
+
+    parser.add_argument(
+        "--time-budget",
+        type=utils.parse_duration,
+        metavar="DURATION",
+        help="""Fit the run in a time budget, e.g. 2h, 90m or 1h30m. The number
+            of iterations of each benchmark, up to --repeat, is planned from
+            the previous results in the results folder and planned again as
+            the benchmarks finish. When the budget runs out, the benchmarks
+            that didn't run with every runtime are left out of the results
+            (default: no budget)""",
+    )
+
+    parser.add_argument(
+        "--time-budget-subset",
+        action="store_true",
+        default=False,
+        help="""With --time-budget, only run the first benchmarks, in the order
+            of -b, for which one iteration with every runtime fits the budget
+            (default: False)""",
+    )
+
+    utils.add_outlier_arguments(parser)
     utils.add_log_level_argument(parser)
 
     return parser
 
 
 def _filter_runtimes_by_name(selected_runtimes, runtimes_list):
-    """Returns only the runtimes that are in the selected_runtimes list."""
+    """Returns only the runtimes that are in the selected_runtimes list.
+    Choosing a runtime with a flag matrix also selects its configurations."""
 
     filtered_runtimes = []
     for runtime in runtimes_list:
-        if runtime["name"] in selected_runtimes:
+        if (
+            runtime["name"] in selected_runtimes
+            or runtime["name"].partition("@")[0] in selected_runtimes
+        ):
             filtered_runtimes.append(runtime)
     return filtered_runtimes
 
@@ -213,11 +352,28 @@ def _flatten_benchmarks(benchmarks_list):
     ]
 
 
-def _parse_score(output, score_parser):
-    match = re.search(score_parser, output)
-    if match:
-        return float(match.group("score"))
-    return 0
+def _tree_memory(psutil, proc):
+    """Return the RSS and VMS of a process, then the sums of the RSS and VMS
+    of the process and of its children, in bytes. Commands run in a shell, so
+    the runtime is a child of the process. Processes that exit while being
+    measured are left out."""
+
+    rss = vms = tree_rss = tree_vms = 0
+    try:
+        processes = [proc] + proc.children(recursive=True)
+    except psutil.NoSuchProcess:
+        return rss, vms, tree_rss, tree_vms
+
+    for process in processes:
+        try:
+            mem_info = process.memory_info()
+        except psutil.NoSuchProcess:
+            continue
+        if process is proc:
+            rss, vms = mem_info.rss, mem_info.vms
+        tree_rss += mem_info.rss
+        tree_vms += mem_info.vms
+    return rss, vms, tree_rss, tree_vms
 
 
 def _run_benchmark_with_runtime(
@@ -228,6 +384,9 @@ def _run_benchmark_with_runtime(
     precompiled_path=None,
     pool_memory=False,
     timeout_seconds=None,
+    output_parser=None,
+    memory_timeline=False,
+    profile_harness=False,
 ):
     """Run a benchmark with a given runtime.
 
@@ -237,6 +396,13 @@ def _run_benchmark_with_runtime(
         benchmarks_folder (str): The folder containing the benchmarks. Can
                                  be relative or absolute.
         precompiled_path (str): Path to the precompiled AOT file, if applicable.
+        output_parser (dict): The compiled output parser of the benchmark with
+                              the runtime. Compiled if not provided.
+        memory_timeline (bool): If True and pool_memory is True, also record
+                                the memory usage over time.
+        profile_harness (bool): If True, add the time spent by the harness
+                                around the benchmark to the stats (see
+                                HARNESS_STATS).
 
     Returns:
         tuple: A tuple containing
@@ -244,9 +410,17 @@ def _run_benchmark_with_runtime(
                * score: The score of the benchmark (if applicable)
                * return code: The return code of the benchmark
                * output: The output of the benchmark as a string
-               * stats: A dictionary containing the parsed stats
+               * stats: A dictionary containing the parsed stats, and the
+                 harness timings if profile_harness is True
+               * score samples: The scores parsed from the output, if the
+                 score parser captures every match
+               * memory samples: A [time since the start in nanoseconds, RSS
+                 of the process tree in bytes] pair for at most
+                 MEMORY_TIMELINE_SAMPLES samples of the memory usage, if
+                 memory_timeline is True
     """
 
+    prepare_start = time.perf_counter_ns()
     benchmarks_folder = utils.get_absolute_path(benchmarks_folder)
 
     benchmark_path = os.path.join(
@@ -261,11 +435,14 @@ def _run_benchmark_with_runtime(
     # folder. This is due to some runtimes that do not support mapping
     # directories to a different path in the WASM module. Hence, we need to
     # provide the absolute path to the benchmark folder for the file to be
-    # accessible.
-    arguments = benchmark.get("args", "").format(path=os.path.dirname(benchmark_path))
+    # accessible. Parameters of a benchmark variant fill their own placeholders.
+    arguments = benchmark.get("args", "").format(
+        path=os.path.dirname(benchmark_path), **benchmark.get("parameters", {})
+    )
 
     # Command formatting
     command = runtime["command"].format(
+        flags=runtime.get("flags", ""),
         payload=f'"{benchmark_path}"',
         entrypoint=benchmark.get("entrypoint", "")
         if "{entrypoint}" in runtime["command"]
@@ -290,21 +467,44 @@ def _run_benchmark_with_runtime(
         cwd=runtimes_folder,
     )
 
+    # Time spent by the harness around the benchmark, kept in its stats
+    harness = {}
+    if profile_harness:
+        harness["harness_prepare_ns"] = start_time - prepare_start
+        harness["harness_spawn_ns"] = time.perf_counter_ns() - start_time
+
     max_memory_rss = 0
     max_memory_vms = 0
+    max_tree_rss = 0
+    max_tree_vms = 0
+    memory_samples = []
 
     try:
         # if pool_memory is True, we will monitor the memory usage of the process
         if pool_memory:
+            import psutil
+
             proc = psutil.Process(process.pid)
             start = time.time()
+            # One poll out of stride is recorded in the timeline. Long runs
+            # double the stride, halving the timeline, to bound its size.
+            polls, stride = 0, 1
             while process.poll() is None:
                 if timeout_seconds and time.time() - start > timeout_seconds:
                     process.kill()
                     raise subprocess.TimeoutExpired(command, timeout_seconds)
-                mem_info = proc.memory_info()
-                max_memory_rss = max(max_memory_rss, mem_info.rss)
-                max_memory_vms = max(max_memory_vms, mem_info.vms)
+                rss, vms, tree_rss, tree_vms = _tree_memory(psutil, proc)
+                max_memory_rss = max(max_memory_rss, rss)
+                max_memory_vms = max(max_memory_vms, vms)
+                max_tree_rss = max(max_tree_rss, tree_rss)
+                max_tree_vms = max(max_tree_vms, tree_vms)
+                if memory_timeline and polls % stride == 0:
+                    sample_ns = time.perf_counter_ns() - start_time
+                    memory_samples.append([sample_ns, tree_rss])
+                    if len(memory_samples) >= 2 * MEMORY_TIMELINE_SAMPLES:
+                        memory_samples = memory_samples[::2]
+                        stride *= 2
+                polls += 1
                 time.sleep(0.01)
             stdout, stderr = process.communicate()
         else:
@@ -317,56 +517,92 @@ def _run_benchmark_with_runtime(
         process.kill()
         logging.warning(f"Benchmark timed out after {timeout_seconds} seconds")
         stdout, stderr = process.communicate()
-        elapsed_time = time.perf_counter_ns() - start_time
+        end_time = time.perf_counter_ns()
+        trace.record(
+            "execute",
+            start_time,
+            end_time,
+            runtime=runtime["name"],
+            benchmark=benchmark["name"],
+            return_code=-1,
+            timed_out=True,
+        )
+        elapsed_time = end_time - start_time
         return (
             elapsed_time,
             0,
             -1,
             stdout.decode().strip() + stderr.decode().strip(),
-            {},
+            harness,
+            [],
+            [],
         )
 
     end_time = time.perf_counter_ns()
     elapsed_time = end_time - start_time
+    trace.record(
+        "execute",
+        start_time,
+        end_time,
+        runtime=runtime["name"],
+        benchmark=benchmark["name"],
+        return_code=process.returncode,
+    )
 
     logging.debug(f"Elapsed time: {elapsed_time} ns")
 
     if pool_memory:
         logging.debug(f"Max RSS memory: {max_memory_rss / 1024} KB")
         logging.debug(f"Max VMS memory: {max_memory_vms / 1024} KB")
+        logging.debug(f"Max RSS memory of the tree: {max_tree_rss / 1024} KB")
 
     output = stdout.decode().strip() + stderr.decode().strip()
-    logging.debug(f"Output: {output}")
-
-    # Validate the output with a regex, if specified
-    if benchmark.get("output-validator") and not re.search(
-        benchmark.get("output-validator"), output
-    ):
-        logging.warning(
-            f"Output validation failed for benchmark {benchmark['name']} with runtime {runtime['name']}"
+    # Lazy formatting, as the output can be huge and is rarely logged
+    logging.debug("Output: %s", output)
+    decode_end = time.perf_counter_ns()
+    if profile_harness:
+        harness["harness_decode_ns"] = decode_end - end_time
+
+    with trace.span(
+        "parse", runtime=runtime["name"], benchmark=benchmark["name"]
+    ) as parse_args:
+        if output_parser is None:
+            output_parser = parsers.get_output_parser(benchmark, runtime)
+
+        # Validate the output with a regex, if specified
+        parse_args["valid"] = parsers.validate_output(output_parser, output)
+        if not parse_args["valid"]:
+            logging.warning(
+                f"Output validation failed for benchmark {benchmark['name']} with runtime {runtime['name']}"
+            )
+            return 0, 0, process.returncode, output, harness, [], []
+        logging.debug(
+            f"Output validation succeeded for benchmark {benchmark['name']} with runtime {runtime['name']}"
         )
-        return 0, 0, process.returncode, output, {}
-    logging.debug(
-        f"Output validation succeeded for benchmark {benchmark['name']} with runtime {runtime['name']}"
-    )
 
-    score = (
-        _parse_score(output, benchmark.get("score-parser"))
-        if benchmark.get("score-parser")
-        else 0
-    )
+        score, score_samples = parsers.parse_score(output_parser, output)
+        stats = parsers.parse_stats(output_parser, output)
 
-    stats = {
-        stat_name: match.group(stat_name)
-        for stat_name, stat_regex in (runtime.get("stats-parser") or {}).items()
-        if (match := re.search(stat_regex, output))
-    }
+    if profile_harness:
+        harness["harness_parse_ns"] = time.perf_counter_ns() - decode_end
+        stats.update(harness)
 
     if pool_memory:
         stats["max_rss_bytes"] = max_memory_rss
         stats["max_vms_bytes"] = max_memory_vms
-
-    return elapsed_time, score, process.returncode, output, stats
+        # Sums over the process tree, which count shared pages once per process
+        stats["max_tree_rss_bytes"] = max_tree_rss
+        stats["max_tree_vms_bytes"] = max_tree_vms
+
+    return (
+        elapsed_time,
+        score,
+        process.returncode,
+        output,
+        stats,
+        score_samples,
+        memory_samples,
+    )
 
 
 def _compile_benchmark(benchmark, runtime, benchmarks_folder, runtimes_folder):
@@ -392,9 +628,12 @@ def _compile_benchmark(benchmark, runtime, benchmarks_folder, runtimes_folder):
 
     if runtime["aot-command"]:
         aot_command = runtime["aot-command"].format(
-            input=f'"{benchmark_path}"', output=f'"{precompiled_path}"'
+            input=f'"{benchmark_path}"',
+            output=f'"{precompiled_path}"',
+            flags=runtime.get("flags", ""),
         )
         logging.debug(f"Running AOT command: '{aot_command}'")
+        start_time = time.perf_counter_ns()
         process = subprocess.Popen(
             aot_command,
             shell=True,
@@ -403,6 +642,14 @@ def _compile_benchmark(benchmark, runtime, benchmarks_folder, runtimes_folder):
             cwd=runtimes_folder,
         )
         stdout, stderr = process.communicate()
+        trace.record(
+            "compile",
+            start_time,
+            time.perf_counter_ns(),
+            runtime=runtime["name"],
+            benchmark=benchmark["name"],
+            return_code=process.returncode,
+        )
 
         logging.debug(f"AOT stdout: {stdout.decode().strip()}")
         logging.debug(f"AOT stderr: {stderr.decode().strip()}")
@@ -422,15 +669,127 @@ def _compile_benchmark(benchmark, runtime, benchmarks_folder, runtimes_folder):
     return None
 
 
-def _save_results_to_file(results, folder=utils.DEFAULT_RESULTS_FOLDER):
+def _remove_precompiled(precompiled_path):
+    """Remove a file compiled with an AOT command, if it exists."""
+
+    if precompiled_path and os.path.exists(precompiled_path):
+        os.remove(precompiled_path)
+        logging.debug(f"Removed precompiled file: {precompiled_path}")
+
+
+def _save_results_to_file(
+    results, folder=utils.DEFAULT_RESULTS_FOLDER, results_format="json", compression="gzip"
+):
     if not os.path.exists(folder):
         os.makedirs(folder)
 
-    filename = os.path.join(folder, time.strftime("%Y-%m-%d_%H-%M-%S.json"))
-    with open(filename, "w") as f:
-        json.dump(results, f, indent=4)
+    name = time.strftime("%Y-%m-%d_%H-%M-%S")
+    if results_format == "compact":
+        filename = os.path.join(folder, name + compact.EXTENSION)
+        compact.write_compact(results, filename, compression)
+    else:
+        filename = os.path.join(folder, name + ".json")
+        with open(filename, "w") as f:
+            json.dump(results, f, indent=4)
 
     logging.info(f"Results saved to {filename}")
+    return filename
+
+
+def _save_results_to_db(
+    results, db_file, results_file, runtimes_file, runtimes_folder, store_output
+):
+    """Stores the results in the database, with the version of each runtime."""
+
+    # Configurations of a flag matrix share the version of their runtime
+    versions = runtimes.get_runtime_versions(runtimes_file, runtimes_folder)
+    versions = {
+        runtime: versions.get(runtime, versions.get(runtime.partition("@")[0], ""))
+        for runtime in results
+    }
+
+    connection = db.connect(db_file)
+    try:
+        db.store_results(
+            connection,
+            results,
+            utils.get_results_name(results_file),
+            source=results_file,
+            versions=versions,
+            store_output=store_output,
+        )
+    finally:
+        connection.close()
+
+    logging.info(f"Results stored in {db_file}")
+
+
+def _matrix_axis_flags(axis):
+    """Returns the flags of an axis of a flag matrix as a dict label -> flags.
+
+    An axis is either a dict that maps a label to its flags or a dict with
+    a "flag" template and its "values".
+
+    Example:
+        {"flag": "-O opt-level={value}", "values": [0, 1]}
+            -> {"0": "-O opt-level=0", "1": "-O opt-level=1"}
+        {"on": "-C cranelift-probestack=true", "off": ""}
+            -> {"on": "-C cranelift-probestack=true", "off": ""}
+    """
+
+    if "flag" in axis and "values" in axis:
+        return {
+            str(value): axis["flag"].format(value=value) for value in axis["values"]
+        }
+
+    return {str(label): flags for label, flags in axis.items()}
+
+
+def _expand_flag_matrix(runtime):
+    """Expands a runtime with a flag matrix into its configurations.
+
+    Each combination of the axes in "flag-matrix" becomes a virtual
+    subruntime, whose flags replace the {flags} placeholder of the command
+    and of the AOT command. Its name is the name of the runtime followed by
+    the labels of the combination (e.g. wasmtime@opt-level=0,probestack=on),
+    so that results of different runs can be compared. The runtime itself is
+    kept, with no flags.
+
+    Args:
+        runtime (dict): The runtime (or subruntime) to expand.
+
+    Returns:
+        list: The runtime followed by its configurations.
+    """
+
+    matrix = runtime.pop("flag-matrix", None)
+    if not matrix:
+        return [runtime]
+
+    if "{flags}" not in runtime["command"]:
+        logging.warning(
+            f"Runtime {runtime['name']} has a flag matrix but no {{flags}} "
+            "placeholder in its command. Ignoring the matrix."
+        )
+        return [runtime]
+
+    axes = {name: _matrix_axis_flags(axis) for name, axis in matrix.items()}
+
+    configurations = []
+    for combination in itertools.product(*(axis.items() for axis in axes.values())):
+        labels = ",".join(
+            f"{name}={label}" for name, (label, _) in zip(axes, combination)
+        )
+        configurations.append(
+            {
+                **runtime,
+                "name": f"{runtime['name']}@{labels}",
+                "desc": f"{runtime.get('desc', runtime['name'])} ({labels})",
+                "flags": " ".join(flags for _, flags in combination if flags),
+            }
+        )
+
+    return [runtime] + configurations
 
 
 def get_runtimes(runtimes_file, chosen_runtimes):
@@ -441,15 +800,17 @@ def get_runtimes(runtimes_file, chosen_runtimes):
         chosen_runtimes (list): List of runtimes to use. Use 'all' to use all runtimes.
 
     Returns:
-        list: A list of dictionaries containing the runtimes.
+        list: A list of dictionaries containing the runtimes. Subruntimes and
+        the configurations of flag matrices are returned as runtimes.
         Returns an empty list if no runtimes are found.
     """
 
     runtimes_list = runtimes.list_runtimes(file=runtimes_file)
     flattened_runtimes = [
-        runtime
+        configuration
         for runtime in runtimes_list
         for runtime in ([runtime] + runtime.pop("subruntimes", []))
+        for configuration in _expand_flag_matrix(runtime)
     ]
 
     if "all" in chosen_runtimes:
@@ -467,33 +828,154 @@ def _run_benchmarks(
     no_store_output=False,
     pool_memory=False,
     timeout_seconds=None,
+    memory_timeline=False,
+    profile_harness=False,
+    tracker=None,
+    jobs=None,
+    workers=1,
+    budget=None,
 ):
-    """Runs benchmarks for each runtime and collects results."""
+    """Runs benchmarks for each runtime and collects results.
 
-    results = {}
+    The tracker, if any, is a progress.Progress updated as the benchmarks
+    run. The jobs are the ones of plan.build_plan, in the order the workers
+    take them (default: every pair in order). The pairs of a job run one
+    after the other, and the jobs run on workers threads at the same time.
+    Results are in the order of the runtimes and benchmarks regardless.
 
-    for runtime in runtimes_list:
-        logging.debug(f"Using runtime: {runtime['name']}")
-        results[runtime["name"]] = {}
+    With a budget, a plan.Budget, the pairs that didn't start when it runs
+    out are skipped, and their benchmarks are left out of the results for
+    every runtime, so that all runtimes have the same benchmarks.
+    """
 
-        for benchmark in benchmarks_list:
-            logging.info(
-                f"Running benchmark: {benchmark['name']} with runtime: {runtime['name']}"
-            )
-            results[runtime["name"]][benchmark["name"]] = run_benchmark_iterations(
-                benchmark,
-                runtime,
-                benchmarks_folder,
-                runtimes_folder,
-                repeat,
-                no_store_output,
-                pool_memory,
-                timeout_seconds,
-            )
+    results = {
+        runtime["name"]: {benchmark["name"]: None for benchmark in benchmarks_list}
+        for runtime in runtimes_list
+    }
+    if jobs is None:
+        jobs = plan.build_plan(
+            runtimes_list, benchmarks_list, benchmarks_folder, repeat, {}
+        )
+    # Benchmarks with a pair skipped because the time budget ran out
+    skipped = set()
+
+    def run_job(job):
+        # Pairs of a job share the compiled file of their benchmark, so it is
+        # compiled again only when the runtime changes
+        compiled_runtime, precompiled_path = None, None
+        try:
+            for runtime, benchmark in job["pairs"]:
+                if budget and budget.expired():
+                    skipped.add(benchmark["name"])
+                    continue
+                logging.info(
+                    f"Running benchmark: {benchmark['name']} with runtime: {runtime['name']}"
+                )
+                if tracker:
+                    tracker.start_pair(runtime["name"], benchmark["name"])
+                with trace.span(
+                    "benchmark", runtime=runtime["name"], benchmark=benchmark["name"]
+                ):
+                    aot = bool(runtime.get("aot-command"))
+                    if aot and runtime is not compiled_runtime:
+                        _remove_precompiled(precompiled_path)
+                        precompiled_path = _compile_benchmark(
+                            benchmark, runtime, benchmarks_folder, runtimes_folder
+                        )
+                        compiled_runtime = runtime
+
+                    # Pairs whose compilation failed have no results
+                    if not aot or precompiled_path:
+                        results[runtime["name"]][benchmark["name"]] = (
+                            run_benchmark_iterations(
+                                benchmark,
+                                runtime,
+                                benchmarks_folder,
+                                runtimes_folder,
+                                repeat,
+                                no_store_output,
+                                pool_memory,
+                                timeout_seconds,
+                                memory_timeline,
+                                profile_harness,
+                                tracker,
+                                precompiled_path,
+                                budget,
+                            )
+                        )
+                if tracker:
+                    tracker.finish_pair()
+        finally:
+            _remove_precompiled(precompiled_path)
+
+    if workers == 1:
+        for job in jobs:
+            run_job(job)
+    else:
+        _run_jobs_in_parallel(run_job, jobs, workers)
+
+    if skipped:
+        logging.warning(
+            f"Time budget ran out: leaving out {len(skipped)} benchmarks not run "
+            f"with every runtime: {', '.join(sorted(skipped))}"
+        )
+        for benchmarks in results.values():
+            for name in skipped:
+                benchmarks.pop(name, None)
 
     return results
 
 
+def _run_jobs_in_parallel(run_job, jobs, workers):
+    """Runs the jobs on workers threads, in the order they are given."""
+
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=workers, thread_name_prefix="worker"
+    ) as executor:
+        # The executor takes the jobs in the order they are submitted
+        futures = [executor.submit(run_job, job) for job in jobs]
+        try:
+            for future in futures:
+                future.result()
+        except BaseException:
+            # Jobs that didn't start are dropped, the running ones finish.
+            # Cancelled one by one, as shutdown(cancel_futures) needs 3.9.
+            for future in futures:
+                future.cancel()
+            raise
+
+
+def _mark_outliers(results, policy, threshold=None):
+    """Marks the iterations whose elapsed time is an outlier among the
+    successful iterations of the same benchmark and runtime, adding
+    "outlier": true to them. Iterations are kept in the results."""
+
+    # NumPy is only loaded when the results are ready, to start quickly
+    from . import statistics
+
+    groups = {
+        (runtime, benchmark): [run for run in runs if run["elapsed_time_ns"] > 0]
+        for runtime, benchmarks in results.items()
+        for benchmark, runs in benchmarks.items()
+        if runs
+    }
+    groups = {key: runs for key, runs in groups.items() if runs}
+
+    flagged = statistics.find_outliers(
+        [[run["elapsed_time_ns"] for run in runs] for runs in groups.values()],
+        policy,
+        threshold,
+    )
+    for ((runtime, benchmark), runs), mask in zip(groups.items(), flagged):
+        for run, outlier in zip(runs, mask):
+            if outlier:
+                run["outlier"] = True
+                logging.info(
+                    f"Iteration of {benchmark} with {runtime} marked as outlier "
+                    f"({run['elapsed_time_ns']} ns)"
+                )
+
+
 def run_benchmark_iterations(
     benchmark,
     runtime,
@@ -503,6 +985,11 @@ def run_benchmark_iterations(
     no_store_output=False,
     pool_memory=False,
     timeout_seconds=None,
+    memory_timeline=False,
+    profile_harness=False,
+    tracker=None,
+    precompiled_path=None,
+    budget=None,
 ):
     """Runs multiple iterations of a benchmark and collects results.
 
@@ -515,6 +1002,19 @@ def run_benchmark_iterations(
         no_store_output (bool): If True, do not store the output of the benchmark.
         pool_memory (bool): If True, pool memory usage for the benchmark.
         timeout_seconds (int): Maximum time in seconds for each benchmark to run.
+        memory_timeline (bool): If True, record the memory usage over time of
+                                each iteration, as its "memory_samples".
+        profile_harness (bool): If True, add the time spent by the harness
+                                around each iteration to its stats.
+        tracker (Progress): Progress of the run, counting the iterations.
+        precompiled_path (str): Path of the benchmark compiled with the AOT
+                                command of the runtime, kept after the
+                                iterations. If None, the benchmark is compiled
+                                and the compiled file removed at the end.
+        budget (Budget): Time budget of the run. If given, the number of
+                         iterations is planned to fit it, up to repeat, and
+                         no iteration starts after it runs out, though the
+                         first always runs.
 
     Returns:
         list: A list of dictionaries containing the results of each iteration.
@@ -522,52 +1022,103 @@ def run_benchmark_iterations(
     """
 
     iterations_results = []
-    precompiled_path = None
+    with trace.span(
+        "load parser", runtime=runtime["name"], benchmark=benchmark["name"]
+    ):
+        output_parser = parsers.get_output_parser(benchmark, runtime)
 
-    if runtime.get("aot-command"):
+    compiled = False
+    if runtime.get("aot-command") and precompiled_path is None:
         precompiled_path = _compile_benchmark(
             benchmark, runtime, benchmarks_folder, runtimes_folder
         )
         if precompiled_path is None:
             return None
+        compiled = True
+
+    if budget:
+        repeat = budget.repeat_for(runtime["name"], benchmark["name"])
 
-    for i in range(repeat):
+    i = 0
+    while i < repeat:
+        if budget and i and budget.expired():
+            logging.warning(
+                f"Time budget ran out after {i}/{repeat} iterations of "
+                f"{benchmark['name']} with {runtime['name']}"
+            )
+            break
         logging.info(f"Running iteration {i + 1}/{repeat}")
-        elapsed_time, score, return_code, output, stats = _run_benchmark_with_runtime(
-            benchmark,
-            runtime,
-            benchmarks_folder,
-            runtimes_folder,
-            precompiled_path,
-            pool_memory,
-            timeout_seconds,
-        )
+        iteration_start_ns = time.perf_counter_ns()
+        with trace.span(
+            "iteration",
+            runtime=runtime["name"],
+            benchmark=benchmark["name"],
+            iteration=i + 1,
+        ) as iteration_args:
+            (
+                elapsed_time,
+                score,
+                return_code,
+                output,
+                stats,
+                score_samples,
+                memory_samples,
+            ) = _run_benchmark_with_runtime(
+                benchmark,
+                runtime,
+                benchmarks_folder,
+                runtimes_folder,
+                precompiled_path,
+                pool_memory,
+                timeout_seconds,
+                output_parser,
+                memory_timeline,
+                profile_harness,
+            )
+            iteration_args["return_code"] = return_code
+        if tracker:
+            tracker.iteration_done()
 
         if return_code != 0:
             logging.warning(
                 f"Benchmark {benchmark['name']} failed with return code {return_code}"
             )
-            elapsed_time, score = 0, 0
+            elapsed_time, score, score_samples = 0, 0, []
 
         iterations_results.append(
             {
                 "elapsed_time_ns": elapsed_time,
                 "score": score,
+                **({"score_samples": score_samples} if score_samples else {}),
                 "return_code": return_code,
                 **({"output": output} if not no_store_output else {}),
                 **({"stats": stats} if stats else {}),
+                **({"memory_samples": memory_samples} if memory_samples else {}),
             }
         )
+        i += 1
+
+        if budget and i == 1:
+            # Planned again with the time of the first iteration, which is
+            # all there is to go on for a pair without history
+            repeat = budget.repeat_for(
+                runtime["name"],
+                benchmark["name"],
+                time.perf_counter_ns() - iteration_start_ns,
+            )
 
-    if precompiled_path and os.path.exists(precompiled_path):
-        os.remove(precompiled_path)
-        logging.debug(f"Removed precompiled file: {precompiled_path}")
+    if compiled:
+        _remove_precompiled(precompiled_path)
 
     return iterations_results
 
 
-def main(args):
-    logging.getLogger().setLevel(getattr(logging, args.log_level.upper()))
+def _run(args):
+    """Runs the benchmarks selected by the command-line arguments and saves
+    their results. Returns the results, or None if there is nothing to run."""
+
+    # The time budget counts from here
+    start_ns = time.perf_counter_ns()
 
     # Resolve absolute paths
     benchmarks_folder = utils.get_absolute_path(args.benchmarks_folder)
@@ -576,7 +1127,8 @@ def main(args):
     runtimes_folder = utils.get_absolute_path(args.runtimes_folder)
 
     # Loads the runtimes
-    runtimes_list = get_runtimes(runtimes_file, args.runtimes)
+    with trace.span("load runtimes"):
+        runtimes_list = get_runtimes(runtimes_file, args.runtimes)
     logging.debug(f"Using runtimes: {[r['name'] for r in runtimes_list]}")
 
     if not runtimes_list:
@@ -584,24 +1136,251 @@ def main(args):
         return
 
     # Load the benchmarks from the command line arguments
-    benchmarks_list = load_benchmarks(args.benchmarks, benchmarks_folder)
+    with trace.span("load benchmarks"):
+        benchmarks_list = load_benchmarks(args.benchmarks, benchmarks_folder)
     logging.debug(f"Using benchmarks: {benchmarks_list}")
 
     if not benchmarks_list:
         logging.error("No benchmarks found. Exiting.")
         return
 
+    with trace.span("plan"):
+        # Loading the history summarizes the new results files, so it's only
+        # done when the progress, the schedule or a budget uses it
+        estimates = {}
+        if (
+            args.progress != "off"
+            or args.jobs > 1
+            or args.time_budget
+            or args.dry_run
+        ):
+            estimates = progress.load_estimates(results_folder)
+        repeat = args.repeat
+        if args.time_budget:
+            if args.time_budget_subset:
+                selected = plan.select_benchmarks(
+                    runtimes_list,
+                    benchmarks_list,
+                    estimates,
+                    args.time_budget,
+                    args.jobs,
+                )
+                dropped = [b["name"] for b in benchmarks_list[len(selected) :]]
+                if dropped:
+                    logging.warning(
+                        f"Leaving out {len(dropped)} benchmarks that don't fit "
+                        f"the time budget: {', '.join(dropped)}"
+                    )
+                benchmarks_list = selected
+            repeat = plan.budget_repeat(
+                [
+                    (runtime["name"], benchmark["name"])
+                    for runtime in runtimes_list
+                    for benchmark in benchmarks_list
+                ],
+                estimates,
+                args.time_budget,
+                args.jobs,
+                args.repeat,
+            )
+            if estimates:
+                logging.info(
+                    f"Planned {repeat}/{args.repeat} iterations of each benchmark "
+                    "to fit the time budget of "
+                    f"{progress.format_duration(args.time_budget)}"
+                )
+            else:
+                logging.warning(
+                    "No previous results to fit the time budget: planning from "
+                    "the first iterations"
+                )
+
+        # With one worker and a budget, a benchmark runs with every runtime
+        # before the next one, so that a run cut short loses the fewest
+        jobs, assignments = plan.schedule(
+            plan.build_plan(
+                runtimes_list,
+                benchmarks_list,
+                benchmarks_folder,
+                repeat,
+                estimates,
+                by_benchmark=bool(args.time_budget) and args.jobs == 1,
+            ),
+            args.jobs,
+        )
+
+    if args.dry_run:
+        plan.print_plan(jobs, assignments, args.jobs)
+        if args.time_budget:
+            print(
+                f"Time budget {progress.format_duration(args.time_budget)}: "
+                f"{repeat}/{args.repeat} iterations of each benchmark"
+            )
+        return
+
+    if args.jobs > 1:
+        logging.warning(
+            f"Running {args.jobs} benchmarks at the same time: they compete for "
+            "the CPU and the memory, so their timings are noisier"
+        )
+
+    # The time budget plans from the progress, even when it isn't shown
+    tracker, budget = None, None
+    if args.progress != "off" or args.time_budget:
+        tracker = progress.Progress(
+            [
+                (runtime["name"], benchmark["name"])
+                for job in jobs
+                for runtime, benchmark in job["pairs"]
+            ],
+            repeat,
+            estimates,
+            jobs=args.jobs,
+            mode=args.progress,
+        )
+        tracker.start()
+    if args.time_budget:
+        budget = plan.Budget(
+            args.time_budget, tracker, args.repeat, args.jobs, start_ns
+        )
+
     # Run benchmarks
-    results = _run_benchmarks(
-        runtimes_list,
-        benchmarks_list,
-        benchmarks_folder,
-        runtimes_folder,
-        args.repeat,
-        args.no_store_output,
-        args.memory,
-        args.timeout,
-    )
+    try:
+        results = _run_benchmarks(
+            runtimes_list,
+            benchmarks_list,
+            benchmarks_folder,
+            runtimes_folder,
+            repeat,
+            args.no_store_output,
+            args.memory or args.memory_timeline,
+            args.timeout,
+            args.memory_timeline,
+            args.profile_harness,
+            tracker,
+            jobs,
+            args.jobs,
+            budget,
+        )
+    finally:
+        if tracker:
+            tracker.close()
+
+    with trace.span("mark outliers"):
+        _mark_outliers(results, args.outliers, args.outlier_threshold)
 
     # Save results
-    _save_results_to_file(results, folder=results_folder)
+    with trace.span("save results", format=args.format):
+        results_file = _save_results_to_file(
+            results,
+            folder=results_folder,
+            results_format=args.format,
+            compression=args.compression,
+        )
+
+    if args.db:
+        with trace.span("store in database"):
+            _save_results_to_db(
+                results,
+                utils.get_absolute_path(args.db),
+                results_file,
+                runtimes_file,
+                runtimes_folder,
+                not args.no_store_output,
+            )
+
+    return results
+
+
+def _print_harness_profile(results, session_ns, workers=1):
+    """Prints how the time of the run was split between the benchmarks and
+    the harness, from the harness stats of the iterations.
+
+    Args:
+        results (dict): The results, with the HARNESS_STATS of each iteration.
+        session_ns (int): The time of the whole run in nanoseconds.
+        workers (int): Number of workers. Their time is the time of the run
+                       times their number.
+    """
+
+    # Time of the workers, which the benchmarks share
+    total_ns = session_ns * workers
+
+    iterations = [
+        run
+        for benchmarks in results.values()
+        for runs in benchmarks.values()
+        for run in runs or []
+    ]
+    totals = {
+        name: sum(run.get("stats", {}).get(name, 0) for run in iterations)
+        for name in HARNESS_STATS
+    }
+    # Failed iterations have no elapsed time, so their time is left in "other"
+    benchmark_ns = (
+        sum(run["elapsed_time_ns"] for run in iterations)
+        - sum(
+            run.get("stats", {}).get("harness_spawn_ns", 0)
+            for run in iterations
+            if run["elapsed_time_ns"]
+        )
+    )
+    rows = {"benchmarks (elapsed time - spawn)": benchmark_ns}
+    rows.update(
+        {f"harness: {HARNESS_STATS[name]}": total for name, total in totals.items()}
+    )
+    rows["harness: other (loading, AOT compilation, idle, saving)"] = max(
+        total_ns - sum(rows.values()), 0
+    )
+    rows["harness total"] = total_ns - benchmark_ns
+
+    print(
+        f"Harness profile of {len(iterations)} iterations "
+        f"in {session_ns / 1e9:.2f} s on {workers} workers"
+    )
+    for label, ns in rows.items():
+        print(f"  {label:<56} {ns / 1e9:>9.3f} s {100 * ns / total_ns:>6.1f}%")
+
+
+def main(args):
+    logging.getLogger().setLevel(getattr(logging, args.log_level.upper()))
+    args.profile_harness = args.profile_harness or bool(args.profile_pstats)
+
+    if args.jobs < 1:
+        logging.error("--jobs must be at least 1.")
+        return 1
+
+    # Resolved now, as the run may change the working directory
+    trace_file = utils.get_absolute_path(args.trace) if args.trace else None
+    pstats_file = (
+        utils.get_absolute_path(args.profile_pstats) if args.profile_pstats else None
+    )
+
+    profiler = None
+    if args.profile_pstats:
+        import cProfile
+
+        if args.jobs > 1:
+            logging.warning("cProfile only profiles the harness in the main thread")
+        profiler = cProfile.Profile()
+
+    # The trace is saved even if the run is interrupted, to see where it was
+    if args.trace:
+        trace.start()
+
+    start_time = time.perf_counter_ns()
+    try:
+        with trace.span("wasure run"):
+            results = profiler.runcall(_run, args) if profiler else _run(args)
+        session_ns = time.perf_counter_ns() - start_time
+    finally:
+        if args.trace:
+            events = trace.save(trace_file)
+            logging.info(f"Trace with {events} events saved to {trace_file}")
+        if profiler:
+            os.makedirs(os.path.dirname(pstats_file), exist_ok=True)
+            profiler.dump_stats(pstats_file)
+            logging.info(f"Harness profile saved to {pstats_file}")
+
+    if args.profile_harness and results:
+        _print_harness_profile(results, session_ns, args.jobs)
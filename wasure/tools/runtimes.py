@@ -7,6 +7,7 @@ import json
 import logging
 import os
 import shutil
+import subprocess
 
 from . import run, utils
 
@@ -459,16 +460,46 @@ def _get_runtime_version(command, runtimes_folder=utils.DEFAULT_RUNTIMES_FOLDER)
         str: The version of the runtime. Returns None if the version could not be determined.
     """
 
-    os.chdir(runtimes_folder)
-    process = os.popen(command)
-    output = process.read()
-    exit_code = process.close() or 0
+    # Runs in the runtimes folder without changing the working directory,
+    # which the caller may still resolve relative paths from
+    process = subprocess.run(
+        command,
+        shell=True,
+        cwd=runtimes_folder,
+        stdout=subprocess.PIPE,
+        text=True,
+    )
 
-    if exit_code != 0:
-        logging.error(f"Failed to get version: {output}")
+    if process.returncode != 0:
+        logging.error(f"Failed to get version: {process.stdout}")
         return None
 
-    return output.strip()
+    return process.stdout.strip()
+
+
+def get_runtime_versions(runtimes_file, runtimes_folder):
+    """Get the version of every installed runtime.
+
+    Subruntimes and flag matrix configurations share the version of their
+    runtime.
+
+    Returns:
+        dict: Dictionary mapping the name of each runtime and subruntime to the
+              first line of its version. Runtimes whose version can't be
+              determined are left out.
+    """
+
+    versions = {}
+    for runtime in list_runtimes(runtimes_file):
+        version = _get_runtime_version(runtime["version-command"], runtimes_folder)
+        if not version:
+            continue
+        for name in [runtime["name"]] + [
+            subruntime["name"] for subruntime in runtime.get("subruntimes", [])
+        ]:
+            versions[name] = version.splitlines()[0]
+
+    return versions
 
 
 def main(args):
@@ -0,0 +1,554 @@
+"""Computes statistics of the results of the benchmarks
+
+The samples of every runtime and benchmark are loaded in NumPy arrays once.
+All the series (e.g. the elapsed times of every runtime and benchmark) are
+then padded into a single matrix, so that each statistic is computed for all
+of them in one vectorized pass, bootstrap confidence intervals included.
+"""
+
+import math
+
+import numpy as np
+
+from . import utils
+
+# Percentiles computed for each series, besides the median
+PERCENTILES = (5, 25, 75, 90, 95)
+
+BOOTSTRAP_RESAMPLES = 1000
+CONFIDENCE = 0.95
+
+# Seed of the bootstrap, so that confidence intervals are reproducible
+BOOTSTRAP_SEED = 0
+
+# Maximum number of values resampled at once by the bootstrap, to bound memory
+_BOOTSTRAP_CHUNK_SIZE = 2**22
+
+
+def load_samples(records):
+    """Load the samples of each runtime and benchmark in NumPy arrays.
+
+    Runs with elapsed_time_ns <= 0 are left out. Runs that captured several
+    scores contribute with every sample, and stats that captured every match
+    with every value. Only numeric stats are loaded.
+
+    Args:
+        records (iterable): (runtime, benchmark, index, run) tuples, as yielded
+                            by utils.iter_results_file.
+
+    Returns:
+        dict: The samples, in the order of the records. Runtimes with no valid
+              runs are left out. "iterations" holds the index of the
+              iteration of each elapsed time.
+
+              Example:
+                {
+                    "runtime1": {
+                        "benchmark1": {
+                            "elapsed_time_ns": array([...]),
+                            "iterations": array([...]),
+                            "score": array([...]),
+                            "stats": {"compile_time_ns": array([...])}
+                        }
+                    }
+                }
+    """
+
+    samples = {}
+    for runtime, benchmark, index, run in records:
+        if run["elapsed_time_ns"] <= 0:
+            continue
+
+        data = samples.setdefault(runtime, {}).setdefault(
+            benchmark,
+            {"elapsed_time_ns": [], "iterations": [], "score": [], "stats": {}},
+        )
+        data["elapsed_time_ns"].append(run["elapsed_time_ns"])
+        data["iterations"].append(index)
+        data["score"].extend(run.get("score_samples") or [run["score"]])
+
+        for name, value in run.get("stats", {}).items():
+            for v in value if isinstance(value, list) else [value]:
+                if isinstance(v, (int, float)):
+                    data["stats"].setdefault(name, []).append(v)
+
+    for benchmarks in samples.values():
+        for data in benchmarks.values():
+            data["elapsed_time_ns"] = np.asarray(data["elapsed_time_ns"], dtype=float)
+            data["iterations"] = np.asarray(data["iterations"], dtype=np.intp)
+            data["score"] = np.asarray(data["score"], dtype=float)
+            data["stats"] = {
+                name: np.asarray(values, dtype=float)
+                for name, values in data["stats"].items()
+            }
+
+    return samples
+
+
+def _pad(series):
+    """Pad a list of 1-D arrays into a matrix, one row per array, filling the
+    missing values with NaN. Returns the matrix and the length of each row."""
+
+    counts = np.array([len(s) for s in series], dtype=np.intp)
+    matrix = np.full((len(series), counts.max(initial=1)), np.nan)
+    mask = np.arange(matrix.shape[1]) < counts[:, None]
+    matrix[mask] = np.concatenate(series) if series else []
+    return matrix, counts
+
+
+def _sorted_quantile(matrix, counts, q):
+    """Quantile q (0-1) of each row of a matrix sorted along its rows, with
+    its NaN padding at the end. Uses linear interpolation, as np.percentile."""
+
+    position = q * (counts - 1)
+    lower = np.floor(position).astype(np.intp)
+    upper = np.ceil(position).astype(np.intp)
+    lower_values = np.take_along_axis(matrix, lower[..., None], -1)[..., 0]
+    upper_values = np.take_along_axis(matrix, upper[..., None], -1)[..., 0]
+    return lower_values + (upper_values - lower_values) * (position - lower)
+
+
+def describe(series, percentiles=PERCENTILES):
+    """Compute the descriptive statistics of many series at once.
+
+    Args:
+        series (list): List of non-empty 1-D arrays.
+        percentiles (tuple): Percentiles to compute, besides the median.
+
+    Returns:
+        dict: Arrays with one value per series for count, avg, min, max,
+              median, stddev (sample standard deviation, 0 for a single
+              value), mad (median absolute deviation) and p<N> for each
+              percentile.
+    """
+
+    matrix, counts = _pad(series)
+    matrix.sort(axis=1)
+    valid = ~np.isnan(matrix)
+
+    mean = np.nansum(matrix, axis=1) / counts
+    squares = np.where(valid, (matrix - mean[:, None]) ** 2, 0).sum(axis=1)
+    median = _sorted_quantile(matrix, counts, 0.5)
+
+    deviations = np.abs(matrix - median[:, None])
+    deviations.sort(axis=1)
+
+    statistics = {
+        "count": counts,
+        "avg": mean,
+        "min": matrix[:, 0],
+        "max": np.take_along_axis(matrix, (counts - 1)[:, None], 1)[:, 0],
+        "median": median,
+        "stddev": np.sqrt(squares / np.maximum(counts - 1, 1)),
+        "mad": _sorted_quantile(deviations, counts, 0.5),
+    }
+    for percentile in percentiles:
+        statistics[f"p{percentile}"] = _sorted_quantile(
+            matrix, counts, percentile / 100
+        )
+
+    return statistics
+
+
+def find_outliers(series, policy=utils.DEFAULT_OUTLIER_POLICY, threshold=None):
+    """Find the outliers of many series at once.
+
+    Args:
+        series (list): List of non-empty 1-D arrays.
+        policy (str): One of utils.OUTLIER_POLICIES.
+        threshold (float): Threshold of the policy. Default: the one in
+                           utils.OUTLIER_POLICIES.
+
+    Returns:
+        list: A boolean array for each series, True for its outliers.
+    """
+
+    if policy == "none" or not series:
+        return [np.zeros(len(s), dtype=bool) for s in series]
+
+    threshold = threshold or utils.OUTLIER_POLICIES[policy]
+    matrix, _ = _pad(series)
+    described = describe(series, percentiles=(25, 75))
+
+    # NaN padding is never an outlier, as comparisons with NaN are False
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if policy == "mad":
+            scores = 0.6745 * np.abs(matrix - described["median"][:, None])
+            # No outliers if more than half of the values are the same
+            flagged = scores > threshold * described["mad"][:, None]
+            flagged &= described["mad"][:, None] > 0
+        else:
+            spread = threshold * (described["p75"] - described["p25"])[:, None]
+            flagged = (matrix < described["p25"][:, None] - spread) | (
+                matrix > described["p75"][:, None] + spread
+            )
+
+    return [flagged[i, : len(s)] for i, s in enumerate(series)]
+
+
+def _bootstrap_estimates(series, statistic, resamples, rng):
+    """Bootstrap estimates of the statistic ("median" or "avg") of many series.
+
+    Each series is resampled with replacement. Resamples of all the series are
+    drawn together, in chunks that bound the memory used.
+
+    Returns:
+        ndarray: A matrix with one row per series and one column per resample.
+    """
+
+    matrix, counts = _pad(series)
+    width = matrix.shape[1]
+    chunk = max(1, _BOOTSTRAP_CHUNK_SIZE // (resamples * width))
+
+    estimates = np.empty((len(series), resamples))
+    for start in range(0, len(series), chunk):
+        rows = slice(start, start + chunk)
+        n = counts[rows, None, None]
+
+        # Indices drawn uniformly among the values of each series. Positions
+        # beyond the length of a series are masked with NaN.
+        indices = (rng.random((len(n), resamples, width)) * n).astype(np.intp)
+        values = np.take_along_axis(matrix[rows, None, :], indices, -1)
+        values = np.where(np.arange(width) < n, values, np.nan)
+
+        if statistic == "avg":
+            estimates[rows] = np.nansum(values, axis=-1) / n[:, :, 0]
+        else:
+            values.sort(axis=-1)
+            estimates[rows] = _sorted_quantile(
+                values, np.broadcast_to(n[:, :, 0], values.shape[:2]), 0.5
+            )
+
+    return estimates
+
+
+def _interval(estimates, confidence):
+    """Percentile interval of each row of bootstrap estimates."""
+
+    alpha = (1 - confidence) / 2
+    lower, upper = np.percentile(estimates, [100 * alpha, 100 * (1 - alpha)], axis=1)
+    return lower, upper
+
+
+def bootstrap_ci(
+    series,
+    statistic="median",
+    resamples=BOOTSTRAP_RESAMPLES,
+    confidence=CONFIDENCE,
+    seed=BOOTSTRAP_SEED,
+):
+    """Compute bootstrap confidence intervals of many series at once.
+
+    Args:
+        series (list): List of non-empty 1-D arrays.
+        statistic (str): "median" or "avg".
+        resamples (int): Number of bootstrap resamples.
+        confidence (float): Confidence level of the intervals.
+        seed (int): Seed of the random generator.
+
+    Returns:
+        tuple: Arrays with the lower and upper bound for each series.
+    """
+
+    rng = np.random.default_rng(seed)
+    estimates = _bootstrap_estimates(series, statistic, resamples, rng)
+    return _interval(estimates, confidence)
+
+
+def bootstrap_ratio_ci(
+    numerators,
+    denominators,
+    statistic="median",
+    resamples=BOOTSTRAP_RESAMPLES,
+    confidence=CONFIDENCE,
+    seed=BOOTSTRAP_SEED,
+):
+    """Compute bootstrap confidence intervals of the ratio between the
+    statistic of pairs of series, e.g. the speedup of a runtime over another.
+
+    Args:
+        numerators (list): List of non-empty 1-D arrays.
+        denominators (list): List of non-empty 1-D arrays, one for each
+                             numerator.
+        statistic (str): "median" or "avg".
+        resamples (int): Number of bootstrap resamples.
+        confidence (float): Confidence level of the intervals.
+        seed (int): Seed of the random generator.
+
+    Returns:
+        tuple: Arrays with the lower and upper bound of each ratio.
+    """
+
+    rng = np.random.default_rng(seed)
+    numerator = _bootstrap_estimates(numerators, statistic, resamples, rng)
+    denominator = _bootstrap_estimates(denominators, statistic, resamples, rng)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return _interval(numerator / denominator, confidence)
+
+
+def bootstrap_geomean_ci(
+    numerators,
+    denominators,
+    groups,
+    statistic="median",
+    resamples=BOOTSTRAP_RESAMPLES,
+    confidence=CONFIDENCE,
+    seed=BOOTSTRAP_SEED,
+):
+    """Compute the geometric mean of the ratios between the statistic of
+    pairs of series over groups of pairs, with bootstrap confidence intervals,
+    e.g. the mean speedup of a runtime over another on a suite of benchmarks.
+
+    Every pair is resampled once, and the resamples are shared by the groups.
+
+    Args:
+        numerators (list): List of non-empty 1-D arrays.
+        denominators (list): List of non-empty 1-D arrays, one for each
+                             numerator.
+        groups (dict): The indices of the pairs of each group.
+        statistic (str): "median" or "avg".
+        resamples (int): Number of bootstrap resamples.
+        confidence (float): Confidence level of the intervals.
+        seed (int): Seed of the random generator.
+
+    Returns:
+        dict: A tuple with the geometric mean and the lower and upper bound of
+              its interval for each group.
+    """
+
+    point = describe(numerators)[statistic] / describe(denominators)[statistic]
+
+    rng = np.random.default_rng(seed)
+    numerator = _bootstrap_estimates(numerators, statistic, resamples, rng)
+    denominator = _bootstrap_estimates(denominators, statistic, resamples, rng)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        logs = np.log(numerator / denominator)
+    logs[~np.isfinite(logs)] = np.nan
+
+    intervals = {}
+    for group, indices in groups.items():
+        indices = np.asarray(indices, dtype=np.intp)
+        means = np.exp(np.nanmean(logs[indices], axis=0))
+        lower, upper = _interval(means[None, :], confidence)
+        geomean = float(np.exp(np.log(point[indices]).mean()))
+        intervals[group] = (geomean, float(lower[0]), float(upper[0]))
+
+    return intervals
+
+
+def remove_outliers(series, policy=utils.DEFAULT_OUTLIER_POLICY, threshold=None):
+    """Return the series without their outliers (see find_outliers)."""
+
+    flagged = find_outliers(series, policy, threshold)
+    return [np.asarray(values)[~mask] for values, mask in zip(series, flagged)]
+
+
+def remove_sample_outliers(
+    samples, policy=utils.DEFAULT_OUTLIER_POLICY, threshold=None
+):
+    """Remove the outliers of the elapsed times and of the scores of every
+    runtime and benchmark of the samples, in place. Outliers of every series
+    are found at once."""
+
+    series = [
+        (data, metric)
+        for benchmarks in samples.values()
+        for data in benchmarks.values()
+        for metric in ("elapsed_time_ns", "score")
+    ]
+    kept = remove_outliers([data[metric] for data, metric in series], policy, threshold)
+    for (data, metric), values in zip(series, kept):
+        data[metric] = values
+
+
+def benchmark_metrics(samples):
+    """Return the metric of each benchmark, and whether higher is better.
+
+    As in plot, the score is used if any runtime has a score > 0 for the
+    benchmark, otherwise the elapsed time.
+
+    Args:
+        samples (dict): The samples, as returned by load_samples.
+
+    Returns:
+        dict: A ("score", True) or ("elapsed_time_ns", False) tuple for each
+              benchmark.
+    """
+
+    metrics = {}
+    for benchmarks in samples.values():
+        for benchmark, data in benchmarks.items():
+            if data["score"].size and data["score"].max() > 0:
+                metrics[benchmark] = ("score", True)
+            else:
+                metrics.setdefault(benchmark, ("elapsed_time_ns", False))
+    return metrics
+
+
+def mann_whitney_u(x, y):
+    """Two-sided Mann-Whitney U test of two samples.
+
+    The p-value uses the normal approximation, with the correction for ties
+    and for continuity. It is reliable with at least 8-10 values per sample.
+
+    Args:
+        x (ndarray): The first sample.
+        y (ndarray): The second sample.
+
+    Returns:
+        tuple: The U statistic of x and the p-value. The p-value is 1 if all
+               the values are the same.
+    """
+
+    n1, n2 = len(x), len(y)
+    values = np.concatenate([x, y])
+
+    # Average ranks (starting from 1) of tied values
+    _, inverse, ties = np.unique(values, return_inverse=True, return_counts=True)
+    ranks = (np.cumsum(ties) - (ties - 1) / 2)[inverse]
+
+    u = ranks[:n1].sum() - n1 * (n1 + 1) / 2
+    n = n1 + n2
+    variance = n1 * n2 / 12 * ((n + 1) - (ties**3 - ties).sum() / (n * (n - 1)))
+    if variance <= 0:
+        return u, 1.0
+
+    z = (abs(u - n1 * n2 / 2) - 0.5) / math.sqrt(variance)
+    return u, min(1.0, math.erfc(max(z, 0) / math.sqrt(2)))
+
+
+def find_change_points(values, min_size=3, threshold=0.05):
+    """Find the points where a series shifts, e.g. the median elapsed time of
+    a benchmark over nightly runs, with binary segmentation.
+
+    The series is split where the sum of the squared errors of the two sides
+    from their means is the lowest. The split is a change point if the
+    medians of the two sides differ by more than the threshold, and then each
+    side is split again.
+
+    Args:
+        values (list): The series, in order.
+        min_size (int): Minimum number of values between change points.
+        threshold (float): Minimum relative change, e.g. 0.05 for 5%.
+
+    Returns:
+        list: A (index, relative change) tuple for each change point, sorted
+              by index. The index is the one of the first value after the
+              change.
+    """
+
+    values = np.asarray(values, dtype=float)
+    sums = np.concatenate([[0], np.cumsum(values)])
+    squares = np.concatenate([[0], np.cumsum(values**2)])
+
+    def cost(start, end):
+        # Sum of the squared errors of values[start:end] from their mean
+        return squares[end] - squares[start] - (sums[end] - sums[start]) ** 2 / (
+            end - start
+        )
+
+    points = []
+    segments = [(0, len(values))]
+    while segments:
+        start, end = segments.pop()
+        if end - start < 2 * min_size:
+            continue
+
+        splits = np.arange(start + min_size, end - min_size + 1)
+        split = int(splits[np.argmin(cost(start, splits) + cost(splits, end))])
+
+        before = np.median(values[start:split])
+        after = np.median(values[split:end])
+        change = (after - before) / abs(before) if before else 0.0
+        if abs(change) > threshold:
+            points.append((split, float(change)))
+            segments += [(start, split), (split, end)]
+
+    return sorted(points)
+
+
+def compute_statistics(
+    samples,
+    resamples=0,
+    confidence=CONFIDENCE,
+    outliers=utils.DEFAULT_OUTLIER_POLICY,
+    outlier_threshold=None,
+):
+    """Compute the statistics of every series of the samples.
+
+    Outliers of each series are found with the outlier policy and left out of
+    its statistics.
+
+    Args:
+        samples (dict): The samples, as returned by load_samples.
+        resamples (int): Number of bootstrap resamples of the confidence
+                         intervals of the median of the elapsed time and the
+                         score. No intervals are computed if 0.
+        confidence (float): Confidence level of the intervals.
+        outliers (str): The outlier policy, one of utils.OUTLIER_POLICIES.
+        outlier_threshold (float): Threshold of the outlier policy.
+
+    Returns:
+        dict: The statistics of each runtime and benchmark, with the same
+              structure as the samples. Each series is replaced by a dict
+              with the values returned by describe, the number of outliers
+              left out and, if computed, the bounds of the confidence interval
+              (ci_low and ci_high).
+
+              Example:
+                {
+                    "runtime1": {
+                        "benchmark1": {
+                            "elapsed_time_ns": {"avg": ..., "median": ..., ...},
+                            "score": {...},
+                            "stats": {"compile_time_ns": {...}}
+                        }
+                    }
+                }
+    """
+
+    # Every series, with the keys to place its statistics back
+    keys, series = [], []
+    for runtime, benchmarks in samples.items():
+        for benchmark, data in benchmarks.items():
+            for metric in ("elapsed_time_ns", "score"):
+                keys.append((runtime, benchmark, metric, None))
+                series.append(data[metric])
+            for name, values in data["stats"].items():
+                keys.append((runtime, benchmark, "stats", name))
+                series.append(values)
+
+    if not series:
+        return {}
+
+    flagged = find_outliers(series, outliers, outlier_threshold)
+    series = [values[~mask] for values, mask in zip(series, flagged)]
+
+    described = describe(series)
+    described["outliers"] = np.array([mask.sum() for mask in flagged])
+    if resamples:
+        # Only the elapsed time and the score have confidence intervals
+        rows = [i for i, key in enumerate(keys) if key[2] != "stats"]
+        lower, upper = bootstrap_ci(
+            [series[i] for i in rows], resamples=resamples, confidence=confidence
+        )
+        described["ci_low"] = np.full(len(series), np.nan)
+        described["ci_high"] = np.full(len(series), np.nan)
+        described["ci_low"][rows], described["ci_high"][rows] = lower, upper
+
+    statistics = {}
+    for i, (runtime, benchmark, metric, name) in enumerate(keys):
+        values = {
+            key: (int(array[i]) if key in ("count", "outliers") else float(array[i]))
+            for key, array in described.items()
+            if not (key.startswith("ci_") and metric == "stats")
+        }
+        data = statistics.setdefault(runtime, {}).setdefault(
+            benchmark, {"stats": {}}
+        )
+        if name is None:
+            data[metric] = values
+        else:
+            data["stats"][name] = values
+
+    return statistics
@@ -0,0 +1,202 @@
+"""Ranks the runtimes by their mean speedup over a baseline
+
+For each benchmark, the speedup of a runtime is the ratio between its median
+and the one of the baseline runtime: of the score (higher is better) if the
+benchmark has a score, of the elapsed time (lower is better) otherwise, so
+that a speedup > 1 is always better. Speedups are summarized with their
+geometric mean for each group of benchmarks and overall, with bootstrap
+confidence intervals.
+"""
+
+import logging
+import os
+
+import numpy as np
+
+from . import benchmarks, utils
+from .statistics import (
+    BOOTSTRAP_RESAMPLES,
+    CONFIDENCE,
+    benchmark_metrics,
+    bootstrap_geomean_ci,
+    load_samples,
+    remove_sample_outliers,
+)
+
+# Group of the benchmarks that are not in the benchmarks folder
+OTHER_GROUP = "other"
+OVERALL = "overall"
+
+
+def parse(parser):
+    """Parse command-line arguments for the summary module."""
+
+    # We use os.path.dirname two times because the script is in the tools
+    # folder and we want to get the benchmarks folder.
+    script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    parser.add_argument(
+        "results_file",
+        help="""Path to the results file. For a database, the name of the run
+            can follow the path after a '#' (default: the most recent run)""",
+    )
+
+    parser.add_argument(
+        "--baseline",
+        metavar="RUNTIME",
+        default=None,
+        help="Runtime the speedups are relative to (default: the first runtime)",
+    )
+
+    parser.add_argument(
+        "--benchmarks-folder",
+        default=os.path.join(script_dir, utils.DEFAULT_BENCHMARKS_FOLDER),
+        help=f"""Path to the folder containing benchmarks, used to find the group
+            of each benchmark (default: {utils.DEFAULT_BENCHMARKS_FOLDER})""",
+    )
+
+    parser.add_argument(
+        "--resamples",
+        type=int,
+        default=BOOTSTRAP_RESAMPLES,
+        help=f"""Number of bootstrap resamples of the confidence intervals
+            (default: {BOOTSTRAP_RESAMPLES})""",
+    )
+
+    utils.add_outlier_arguments(parser)
+    utils.add_log_level_argument(parser)
+
+    return parser
+
+
+def compute_summary(
+    samples, baseline, groups, resamples=BOOTSTRAP_RESAMPLES, confidence=CONFIDENCE
+):
+    """Compute the geometric mean of the speedups of each runtime over the
+    baseline, for each group of benchmarks and overall.
+
+    Benchmarks that the baseline didn't run, or with a median score of 0, are
+    left out.
+
+    Args:
+        samples (dict): The samples, as returned by statistics.load_samples.
+        baseline (str): The baseline runtime.
+        groups (dict): The group of each benchmark. Benchmarks that are not in
+                       it are in OTHER_GROUP.
+        resamples (int): Number of bootstrap resamples.
+        confidence (float): Confidence level of the intervals.
+
+    Returns:
+        dict: For each runtime, a dict with a (geometric mean, lower bound,
+              upper bound, number of benchmarks) tuple for each group and for
+              OVERALL.
+
+              Example:
+                {
+                    "wasmtime": {
+                        "polybench": (1.21, 1.15, 1.28, 30),
+                        "overall": (1.12, 1.08, 1.17, 80)
+                    }
+                }
+    """
+
+    metrics = benchmark_metrics(samples)
+
+    numerators, denominators, pairs = [], [], {}
+    for runtime, benchmarks_samples in samples.items():
+        for benchmark, data in benchmarks_samples.items():
+            if benchmark not in samples[baseline]:
+                continue
+
+            metric, higher_is_better = metrics[benchmark]
+            new, old = data[metric], samples[baseline][benchmark][metric]
+            numerator, denominator = (new, old) if higher_is_better else (old, new)
+            if not (
+                len(numerator)
+                and len(denominator)
+                and np.median(numerator) > 0
+                and np.median(denominator) > 0
+            ):
+                logging.debug(f"No positive {metric} for {benchmark}. Skipping.")
+                continue
+
+            group = groups.get(benchmark, OTHER_GROUP)
+            for key in ((runtime, group), (runtime, OVERALL)):
+                pairs.setdefault(key, []).append(len(numerators))
+            numerators.append(numerator)
+            denominators.append(denominator)
+
+    if not numerators:
+        return {}
+
+    intervals = bootstrap_geomean_ci(
+        numerators, denominators, pairs, resamples=resamples, confidence=confidence
+    )
+
+    summary = {}
+    for (runtime, group), (geomean, lower, upper) in intervals.items():
+        summary.setdefault(runtime, {})[group] = (
+            geomean,
+            lower,
+            upper,
+            len(pairs[(runtime, group)]),
+        )
+    return summary
+
+
+def _print_leaderboard(summary, baseline, confidence):
+    """Prints the runtimes sorted by their overall mean speedup, with a column
+    for each group."""
+
+    groups = sorted({g for r in summary.values() for g in r if g != OVERALL})
+    columns = [OVERALL] + groups
+    width = 24
+
+    print(
+        f"Speedup over {baseline} (geometric mean, {confidence:.0%} CI, "
+        "number of benchmarks)\n"
+    )
+    print(f"{'#':>3} {'runtime':<24}" + "".join(f"{c:>{width}}" for c in columns))
+
+    ranking = sorted(summary.items(), key=lambda item: -item[1][OVERALL][0])
+    for rank, (runtime, runtime_summary) in enumerate(ranking, 1):
+        cells = []
+        for column in columns:
+            if column not in runtime_summary:
+                cells.append(f"{'-':>{width}}")
+                continue
+            geomean, lower, upper, count = runtime_summary[column]
+            cell = f"{geomean:.3f} [{lower:.2f}, {upper:.2f}] ({count})"
+            cells.append(f"{cell:>{width}}")
+        print(f"{rank:>3} {runtime:<24}" + "".join(cells))
+
+
+def main(args):
+    logging.getLogger().setLevel(getattr(logging, args.log_level.upper()))
+
+    args.results_file = utils.get_absolute_path(args.results_file)
+    args.benchmarks_folder = utils.get_absolute_path(args.benchmarks_folder)
+
+    samples = load_samples(utils.iter_results_file(args.results_file))
+    if not samples:
+        logging.error("No valid results found in the file.")
+        return 1
+
+    baseline = args.baseline or next(iter(samples))
+    if baseline not in samples:
+        logging.error(f"Baseline runtime {baseline} not found in the results.")
+        return 1
+
+    remove_sample_outliers(samples, args.outliers, args.outlier_threshold)
+
+    summary = compute_summary(
+        samples,
+        baseline,
+        benchmarks.get_benchmark_groups(args.benchmarks_folder),
+        args.resamples,
+    )
+    if not summary:
+        logging.error(f"No benchmarks in common with the baseline {baseline}.")
+        return 1
+
+    _print_leaderboard(summary, baseline, CONFIDENCE)
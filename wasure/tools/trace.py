@@ -0,0 +1,147 @@
+"""Records a timeline of a run in the Trace Event Format
+
+The timeline can be opened with Perfetto (https://ui.perfetto.dev) or
+chrome://tracing, to see where the time of a run goes: compilation,
+iterations, parsing of the outputs and the harness itself. Events are only
+recorded between start and save, so spans cost nothing when tracing is off.
+Each thread that records events has its own track.
+"""
+
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+
+from ..wasure import VERSION_NUMBER
+
+# Events recorded since start, or None if tracing is off
+_events = None
+_lock = threading.Lock()
+# Track of each thread, by thread identifier, and its name
+_tracks = {}
+_start_ns = 0
+
+
+def start():
+    """Start recording events, discarding the ones recorded before."""
+
+    global _events, _start_ns
+    with _lock:
+        _events = []
+        _tracks.clear()
+        _start_ns = time.perf_counter_ns()
+
+
+def is_enabled():
+    """Return True if events are being recorded."""
+
+    return _events is not None
+
+
+def _track():
+    """Return the track of the calling thread, adding it if needed. Must be
+    called with the lock held."""
+
+    thread = threading.current_thread()
+    if thread.ident not in _tracks:
+        name = "main" if thread is threading.main_thread() else thread.name
+        _tracks[thread.ident] = (len(_tracks), name)
+    return _tracks[thread.ident][0]
+
+
+def record(name, start_ns, end_ns, category="run", **args):
+    """Record a span of the calling thread that already ended.
+
+    Args:
+        name (str): Name of the span.
+        start_ns (int): Start of the span, from time.perf_counter_ns.
+        end_ns (int): End of the span, from time.perf_counter_ns.
+        category (str): Category of the span, to filter them in the viewer.
+        **args: Values shown with the span, e.g. the runtime and benchmark.
+    """
+
+    if _events is None:
+        return
+
+    with _lock:
+        _events.append(
+            {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": (start_ns - _start_ns) / 1000,
+                "dur": (end_ns - start_ns) / 1000,
+                "pid": os.getpid(),
+                "tid": _track(),
+                "args": args,
+            }
+        )
+
+
+@contextlib.contextmanager
+def span(name, category="run", **args):
+    """Record the code in the with block as a span of the calling thread.
+
+    Yields the args of the span, which the block can update, e.g. with the
+    return code of a process.
+
+    Example:
+        with trace.span("iteration", runtime="wasmtime") as args:
+            args["return_code"] = 0
+    """
+
+    start_ns = time.perf_counter_ns()
+    try:
+        yield args
+    finally:
+        record(name, start_ns, time.perf_counter_ns(), category, **args)
+
+
+def save(path):
+    """Write the recorded events to a JSON file and stop recording.
+
+    Args:
+        path (str): Path of the trace file.
+
+    Returns:
+        int: The number of events written.
+    """
+
+    global _events
+    with _lock:
+        events, _events = _events or [], None
+        tracks = sorted(_tracks.values())
+
+    pid = os.getpid()
+    metadata = [
+        {
+            "name": "process_name",
+            "ph": "M",
+            "pid": pid,
+            "args": {"name": "wasure run"},
+        }
+    ] + [
+        {
+            "name": "thread_name",
+            "ph": "M",
+            "pid": pid,
+            "tid": tid,
+            "args": {"name": name},
+        }
+        for tid, name in tracks
+    ]
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(
+            {
+                "traceEvents": metadata + events,
+                "displayTimeUnit": "ms",
+                "otherData": {"version": VERSION_NUMBER, "argv": sys.argv},
+            },
+            f,
+        )
+
+    return len(events)
@@ -0,0 +1,484 @@
+"""Tracks the results of the benchmarks over time
+
+The results files in the results folder are summarized once, with the median
+elapsed time and score of each runtime and benchmark, and the summaries are
+kept in a cache keyed by the hash of each file. Later calls only summarize new
+or changed files. The summaries of the runs, in the order of their names
+(i.e. their dates), are plotted as time series, per benchmark or per
+benchmark group, and change points show where the performance shifted.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+from . import benchmarks, compact, utils
+from .statistics import describe, find_change_points, load_samples
+from .summary import OTHER_GROUP
+
+CACHE_VERSION = 1
+CACHE_FILE = ".trend-cache.json"
+
+DEFAULT_MIN_SIZE = 3
+DEFAULT_THRESHOLD = 0.05
+
+
+def parse(parser):
+    """Parse command-line arguments for the trend module."""
+
+    # We use os.path.dirname two times because the script is in the tools
+    # folder and we want to get the results folder.
+    script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    parser.add_argument(
+        "-r",
+        "--runtimes",
+        nargs="+",
+        default=None,
+        help="Runtimes to track (default: all)",
+    )
+
+    parser.add_argument(
+        "-b",
+        "--benchmarks",
+        nargs="+",
+        default=None,
+        help="Benchmarks to track (default: all)",
+    )
+
+    parser.add_argument(
+        "--suite",
+        action="store_true",
+        default=False,
+        help="""Track the geometric mean of each benchmark group instead of each
+            benchmark, relative to the first run of each benchmark
+            (default: False)""",
+    )
+
+    parser.add_argument(
+        "--results-folder",
+        default=os.path.join(script_dir, utils.DEFAULT_RESULTS_FOLDER),
+        help=f"Path to the folder with the results files (default: {utils.DEFAULT_RESULTS_FOLDER})",
+    )
+
+    parser.add_argument(
+        "--benchmarks-folder",
+        default=os.path.join(script_dir, utils.DEFAULT_BENCHMARKS_FOLDER),
+        help=f"""Path to the folder containing benchmarks, used to find the group
+            of each benchmark with --suite
+            (default: {utils.DEFAULT_BENCHMARKS_FOLDER})""",
+    )
+
+    parser.add_argument(
+        "--plots-folder",
+        default=os.path.join(script_dir, utils.DEFAULT_PLOTS_FOLDER),
+        help=f"Path to the folder where plots will be saved (default: {utils.DEFAULT_PLOTS_FOLDER})",
+    )
+
+    parser.add_argument(
+        "--no-plot",
+        action="store_true",
+        default=False,
+        help="Only print the change points (default: False)",
+    )
+
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help=f"""Minimum relative change of a change point, e.g. 0.05 for 5%%
+            (default: {DEFAULT_THRESHOLD})""",
+    )
+
+    parser.add_argument(
+        "--min-size",
+        type=int,
+        default=DEFAULT_MIN_SIZE,
+        help=f"""Minimum number of runs between change points
+            (default: {DEFAULT_MIN_SIZE})""",
+    )
+
+    utils.add_log_level_argument(parser)
+
+    return parser
+
+
+def _file_hash(path):
+    """Return the SHA-256 hash of a file, read in chunks."""
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(utils.STREAM_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def summarize_results_file(path):
+    """Summarize a results file with the median elapsed time and score of
+    each runtime and benchmark. Raises an error, e.g. ValueError, if the
+    file isn't a valid results file.
+
+    Returns:
+        dict: For each runtime and benchmark, the medians and the number of
+              valid iterations.
+
+              Example:
+                {
+                    "runtime1": {
+                        "benchmark1": {
+                            "elapsed_time_ns": 1234.0,
+                            "score": 0.0,
+                            "count": 10
+                        }
+                    }
+                }
+    """
+
+    samples = load_samples(utils.iter_results_file(path, strict=True))
+
+    keys, series = [], []
+    for runtime, runtime_samples in samples.items():
+        for benchmark, data in runtime_samples.items():
+            keys.append((runtime, benchmark, len(data["elapsed_time_ns"])))
+            series += [data["elapsed_time_ns"], data["score"]]
+
+    if not series:
+        return {}
+
+    medians = describe(series, percentiles=())["median"]
+
+    summary = {}
+    for i, (runtime, benchmark, count) in enumerate(keys):
+        summary.setdefault(runtime, {})[benchmark] = {
+            "elapsed_time_ns": float(medians[2 * i]),
+            "score": float(medians[2 * i + 1]),
+            "count": count,
+        }
+    return summary
+
+
+def _is_results_file(path):
+    return path.endswith(".json") or path.endswith(compact.EXTENSION)
+
+
+def _write_cache(cache, cache_file):
+    """Write the cache to a temporary file and rename it, so that runs
+    sharing the results folder never read or write a partial cache."""
+
+    folder, name = os.path.split(cache_file)
+    fd, temp = tempfile.mkstemp(prefix=f"{name}.", suffix=".tmp", dir=folder)
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(cache, f)
+        # mkstemp creates the file readable by its owner only
+        os.chmod(temp, 0o644)
+        os.replace(temp, cache_file)
+    except BaseException:
+        os.remove(temp)
+        raise
+
+
+def load_history(results_folder, cache_file=None):
+    """Return the summaries of the results files in the results folder, using
+    and updating the cache.
+
+    Files are recognized by their hash, so renamed files are not summarized
+    again. The hash itself is only computed for files whose size or
+    modification time changed since they were cached. Files that aren't
+    results files, e.g. traces, or that are still being written, have an
+    empty summary and are left out of the history.
+
+    Args:
+        results_folder (str): The folder with the results files.
+        cache_file (str): The cache file (default: CACHE_FILE in the results
+                          folder).
+
+    Returns:
+        list: A (run name, summary) tuple for each results file, sorted by
+              name. See summarize_results_file.
+    """
+
+    cache_file = cache_file or os.path.join(results_folder, CACHE_FILE)
+
+    cache = {"version": CACHE_VERSION, "files": {}, "summaries": {}}
+    if os.path.exists(cache_file):
+        try:
+            with open(cache_file, "r") as f:
+                loaded = json.load(f)
+            if loaded.get("version") == CACHE_VERSION:
+                cache = loaded
+        except json.JSONDecodeError:
+            logging.warning(f"Invalid cache {cache_file}. Rebuilding it.")
+
+    if not os.path.isdir(results_folder):
+        logging.error(f"{results_folder} folder not found.")
+        return []
+
+    history, files, added = [], {}, 0
+    for entry in sorted(os.scandir(results_folder), key=lambda e: e.name):
+        if not entry.is_file() or not _is_results_file(entry.name):
+            continue
+        if entry.path == cache_file:
+            continue
+
+        stat = entry.stat()
+        cached = cache["files"].get(entry.name)
+        if (
+            cached
+            and cached["size"] == stat.st_size
+            and cached["mtime"] == stat.st_mtime
+        ):
+            file_hash = cached["hash"]
+        else:
+            file_hash = _file_hash(entry.path)
+        files[entry.name] = {
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "hash": file_hash,
+        }
+
+        if file_hash not in cache["summaries"]:
+            logging.info(f"Summarizing {entry.name}")
+            try:
+                summary = summarize_results_file(entry.path)
+            except (
+                ValueError, KeyError, TypeError, AttributeError, EOFError, OSError
+            ) as e:
+                logging.debug(f"{entry.name} is not a results file: {e!r}")
+                summary = {}
+            cache["summaries"][file_hash] = summary
+            added += 1
+
+        if cache["summaries"][file_hash]:
+            history.append(
+                (utils.get_results_name(entry.path), cache["summaries"][file_hash])
+            )
+
+    # Drops the summaries of the files that have been removed
+    hashes = {f["hash"] for f in files.values()}
+    removed = [h for h in cache["summaries"] if h not in hashes]
+    for file_hash in removed:
+        del cache["summaries"][file_hash]
+
+    if added or removed or files != cache["files"]:
+        cache["files"] = files
+        _write_cache(cache, cache_file)
+        logging.info(f"Cache updated: {added} new, {len(removed)} removed")
+
+    return history
+
+
+def _benchmark_metrics(history):
+    """Metric of each benchmark, and whether higher is better, as in plot:
+    the score if it's > 0 in any run, otherwise the elapsed time."""
+
+    metrics = {}
+    for _, summary in history:
+        for runtime_summary in summary.values():
+            for benchmark, data in runtime_summary.items():
+                if data["score"] > 0:
+                    metrics[benchmark] = ("score", True)
+                else:
+                    metrics.setdefault(benchmark, ("elapsed_time_ns", False))
+    return metrics
+
+
+def _benchmark_series(history, runtimes, selected_benchmarks):
+    """Series of the median of each benchmark with each runtime.
+
+    Returns:
+        dict: For each benchmark, the metric and, for each runtime, a list of
+              (run index, median) tuples.
+    """
+
+    metrics = _benchmark_metrics(history)
+
+    series = {}
+    for index, (_, summary) in enumerate(history):
+        for runtime, runtime_summary in summary.items():
+            if runtimes and runtime not in runtimes:
+                continue
+            for benchmark, data in runtime_summary.items():
+                if selected_benchmarks and benchmark not in selected_benchmarks:
+                    continue
+                metric, _ = metrics[benchmark]
+                entry = series.setdefault(
+                    benchmark, {"metric": metric, "runtimes": {}}
+                )
+                entry["runtimes"].setdefault(runtime, []).append(
+                    (index, data[metric])
+                )
+
+    return series
+
+
+def _suite_series(history, runtimes, groups):
+    """Series of the geometric mean of each benchmark group with each runtime.
+
+    The value of a benchmark in a run is its speedup over the first run of
+    the benchmark with the same runtime, oriented so that > 1 is better.
+
+    Returns:
+        dict: As _benchmark_series, for each group.
+    """
+
+    metrics = _benchmark_metrics(history)
+    first = {}
+    logs = {}
+    for index, (_, summary) in enumerate(history):
+        for runtime, runtime_summary in summary.items():
+            if runtimes and runtime not in runtimes:
+                continue
+            for benchmark, data in runtime_summary.items():
+                metric, higher_is_better = metrics[benchmark]
+                if data[metric] <= 0:
+                    continue
+                reference = first.setdefault((runtime, benchmark), data[metric])
+                speedup = (
+                    data[metric] / reference
+                    if higher_is_better
+                    else reference / data[metric]
+                )
+                group = groups.get(benchmark, OTHER_GROUP)
+                logs.setdefault((group, runtime, index), []).append(np.log(speedup))
+
+    series = {}
+    for (group, runtime, index), values in sorted(logs.items()):
+        entry = series.setdefault(group, {"metric": "speedup", "runtimes": {}})
+        entry["runtimes"].setdefault(runtime, []).append(
+            (index, float(np.exp(np.mean(values))))
+        )
+    return series
+
+
+def _find_changes(series, history, min_size, threshold):
+    """Find the change points of every series.
+
+    Returns:
+        list: A dict for each change point, with the name of the series, the
+              runtime, the metric, the index and name of the first run after
+              the change, and the relative change.
+    """
+
+    changes = []
+    for name, entry in series.items():
+        for runtime, points in entry["runtimes"].items():
+            values = [value for _, value in points]
+            for i, change in find_change_points(values, min_size, threshold):
+                index = points[i][0]
+                changes.append(
+                    {
+                        "name": name,
+                        "runtime": runtime,
+                        "metric": entry["metric"],
+                        "index": index,
+                        "run": history[index][0],
+                        "change": change,
+                    }
+                )
+    return changes
+
+
+def _print_changes(changes):
+    """Prints the change points, ordered by run. Verdicts are colored on a
+    terminal."""
+
+    if not changes:
+        print("No change points found.")
+        return
+
+    print(f"{'run':<22} {'benchmark':<30} {'runtime':<20} {'change':>8}")
+    for c in sorted(changes, key=lambda c: (c["index"], c["name"], c["runtime"])):
+        # Higher is better for scores and speedups, lower for elapsed times
+        better = (c["change"] > 0) != (c["metric"] == "elapsed_time_ns")
+        verdict = "better" if better else "worse"
+        if sys.stdout.isatty():
+            verdict = f"\033[{92 if better else 91}m{verdict}\033[0m"
+        print(
+            f"{c['run']:<22} {c['name']:<30} {c['runtime']:<20} "
+            f"{c['change']:>+8.1%}  {verdict}"
+        )
+
+
+def _plot_series(series, changes, history, plots_folder):
+    """Plot a figure for each series, with a line for each runtime and a
+    marker on each change point."""
+
+    # Imported here, as run loads the history without plotting it
+    import matplotlib.pyplot as plt
+
+    colors = plt.cm.tab10.colors
+    names = [name for name, _ in history]
+    marked = {(c["name"], c["runtime"], c["index"]) for c in changes}
+
+    for name, entry in series.items():
+        plt.figure(figsize=(14, 8))
+
+        for i, (runtime, points) in enumerate(entry["runtimes"].items()):
+            color = colors[i % len(colors)]
+            xs = [index for index, _ in points]
+            ys = [value for _, value in points]
+            plt.plot(xs, ys, marker="o", color=color, label=runtime)
+
+            change_points = [(x, y) for x, y in points if (name, runtime, x) in marked]
+            if change_points:
+                plt.scatter(
+                    *zip(*change_points),
+                    s=200,
+                    facecolors="none",
+                    edgecolors="red",
+                    linewidths=2,
+                    zorder=3,
+                )
+
+        # Shows the names of at most ~20 runs on the x axis
+        step = max(1, len(names) // 20)
+        plt.xticks(range(0, len(names), step), names[::step], rotation=45, ha="right")
+        plt.grid(linestyle="--", alpha=0.7)
+        plt.title(f"Trend of {name} (change points circled in red)")
+        plt.ylabel(entry["metric"])
+        plt.xlabel("Run")
+        plt.legend()
+        plt.tight_layout()
+
+        plot_filename = f"trend_{name}.png".replace(os.sep, "_")
+        plot_path = os.path.join(plots_folder, plot_filename)
+        plt.savefig(plot_path)
+        plt.close()
+        logging.info(f"Saved plot to {plot_path}")
+
+
+def main(args):
+    logging.getLogger().setLevel(getattr(logging, args.log_level.upper()))
+
+    args.results_folder = utils.get_absolute_path(args.results_folder)
+    args.plots_folder = utils.get_absolute_path(args.plots_folder)
+
+    history = load_history(args.results_folder)
+    if not history:
+        logging.error("No results found in the results folder.")
+        return 1
+
+    if args.suite:
+        groups = benchmarks.get_benchmark_groups(
+            utils.get_absolute_path(args.benchmarks_folder)
+        )
+        series = _suite_series(history, args.runtimes, groups)
+    else:
+        series = _benchmark_series(history, args.runtimes, args.benchmarks)
+
+    if not series:
+        logging.error("No results of the chosen runtimes and benchmarks.")
+        return 1
+
+    changes = _find_changes(series, history, args.min_size, args.threshold)
+    _print_changes(changes)
+
+    if not args.no_plot:
+        os.makedirs(args.plots_folder, exist_ok=True)
+        _plot_series(series, changes, history, args.plots_folder)
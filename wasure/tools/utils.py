@@ -1,6 +1,11 @@
+import argparse
 import json
 import logging
 import os
+import re
+
+# Size of the chunks read by iter_results_file
+STREAM_CHUNK_SIZE = 1024 * 1024
 
 DEFAULT_BENCHMARKS_FOLDER = "benchmarks"
 DEFAULT_RESULTS_FOLDER = "results"
@@ -8,6 +13,18 @@ DEFAULT_RUNTIMES_FOLDER = "runtimes"
 DEFAULT_PLOTS_FOLDER = "plots"
 DEFAULT_INSTALLERS_FOLDER = "installers"
 DEFAULT_RUNTIMES_FILE = DEFAULT_RUNTIMES_FOLDER + "/runtimes.json"
+DEFAULT_DATABASE_FILE = DEFAULT_RESULTS_FOLDER + "/results.db"
+
+# Separates the path of a database from the name of a run, e.g.
+# results/results.db#2025-05-06_10-56-21
+RUN_SEPARATOR = "#"
+
+# Outlier policies, with their default threshold:
+# * mad: values whose modified z-score, 0.6745 * |x - median| / MAD, is above
+#   the threshold (Iglewicz and Hoaglin)
+# * iqr: values farther than threshold * IQR from the quartiles (Tukey fences)
+OUTLIER_POLICIES = {"mad": 3.5, "iqr": 1.5, "none": None}
+DEFAULT_OUTLIER_POLICY = "mad"
 
 
 def add_log_level_argument(parser):
@@ -23,16 +40,116 @@ def add_log_level_argument(parser):
     return parser
 
 
+def add_outlier_arguments(parser):
+    """Add the --outliers and --outlier-threshold arguments to the parser."""
+
+    parser.add_argument(
+        "--outliers",
+        choices=list(OUTLIER_POLICIES),
+        default=DEFAULT_OUTLIER_POLICY,
+        help=f"""How to detect outlier iterations: 'mad' (modified z-score),
+            'iqr' (Tukey fences) or 'none' (default: {DEFAULT_OUTLIER_POLICY})""",
+    )
+
+    parser.add_argument(
+        "--outlier-threshold",
+        type=float,
+        default=None,
+        help="""Threshold of the outlier policy (default: 3.5 for mad, 1.5 for
+            iqr)""",
+    )
+
+    return parser
+
+
+def outlier_policy_name(policy, threshold=None):
+    """Return a description of an outlier policy, e.g. "mad > 3.5"."""
+
+    if policy == "none":
+        return "none"
+    return f"{policy} > {threshold or OUTLIER_POLICIES[policy]}"
+
+
+def parse_duration(text):
+    """Parse a duration such as 2h, 90m, 1h30m, 45s or 3600 (seconds), as an
+    argparse type.
+
+    Returns:
+        float: The duration in seconds.
+    """
+
+    units = {"h": 3600, "m": 60, "s": 1, "": 1}
+    parts = re.findall(r"(\d+(?:\.\d+)?)\s*([hms]?)", text.strip().lower())
+    if not parts or re.sub(r"[\d.\shms]", "", text.lower()):
+        raise argparse.ArgumentTypeError(f"invalid duration: '{text}'")
+
+    seconds = sum(float(value) * units[unit] for value, unit in parts)
+    if seconds <= 0:
+        raise argparse.ArgumentTypeError(f"invalid duration: '{text}'")
+    return seconds
+
+
+def is_database_file(file_path):
+    """Return True if the file is a SQLite database."""
+
+    try:
+        with open(file_path, "rb") as f:
+            return f.read(16) == b"SQLite format 3\x00"
+    except OSError:
+        return False
+
+
+def get_results_name(file_path):
+    """Return the name of the results in a file, used to name plots and
+    exports. It's the name of the run for a database (default: the most
+    recent run), otherwise the name of the file without its extension."""
+
+    path, _, run = file_path.partition(RUN_SEPARATOR)
+    if not run and is_database_file(path):
+        from . import db
+
+        run = next(iter(db.list_runs(path)[-1:]), None)
+
+    return run or os.path.splitext(os.path.basename(path))[0]
+
+
 def load_results_file(file_path):
-    """Load benchmark results from a JSON file.
+    """Load benchmark results from a JSON file, a compact results file or a
+    SQLite database.
 
     Args:
         file_path (str): Path to the JSON file containing benchmark results.
+                         For a database, the name of the run can follow the
+                         path after a '#' (default: the most recent run).
 
     Returns:
         dict: Parsed benchmark results. If the file is empty or cannot be parsed,
               returns None.
     """
+
+    path, _, run = file_path.partition(RUN_SEPARATOR)
+    if is_database_file(path):
+        from . import db
+
+        results = db.load_run(path, run or None)
+        if not results:
+            logging.info("No results found in the database.")
+            return None
+        return results
+
+    from . import compact
+
+    if compact.is_compact_file(path):
+        try:
+            results = compact.read_compact(path)
+        except (OSError, ValueError) as e:
+            logging.error(f"Failed to read the compact results file: {e}")
+            return None
+        if not results:
+            logging.info("No results found in the file.")
+            return None
+        return results
+
     try:
         with open(file_path, "r") as f:
             results = json.load(f)
@@ -45,6 +162,155 @@ def load_results_file(file_path):
         return None
 
 
+class _JSONStream:
+    """Reads JSON values from a file incrementally, keeping only the part of
+    the file that has not been parsed yet in memory."""
+
+    def __init__(self, f):
+        self.f = f
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _read(self, size=STREAM_CHUNK_SIZE):
+        """Read more of the file. Returns False at the end of the file."""
+
+        if self.eof:
+            return False
+
+        chunk = self.f.read(size)
+        if not chunk:
+            self.eof = True
+            return False
+
+        # Drop what has already been parsed
+        self.buffer = self.buffer[self.pos :] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Return the next non-whitespace character, or '' at the end."""
+
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buffer) or not self._read():
+                return self.buffer[self.pos : self.pos + 1]
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise json.JSONDecodeError(f"Expecting '{char}'", self.buffer, self.pos)
+        self.pos += 1
+
+    def value(self):
+        """Decode the next value, reading more of the file until it's complete.
+        Reads grow with the size of the value, so that large values (e.g.
+        long outputs) are not decoded over and over."""
+
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # A number could continue in the next chunk
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._read(max(STREAM_CHUNK_SIZE, len(self.buffer) - self.pos))
+
+    def members(self):
+        """Iterate over the keys of an object. The value of each key must be
+        consumed before moving on to the next one."""
+
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(":")
+            yield key
+            if self.peek() == ",":
+                self.pos += 1
+                continue
+            self.expect("}")
+            return
+
+    def items(self):
+        """Iterate over the items of an array, or nothing if the value is null."""
+
+        if self.peek() == "n":
+            self.value()
+            return
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.peek() == ",":
+                self.pos += 1
+                continue
+            self.expect("]")
+            return
+
+
+def iter_results_file(file_path, include_output=False, strict=False):
+    """Iterate over the iterations in a results file, without loading the
+    whole file in memory.
+
+    Args:
+        file_path (str): Path to the results file. Databases and compact
+                         results files are supported as in load_results_file.
+        include_output (bool): If False, the output of the benchmarks is
+                               dropped from the iterations.
+        strict (bool): If True, a JSON results file that can't be decoded
+                       raises json.JSONDecodeError, instead of ending the
+                       iterations where it breaks.
+
+    Yields:
+        tuple: The runtime, the benchmark, the index of the iteration
+               (starting from 0) and the iteration itself, in the order they
+               are stored in the file. Benchmarks with no iterations (e.g.
+               failed AOT compilation) are skipped.
+    """
+
+    path, _, _ = file_path.partition(RUN_SEPARATOR)
+    if is_database_file(path):
+        for runtime, benchmarks in (load_results_file(file_path) or {}).items():
+            for benchmark, runs in benchmarks.items():
+                for index, run in enumerate(runs or []):
+                    if not include_output:
+                        run.pop("output", None)
+                    yield runtime, benchmark, index, run
+        return
+
+    from . import compact
+
+    if compact.is_compact_file(path):
+        for runtime, benchmark, runs in compact.iter_compact(path, include_output):
+            for index, run in enumerate(runs or []):
+                yield runtime, benchmark, index, run
+        return
+
+    try:
+        with open(file_path, "r") as f:
+            stream = _JSONStream(f)
+            for runtime in stream.members():
+                for benchmark in stream.members():
+                    for index, run in enumerate(stream.items()):
+                        if not include_output:
+                            run.pop("output", None)
+                        yield runtime, benchmark, index, run
+    except json.JSONDecodeError:
+        if strict:
+            raise
+        logging.error("Failed to decode JSON from the results file.")
+
+
 def get_absolute_path(path):
     """Get the absolute path of a given path.
     - If the path is absolute, return as is.
@@ -61,3 +327,34 @@ def get_absolute_path(path):
         return path
 
     return os.path.abspath(os.path.join(os.getcwd(), path))
+
+
+def split_benchmark_variant(name):
+    """Split the name of a benchmark variant into its base name and parameters.
+
+    Example:
+        "bench@size=1000,threads=8" -> ("bench", {"size": 1000, "threads": 8})
+        "bench"                     -> ("bench", {})
+
+    Args:
+        name (str): The name of the benchmark, as stored in the results.
+
+    Returns:
+        tuple: The base name of the benchmark and a dictionary with the values
+               of its parameters. Numeric values are converted to numbers.
+    """
+
+    base, _, parameters = name.partition("@")
+
+    values = {}
+    for parameter in parameters.split(",") if parameters else []:
+        key, _, value = parameter.partition("=")
+        try:
+            values[key] = int(value)
+        except ValueError:
+            try:
+                values[key] = float(value)
+            except ValueError:
+                values[key] = value
+
+    return base, values
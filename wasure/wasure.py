@@ -1,24 +1,38 @@
 import logging
+import sys
 from argparse import ArgumentParser
 
-from wasure.tools import commands, utils
+from wasure.tools import commands, load_command, utils
 
 VERSION_NUMBER = "0.9"
 VERSION = f"{VERSION_NUMBER}α (2025-06-17)"
 
 
 def setup_subparsers(parser, commands):
-    """Set up subparsers for the given commands."""
+    """Set up subparsers for the given commands. Their arguments are added by
+    setup_command, only for the command that runs."""
     subparser = parser.add_subparsers(dest="command", required=True)
-    for name, command in commands.items():
-        cmd_parser = subparser.add_parser(
+    for name, description in commands.items():
+        # -h is added with the arguments of the command, otherwise the help
+        # would be printed before they are known
+        subparser.add_parser(
             name,
-            help=command.__doc__.split("\n")[0],
-            description=command.__doc__.split("\n")[0],
-            add_help=True,
+            help=description,
+            description=description,
+            add_help=False,
         )
-        command.parse(cmd_parser)
-        cmd_parser.set_defaults(_func=command.main)
+    return subparser
+
+
+def setup_command(subparser, name):
+    """Import a command and add its arguments to its subparser."""
+    command = load_command(name)
+    cmd_parser = subparser.choices[name]
+    cmd_parser.add_argument(
+        "-h", "--help", action="help", help="show this help message and exit"
+    )
+    command.parse(cmd_parser)
+    cmd_parser.set_defaults(_func=command.main)
 
 
 def setup_logging(level=logging.WARNING):
@@ -35,16 +49,21 @@ def main():
     )
     parser.add_argument("--version", action="version", version=f"WASURE {VERSION}")
     utils.add_log_level_argument(parser)
-    setup_subparsers(parser, commands)
+    subparser = setup_subparsers(parser, commands)
+
+    # The first pass only finds the command, to import just that one
+    known_args, _ = parser.parse_known_args()
+    setup_command(subparser, known_args.command)
 
     args = parser.parse_args()
     setup_logging(level=getattr(logging, args.log_level.upper()))
 
+    # Commands can return an exit code, e.g. compare on regressions
     if hasattr(args, "_func"):
-        args._func(args)
+        return args._func(args)
     else:
         parser.print_help()
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())